@@ -1,8 +1,16 @@
 # asignaciones/admin.py
 from django.contrib import admin
-from .models import Vehiculo, Conductor, Asignacion, RegistroTurno
+from .models import (
+    Vehiculo, Conductor, Asignacion, RegistroTurno, TrabajoAsignacion, PerfilAsignacion,
+    ZonaRuta, DistanciaRuta, ResumenDiario, Mantenimiento, SesionTurno
+)
 from django.utils.html import format_html
 
+class MantenimientoInline(admin.TabularInline):
+    model = Mantenimiento
+    extra = 0
+    fields = ('fecha', 'kilometraje', 'tipo', 'descripcion', 'costo')
+
 @admin.register(Vehiculo)
 class VehiculoAdmin(admin.ModelAdmin):
     list_display = (
@@ -28,7 +36,11 @@ class VehiculoAdmin(admin.ModelAdmin):
         'patente', 'marca', 'modelo', 'anio', 'numero_chasis', 'numero_motor'
     )
     list_editable = ('estado',)
-    readonly_fields = ('foto_preview_vehiculo',) # Renombrado para claridad
+    readonly_fields = (
+        'foto_preview_vehiculo', # Renombrado para claridad
+        'km_ultimo_mantenimiento', 'proximo_mantenimiento_km', 'km_para_mantenimiento',
+    )
+    inlines = (MantenimientoInline,)
 
     fieldsets = (
         (None, {
@@ -40,6 +52,12 @@ class VehiculoAdmin(admin.ModelAdmin):
         ('Capacidad y Características', {
             'fields': ('capacidad_pasajeros',)
         }),
+        ('Ubicación', {
+            'fields': ('base_lat', 'base_lon', 'ultima_lat', 'ultima_lon', 'fecha_ultima_posicion')
+        }),
+        ('Mantenimiento', {
+            'fields': ('kilometraje', 'km_ultimo_mantenimiento', 'proximo_mantenimiento_km', 'km_para_mantenimiento')
+        }),
         ('Estado y Multimedia', {
             'fields': ('estado', 'foto', 'foto_preview_vehiculo') # Renombrado para claridad
         }),
@@ -167,4 +185,53 @@ class AsignacionAdmin(admin.ModelAdmin):
 class RegistroTurnoAdmin(admin.ModelAdmin):
     list_display = ('conductor', 'fecha_hora', 'tipo')
     list_filter = ('tipo', 'conductor')
-    search_fields = ('conductor__nombre', 'conductor__apellido')
\ No newline at end of file
+    search_fields = ('conductor__nombre', 'conductor__apellido')
+
+@admin.register(SesionTurno)
+class SesionTurnoAdmin(admin.ModelAdmin):
+    list_display = ('conductor', 'fecha', 'inicio', 'fin', 'horas')
+    list_filter = ('conductor',)
+    list_select_related = ('conductor',)
+    date_hierarchy = 'fecha'
+    readonly_fields = ('conductor', 'entrada', 'salida', 'fecha', 'inicio', 'fin', 'horas')
+
+@admin.register(TrabajoAsignacion)
+class TrabajoAsignacionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'estado', 'etapa', 'perfil', 'procesadas', 'total', 'fecha_creacion', 'fecha_fin')
+    list_filter = ('estado',)
+    readonly_fields = ('fecha_creacion', 'fecha_inicio', 'fecha_actualizacion', 'fecha_fin', 'resultados', 'error')
+
+@admin.register(PerfilAsignacion)
+class PerfilAsignacionAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'peso_cargo', 'peso_capacidad', 'peso_distancia', 'tipo_vehiculo', 'activo', 'fecha_modificacion')
+    list_editable = ('peso_cargo', 'peso_capacidad', 'peso_distancia', 'activo')
+    list_filter = ('activo', 'tipo_vehiculo')
+    search_fields = ('nombre',)
+
+@admin.register(ZonaRuta)
+class ZonaRutaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'lat', 'lon', 'radio_km', 'solicitudes', 'fecha_calculo')
+    search_fields = ('nombre',)
+
+@admin.register(DistanciaRuta)
+class DistanciaRutaAdmin(admin.ModelAdmin):
+    list_display = ('origen', 'destino', 'distancia_km', 'duracion_min')
+    list_select_related = ('origen', 'destino')
+    search_fields = ('origen__nombre', 'destino__nombre')
+
+@admin.register(ResumenDiario)
+class ResumenDiarioAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'estado', 'vehiculo', 'conductor', 'viajes', 'distancia_km', 'distancia_estimada_km')
+    list_filter = ('estado',)
+    list_select_related = ('vehiculo', 'conductor')
+    date_hierarchy = 'fecha'
+    readonly_fields = ('fecha', 'estado', 'vehiculo', 'conductor', 'viajes', 'distancia_km', 'distancia_estimada_km')
+
+
+@admin.register(Mantenimiento)
+class MantenimientoAdmin(admin.ModelAdmin):
+    list_display = ('vehiculo', 'fecha', 'kilometraje', 'tipo', 'costo')
+    list_filter = ('tipo',)
+    list_select_related = ('vehiculo',)
+    search_fields = ('vehiculo__patente', 'descripcion')
+    date_hierarchy = 'fecha'
@@ -0,0 +1,171 @@
+# asignaciones/cache_dashboard.py
+"""
+Caché de las secciones del dashboard, por (tipo_periodo, rango de fechas,
+sección).
+
+Las entradas viven DASHBOARD_CACHE_SEGUNDOS en el caché de Django. Cada
+clave incluye una generación que las señales de Asignacion/Vehiculo/
+Conductor (y las escrituras en bloque) incrementan, con lo que invalidar
+todo el dashboard es O(1). Para que muchos clientes abriendo el dashboard a
+la vez no recalculen lo mismo, sólo uno calcula cada entrada: dentro del
+proceso con un candado por clave y entre procesos con una marca en el caché
+(cache.add); el resto espera el resultado. Ambas cosas suponen un caché
+compartido entre procesos (settings.CACHES usa la base de datos).
+
+Las series por intervalo (series.py) se guardan intervalo por intervalo.
+Los que siguen abiertos usan la misma generación y duración que las
+secciones; los ya cerrados (terminados antes de hoy) llevan una generación
+propia, que sólo cambia al modificarse un viaje de días pasados, y duran
+DASHBOARD_CACHE_HISTORICO_SEGUNDOS, lo que además acota cuánto puede
+quedar desactualizado uno si el caché no es compartido (p. ej. LocMem).
+"""
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+PREFIJO = 'dashboard'
+GENERACION = 'generacion'
+GENERACION_HISTORICA = 'generacion_historica'
+
+# Tiempo máximo que otro proceso espera a quien está calculando una entrada
+# antes de calcularla él mismo. La consulta al caché (una lectura en la base)
+# se repite con espera creciente: INTERVALO_ESPERA, el doble... hasta
+# INTERVALO_ESPERA_MAXIMO
+ESPERA_MAXIMA = 5
+INTERVALO_ESPERA = 0.05
+INTERVALO_ESPERA_MAXIMO = 1.0
+
+_candados = {}
+_candado_global = threading.Lock()
+
+
+def _segundos():
+    return getattr(settings, 'DASHBOARD_CACHE_SEGUNDOS', 300)
+
+
+def _segundos_historico():
+    return getattr(settings, 'DASHBOARD_CACHE_HISTORICO_SEGUNDOS', 86400)
+
+
+def _generacion(contador=GENERACION):
+    generacion = cache.get(f'{PREFIJO}:{contador}')
+    if generacion is None:
+        cache.add(f'{PREFIJO}:{contador}', 0, None)
+        generacion = cache.get(f'{PREFIJO}:{contador}', 0)
+    return generacion
+
+
+def clave_dashboard(tipo_periodo, inicio, fin, seccion):
+    return f'{PREFIJO}:{_generacion()}:{tipo_periodo}:{inicio.isoformat()}:{fin.isoformat()}:{seccion}'
+
+
+def _candado(clave):
+    with _candado_global:
+        candado = _candados.get(clave)
+        if candado is None:
+            # Las claves de generaciones anteriores ya no se usan
+            if len(_candados) > 256:
+                _candados.clear()
+            candado = _candados[clave] = threading.Lock()
+        return candado
+
+
+def _esperar(clave):
+    """Espera a que otro proceso guarde la entrada; None si no lo hace a tiempo"""
+    limite = time.monotonic() + ESPERA_MAXIMA
+    intervalo = INTERVALO_ESPERA
+    while True:
+        valores = cache.get_many([clave, f'{clave}:calculando'])
+        if clave in valores or f'{clave}:calculando' not in valores:
+            return valores.get(clave)
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            return None
+        time.sleep(min(intervalo, restante))
+        intervalo = min(intervalo * 2, INTERVALO_ESPERA_MAXIMO)
+
+
+def obtener_dashboard(tipo_periodo, inicio, fin, seccion, calcular, forzar=False):
+    """
+    Datos de una sección del dashboard desde el caché, o `calcular()` si no
+    están (o si `forzar`). Devuelve (datos, desde_cache).
+    """
+    clave = clave_dashboard(tipo_periodo, inicio, fin, seccion)
+    if not forzar:
+        datos = cache.get(clave)
+        if datos is not None:
+            return datos, True
+
+    with _candado(clave):
+        if not forzar:
+            datos = cache.get(clave)
+            if datos is not None:
+                return datos, True
+            if not cache.add(f'{clave}:calculando', True, ESPERA_MAXIMA):
+                datos = _esperar(clave)
+                if datos is not None:
+                    return datos, True
+        try:
+            datos = calcular()
+            cache.set(clave, datos, _segundos())
+        finally:
+            cache.delete(f'{clave}:calculando')
+        return datos, False
+
+
+def _clave_intervalo(granularidad, inicio, cerrado):
+    if cerrado:
+        return f'{PREFIJO}:serie:h{_generacion(GENERACION_HISTORICA)}:{granularidad}:{inicio.isoformat()}'
+    return f'{PREFIJO}:serie:{_generacion()}:{granularidad}:{inicio.isoformat()}'
+
+
+def obtener_intervalos(granularidad, intervalos, calcular):
+    """
+    Datos por intervalo de una serie. `intervalos` es [(inicio, cerrado)] y
+    `calcular(inicios)` devuelve {inicio: datos} para los que falten en el
+    caché. Devuelve ({inicio: datos}, cantidad leída del caché).
+    """
+    claves = {inicio: _clave_intervalo(granularidad, inicio, cerrado) for inicio, cerrado in intervalos}
+    guardados = cache.get_many(list(claves.values()))
+    datos = {inicio: guardados[clave] for inicio, clave in claves.items() if clave in guardados}
+    faltantes = [inicio for inicio in claves if inicio not in datos]
+    if faltantes:
+        calculados = calcular(faltantes)
+        cerrados = dict(intervalos)
+        cache.set_many({claves[i]: calculados[i] for i in faltantes if cerrados[i]}, _segundos_historico())
+        cache.set_many({claves[i]: calculados[i] for i in faltantes if not cerrados[i]}, _segundos())
+        datos.update(calculados)
+    return datos, len(claves) - len(faltantes)
+
+
+def _incrementar_generacion(contador=GENERACION):
+    try:
+        cache.incr(f'{PREFIJO}:{contador}')
+    except ValueError:
+        cache.set(f'{PREFIJO}:{contador}', 1, None)
+
+
+def invalidar_dashboard():
+    """
+    Descarta todas las entradas. Dentro de una transacción espera al commit,
+    para que nadie vuelva a guardar en caché datos previos a la escritura.
+    """
+    transaction.on_commit(_incrementar_generacion)
+
+
+def invalidar_historico(fechas=None):
+    """
+    Descarta los intervalos cerrados de las series. Con `fechas` (locales)
+    sólo si alguna es anterior a hoy, ya que los intervalos que incluyen hoy
+    o días futuros nunca se guardan como cerrados.
+    """
+    if fechas is not None:
+        hoy = timezone.localdate()
+        if not any(fecha is not None and fecha < hoy for fecha in fechas):
+            return
+    transaction.on_commit(partial(_incrementar_generacion, GENERACION_HISTORICA))
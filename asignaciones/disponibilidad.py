@@ -0,0 +1,164 @@
+# asignaciones/disponibilidad.py
+"""
+Índice en memoria de las franjas horarias ya comprometidas por cada recurso
+(vehículo o conductor), para que el motor de asignación pueda reutilizar un
+mismo vehículo en viajes que no se traslapan.
+"""
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Q
+
+from .models import Asignacion
+
+# Estados de Asignacion que ocupan al vehículo/conductor en su franja horaria
+ESTADOS_OCUPAN = ('programada', 'activa')
+
+# Duración supuesta cuando la asignación no tiene fecha_hora_fin_prevista
+DURACION_POR_DEFECTO = timedelta(hours=2)
+
+
+def franja_asignacion(asignacion):
+    """Devuelve el intervalo semiabierto [inicio, fin) que ocupa una asignación"""
+    inicio = asignacion.fecha_hora_requerida_inicio
+    fin = asignacion.fecha_hora_fin_prevista or (inicio + DURACION_POR_DEFECTO)
+    return inicio, fin
+
+
+def _reservas(campo, desde=None):
+    """Asignaciones programadas/activas con recurso; sin las que terminaron antes de `desde`"""
+    reservas = Asignacion.objects.filter(estado__in=ESTADOS_OCUPAN)
+    reservas = reservas.filter(**{f'{campo}__isnull': False})
+    if desde is not None:
+        reservas = reservas.filter(
+            Q(fecha_hora_fin_prevista__gt=desde) |
+            Q(fecha_hora_fin_prevista__isnull=True,
+              fecha_hora_requerida_inicio__gt=desde - DURACION_POR_DEFECTO)
+        )
+    return reservas
+
+
+def traslapa_en_bd(campo, recurso, inicio, fin, excluir=None):
+    """
+    Indica si en la base hay una reserva programada/activa del recurso que
+    traslape [inicio, fin), sin contar la asignación `excluir`. Es la
+    comprobación definitiva dentro de la transacción que reserva: los índices
+    en memoria no ven lo que reservaron otros procesos.
+    """
+    reservas = _reservas(campo, desde=inicio).filter(
+        **{campo: recurso}, fecha_hora_requerida_inicio__lt=fin
+    )
+    if excluir is not None:
+        reservas = reservas.exclude(pk=excluir)
+    return reservas.exists()
+
+
+class IndiceDisponibilidad:
+    """
+    Intervalos ocupados por recurso, ordenados por inicio.
+
+    La consulta de traslape es O(log n + k): se busca por bisección el primer
+    intervalo que empieza después del fin consultado y se revisan hacia atrás
+    sólo los que pueden alcanzar el inicio (acotado por la duración máxima
+    registrada para ese recurso).
+    """
+
+    def __init__(self, campo='vehiculo_id'):
+        self.campo = campo
+        self._intervalos = defaultdict(list)      # recurso -> [(inicio, fin, asignacion_id)]
+        self._max_duracion = defaultdict(timedelta)
+        self._por_asignacion = {}                  # asignacion_id -> (recurso, inicio, fin)
+        self.desde = None
+
+    @classmethod
+    def desde_bd(cls, campo='vehiculo_id', desde=None):
+        """
+        Construye el índice con las asignaciones programadas/activas.
+        Si se indica `desde`, omite las reservas que terminaron antes.
+        """
+        indice = cls(campo)
+        indice.desde = desde
+        filas = _reservas(campo, desde).values_list(
+            'id', campo, 'fecha_hora_requerida_inicio', 'fecha_hora_fin_prevista'
+        )
+        for asignacion_id, recurso, inicio, fin in filas:
+            indice.agregar(recurso, inicio, fin or (inicio + DURACION_POR_DEFECTO), asignacion_id)
+        return indice
+
+    def recargar_recurso(self, recurso):
+        """Vuelve a leer de la base las franjas de un recurso (con el mismo `desde`)"""
+        for _, _, asignacion_id in self._intervalos.pop(recurso, ()):
+            self._por_asignacion.pop(asignacion_id, None)
+        self._max_duracion.pop(recurso, None)
+        filas = _reservas(self.campo, self.desde).filter(**{self.campo: recurso}).values_list(
+            'id', 'fecha_hora_requerida_inicio', 'fecha_hora_fin_prevista'
+        )
+        for asignacion_id, inicio, fin in filas:
+            self.agregar(recurso, inicio, fin or (inicio + DURACION_POR_DEFECTO), asignacion_id)
+
+    def agregar(self, recurso, inicio, fin, asignacion_id=None):
+        """Registra un intervalo ocupado [inicio, fin) para el recurso"""
+        if asignacion_id is not None:
+            self.quitar(asignacion_id)
+            self._por_asignacion[asignacion_id] = (recurso, inicio, fin)
+        insort(self._intervalos[recurso], (inicio, fin, asignacion_id or 0))
+        self._max_duracion[recurso] = max(self._max_duracion[recurso], fin - inicio)
+
+    def quitar(self, asignacion_id):
+        """Elimina el intervalo asociado a una asignación, si existe"""
+        registro = self._por_asignacion.pop(asignacion_id, None)
+        if registro is None:
+            return
+        recurso, inicio, fin = registro
+        intervalos = self._intervalos[recurso]
+        i = bisect_left(intervalos, (inicio, fin, asignacion_id))
+        if i < len(intervalos) and intervalos[i] == (inicio, fin, asignacion_id):
+            del intervalos[i]
+
+    def registrar(self, asignacion):
+        """
+        Sincroniza el índice con el estado actual de una asignación: la quita
+        y, si sigue ocupando un recurso, vuelve a agregar su franja.
+        """
+        self.quitar(asignacion.pk)
+        recurso = getattr(asignacion, self.campo)
+        if recurso is not None and asignacion.estado in ESTADOS_OCUPAN:
+            inicio, fin = franja_asignacion(asignacion)
+            self.agregar(recurso, inicio, fin, asignacion.pk)
+
+    def ocupados(self, recursos, inicios, fines):
+        """
+        Matriz booleana (franja × recurso) que indica qué recursos tienen un
+        intervalo que traslapa cada franja [inicios[i], fines[i]). Los
+        extremos son arreglos de timestamps (segundos). Por recurso basta una
+        bisección vectorizada: hay traslape si entre los intervalos que
+        empiezan antes del fin de la franja el mayor fin supera su inicio.
+        """
+        ocupado = np.zeros((len(inicios), len(recursos)), dtype=bool)
+        for j, recurso in enumerate(recursos):
+            intervalos = self._intervalos.get(recurso)
+            if not intervalos:
+                continue
+            comienzos = np.array([i.timestamp() for i, _, _ in intervalos])
+            max_fin = np.maximum.accumulate([f.timestamp() for _, f, _ in intervalos])
+            previos = np.searchsorted(comienzos, fines, side='left')
+            ocupado[:, j] = (previos > 0) & (max_fin[np.maximum(previos - 1, 0)] > inicios)
+        return ocupado
+
+    def esta_libre(self, recurso, inicio, fin):
+        """Indica si el recurso no tiene ningún intervalo que traslape [inicio, fin)"""
+        intervalos = self._intervalos.get(recurso)
+        if not intervalos:
+            return True
+        limite = inicio - self._max_duracion[recurso]
+        i = bisect_left(intervalos, (fin,))
+        while i > 0:
+            i -= 1
+            otro_inicio, otro_fin, _ = intervalos[i]
+            if otro_inicio <= limite:
+                break
+            if otro_fin > inicio:
+                return False
+        return True
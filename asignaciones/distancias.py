@@ -0,0 +1,78 @@
+# asignaciones/distancias.py
+"""
+Distancias origen-destino de los viajes.
+
+La distancia estimada de una solicitud se calcula una vez al guardarla
+(Asignacion.distancia_estimada_km) con un caché LRU por celdas de
+coordenadas redondeadas, de modo que las rutas repetidas (p. ej. hospital a
+hospital) no vuelven a calcularse. Entre zonas frecuentes se usa la
+distancia por la red vial precalculada (rutas.py); fuera de ellas, la
+distancia en línea recta. El caché se indexa también por la matriz vial
+vigente, que se relee cuando calcular_rutas publica una versión nueva (ver
+rutas.obtener_matriz): no se sirven distancias de la matriz anterior.
+"""
+from functools import lru_cache
+from math import radians, sin, cos, sqrt, atan2
+
+# Decimales de las celdas del caché (~11 m)
+DECIMALES_CELDA = 4
+
+
+def calcular_distancia_km(origen_lat, origen_lon, destino_lat, destino_lon):
+    if None in (origen_lat, origen_lon, destino_lat, destino_lon):
+        return 0
+    R = 6371
+    dlat = radians(destino_lat - origen_lat)
+    dlon = radians(destino_lon - origen_lon)
+    a = sin(dlat/2)**2 + cos(radians(origen_lat)) * cos(radians(destino_lat)) * sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+    return R * c
+
+
+@lru_cache(maxsize=8192)
+def _distancia_celdas(origen_lat, origen_lon, destino_lat, destino_lon, matriz_vial):
+    # `matriz_vial` es la MatrizOD vigente (None sin red vial): forma parte de
+    # la clave, así que una matriz nueva nunca usa distancias de la anterior
+    if matriz_vial is not None:
+        ruta = matriz_vial.ruta(origen_lat, origen_lon, destino_lat, destino_lon)
+        if ruta is not None:
+            return ruta[0]
+    return calcular_distancia_km(origen_lat, origen_lon, destino_lat, destino_lon)
+
+
+def limpiar_cache():
+    _distancia_celdas.cache_clear()
+
+
+def distancia_estimada_km(origen_lat, origen_lon, destino_lat, destino_lon, vial=True):
+    """
+    Distancia en km entre celdas redondeadas, por la red vial si ambas caen
+    en zonas de la matriz (y `vial`); None si falta alguna coordenada.
+    """
+    if None in (origen_lat, origen_lon, destino_lat, destino_lon):
+        return None
+    matriz_vial = None
+    if vial:
+        # rutas importa los modelos, que a su vez usan este módulo
+        from .rutas import obtener_matriz
+        matriz_vial = obtener_matriz()
+    return _distancia_celdas(
+        round(origen_lat, DECIMALES_CELDA), round(origen_lon, DECIMALES_CELDA),
+        round(destino_lat, DECIMALES_CELDA), round(destino_lon, DECIMALES_CELDA),
+        matriz_vial,
+    )
+
+
+def distancia_viaje_km(asignacion):
+    """
+    Distancia del viaje para el scoring: la almacenada si existe; si no (p. ej.
+    filas creadas con bulk_create), la estimada en el momento. 0 sin coordenadas.
+    """
+    almacenada = getattr(asignacion, 'distancia_estimada_km', None)
+    if almacenada is not None:
+        return almacenada
+    distancia = distancia_estimada_km(
+        asignacion.origen_lat, asignacion.origen_lon,
+        asignacion.destino_lat, asignacion.destino_lon
+    )
+    return 0 if distancia is None else distancia
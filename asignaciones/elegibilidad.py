@@ -0,0 +1,105 @@
+# asignaciones/elegibilidad.py
+"""
+Elegibilidad de conductores precomputada una vez por ejecución del motor,
+para que cada combinación conductor/vehículo se compruebe en O(1).
+"""
+from django.utils import timezone
+
+from .models import Conductor, Vehiculo
+from .optimizacion import resolver_asignacion_max_score
+
+# Estados de conductor que permiten recibir viajes (en turno)
+ESTADOS_CONDUCTOR_ASIGNABLES = ('disponible', 'en_ruta')
+
+# Un bit por tipo de vehículo
+BITS_TIPO_VEHICULO = {
+    tipo: 1 << i for i, (tipo, _) in enumerate(Vehiculo.TIPO_VEHICULO_CHOICES)
+}
+TODOS_LOS_TIPOS = sum(BITS_TIPO_VEHICULO.values())
+
+
+def mascara_tipos(tipos_vehiculo_habilitados):
+    """
+    Convierte el CSV de tipos_vehiculo_habilitados en una máscara de bits.
+    Un valor vacío o sin tipos reconocibles (p. ej. 'N/A' de los datos de
+    prueba) se interpreta como sin restricción.
+    """
+    mascara = 0
+    for tipo in (tipos_vehiculo_habilitados or '').split(','):
+        mascara |= BITS_TIPO_VEHICULO.get(tipo.strip().lower(), 0)
+    return mascara or TODOS_LOS_TIPOS
+
+
+class ElegibilidadConductores:
+    """Máscara de tipos y vencimiento de licencia por conductor asignable"""
+
+    def __init__(self, conductores):
+        self.conductores = {}
+        self._mascara = {}
+        self._vencimiento = {}
+        for conductor in conductores:
+            self.actualizar(conductor)
+
+    @classmethod
+    def desde_bd(cls):
+        return cls(list(Conductor.objects.filter(estado_disponibilidad__in=ESTADOS_CONDUCTOR_ASIGNABLES)))
+
+    def actualizar(self, conductor):
+        """Agrega o refresca un conductor; si ya no está en turno, lo quita"""
+        if conductor.estado_disponibilidad not in ESTADOS_CONDUCTOR_ASIGNABLES:
+            self.quitar(conductor.pk)
+            return
+        self.conductores[conductor.pk] = conductor
+        self._mascara[conductor.pk] = mascara_tipos(conductor.tipos_vehiculo_habilitados)
+        self._vencimiento[conductor.pk] = conductor.fecha_vencimiento_licencia
+
+    def quitar(self, conductor_id):
+        self.conductores.pop(conductor_id, None)
+        self._mascara.pop(conductor_id, None)
+        self._vencimiento.pop(conductor_id, None)
+
+    def puede_conducir(self, conductor_id, tipo_vehiculo, fecha):
+        """Indica si el conductor puede manejar ese tipo de vehículo en la fecha dada"""
+        mascara = self._mascara.get(conductor_id)
+        if mascara is None:
+            return False
+        return bool(mascara & BITS_TIPO_VEHICULO.get(tipo_vehiculo, TODOS_LOS_TIPOS)) and \
+            self._vencimiento[conductor_id] >= fecha
+
+
+def asignar_conductores(asignaciones, franjas, elegibilidad, indice):
+    """
+    Elige un conductor para cada asignación que ya tiene vehículo.
+
+    Resuelve por rondas con el método húngaro (a lo más un viaje por conductor
+    en cada ronda, lo que reparte la carga) respetando la elegibilidad y las
+    franjas ya ocupadas de cada conductor en `indice`. Asigna el atributo
+    `conductor` de las asignaciones y devuelve el número de viajes cubiertos.
+    """
+    ids = list(elegibilidad.conductores)
+    pendientes = [i for i, a in enumerate(asignaciones) if a.conductor_id is None]
+    cubiertas = 0
+    while pendientes and ids:
+        matriz = []
+        for i in pendientes:
+            asignacion = asignaciones[i]
+            inicio, fin = franjas[i]
+            tipo = asignacion.vehiculo.tipo_vehiculo
+            fecha = timezone.localtime(inicio).date()
+            matriz.append([
+                1.0 if (elegibilidad.puede_conducir(c, tipo, fecha)
+                        and indice.esta_libre(c, inicio, fin)) else None
+                for c in ids
+            ])
+        pares = resolver_asignacion_max_score(matriz)
+        if not pares:
+            break
+        for fila, j in pares:
+            i = pendientes[fila]
+            inicio, fin = franjas[i]
+            asignaciones[i].conductor = elegibilidad.conductores[ids[j]]
+            indice.agregar(ids[j], inicio, fin, asignaciones[i].pk)
+        cubiertas += len(pares)
+        asignados = {pendientes[fila] for fila, _ in pares}
+        pendientes = [i for i in pendientes if i not in asignados]
+    return cubiertas
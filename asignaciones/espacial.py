@@ -0,0 +1,138 @@
+# asignaciones/espacial.py
+"""
+Índice espacial en memoria para elegir los vehículos más cercanos al origen
+de una solicitud sin recorrer toda la flota.
+
+Divide el plano lat/lon en celdas de TAMANO_CELDA grados y guarda en cada
+celda los recursos que están en ella; la búsqueda recorre anillos de celdas
+alrededor del punto hasta tener k candidatos y asegurar que ningún anillo
+más lejano puede mejorarlos.
+"""
+import math
+from collections import defaultdict
+
+from .distancias import calcular_distancia_km
+
+# ~5,5 km de lado en latitud
+TAMANO_CELDA = 0.05
+
+KM_POR_GRADO = 111.32
+
+
+def posicion_vehiculo(vehiculo):
+    """Última posición conocida del vehículo, o su base; None si no tiene ninguna"""
+    if vehiculo.ultima_lat is not None and vehiculo.ultima_lon is not None:
+        return vehiculo.ultima_lat, vehiculo.ultima_lon
+    if vehiculo.base_lat is not None and vehiculo.base_lon is not None:
+        return vehiculo.base_lat, vehiculo.base_lon
+    return None
+
+
+def _anillo(fila, columna, radio):
+    """Celdas a distancia de Chebyshev exactamente `radio` de (fila, columna)"""
+    if radio == 0:
+        yield fila, columna
+        return
+    for c in range(columna - radio, columna + radio + 1):
+        yield fila - radio, c
+        yield fila + radio, c
+    for f in range(fila - radio + 1, fila + radio):
+        yield f, columna - radio
+        yield f, columna + radio
+
+
+class IndiceEspacial:
+    """Recursos (p. ej. vehículos) por celda de una grilla lat/lon"""
+
+    def __init__(self, tamano_celda=TAMANO_CELDA):
+        self.tamano_celda = tamano_celda
+        self._celdas = defaultdict(set)
+        self._posiciones = {}
+        self._limites = None
+
+    @classmethod
+    def desde_vehiculos(cls, vehiculos, clave=lambda v: v.pk):
+        """Índice de los vehículos con posición; `clave` define cómo se identifican"""
+        indice = cls()
+        for v in vehiculos:
+            posicion = posicion_vehiculo(v)
+            if posicion is not None:
+                indice.agregar(clave(v), *posicion)
+        return indice
+
+    def _celda(self, lat, lon):
+        return math.floor(lat / self.tamano_celda), math.floor(lon / self.tamano_celda)
+
+    def __contains__(self, recurso):
+        return recurso in self._posiciones
+
+    def agregar(self, recurso, lat, lon):
+        self.quitar(recurso)
+        self._posiciones[recurso] = (lat, lon)
+        celda = self._celda(lat, lon)
+        if celda not in self._celdas:
+            self._limites = None
+        self._celdas[celda].add(recurso)
+
+    def quitar(self, recurso):
+        posicion = self._posiciones.pop(recurso, None)
+        if posicion is None:
+            return
+        celda = self._celda(*posicion)
+        self._celdas[celda].discard(recurso)
+        if not self._celdas[celda]:
+            del self._celdas[celda]
+            self._limites = None
+
+    def actualizar_vehiculo(self, vehiculo, clave=None):
+        """Reubica un vehículo según su posición actual (lo quita si no tiene)"""
+        recurso = vehiculo.pk if clave is None else clave
+        posicion = posicion_vehiculo(vehiculo)
+        if posicion is None:
+            self.quitar(recurso)
+        else:
+            self.agregar(recurso, *posicion)
+
+    def _cota_anillo(self, lat, radio):
+        """
+        Cota inferior en km de la distancia a cualquier punto del anillo
+        `radio`: radio-1 celdas completas, medidas en longitud (el lado más
+        corto de la celda) a la latitud más alejada del ecuador que alcanza.
+        """
+        latitud = min(89.0, abs(lat) + (radio + 1) * self.tamano_celda)
+        return max(0, radio - 1) * self.tamano_celda * KM_POR_GRADO * math.cos(math.radians(latitud))
+
+    def cercanos(self, lat, lon, k, filtro=None, hasta_km=None):
+        """
+        Los k recursos más cercanos a (lat, lon) que cumplen `filtro`, del más
+        cercano al más lejano, como lista de (recurso, distancia_km). Con
+        `hasta_km` sólo se consideran los que están a esa distancia o menos.
+        """
+        if not self._posiciones or k <= 0:
+            return []
+        fila, columna = self._celda(lat, lon)
+        if self._limites is None:
+            filas = [f for f, _ in self._celdas]
+            columnas = [c for _, c in self._celdas]
+            self._limites = min(filas), max(filas), min(columnas), max(columnas)
+        fila_min, fila_max, columna_min, columna_max = self._limites
+        radio_maximo = max(
+            abs(fila - fila_min), abs(fila - fila_max),
+            abs(columna - columna_min), abs(columna - columna_max),
+        )
+        encontrados = []
+        for radio in range(radio_maximo + 1):
+            cota = self._cota_anillo(lat, radio)
+            if len(encontrados) >= k and encontrados[k - 1][1] <= cota:
+                break
+            if hasta_km is not None and cota > hasta_km:
+                break
+            for celda in _anillo(fila, columna, radio):
+                for recurso in self._celdas.get(celda, ()):
+                    if filtro is not None and not filtro(recurso):
+                        continue
+                    encontrados.append((recurso, calcular_distancia_km(lat, lon, *self._posiciones[recurso])))
+            encontrados.sort(key=lambda par: par[1])
+        if hasta_km is not None:
+            encontrados = [par for par in encontrados if par[1] <= hasta_km]
+        return encontrados[:k]
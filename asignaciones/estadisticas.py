@@ -0,0 +1,53 @@
+# asignaciones/estadisticas.py
+"""
+Conteos compartidos por el dashboard y otras vistas, calculados con una
+sola consulta agregada por tabla (Count/Sum con filter=) en lugar de un
+count() por estado: en bases remotas cada consulta es un viaje de red.
+"""
+from django.db.models import Count, Q, Sum
+
+from .models import Vehiculo, Conductor, Asignacion, ResumenDiario
+
+ESTADOS_PENDIENTES = ('pendiente_auto', 'programada', 'activa')
+
+
+def _conteos_por_estado(modelo, campo, opciones):
+    """{'total': n, <estado>: n, ...} para todas las `opciones` de `campo`"""
+    return modelo.objects.aggregate(
+        total=Count('id'),
+        **{valor: Count('id', filter=Q(**{campo: valor})) for valor, _ in opciones}
+    )
+
+
+def conteos_flota():
+    """Vehículos por estado y conductores por disponibilidad: dos consultas"""
+    return {
+        'vehiculos': _conteos_por_estado(Vehiculo, 'estado', Vehiculo.ESTADO_CHOICES),
+        'conductores': _conteos_por_estado(
+            Conductor, 'estado_disponibilidad', Conductor.ESTADO_DISPONIBILIDAD_CHOICES
+        ),
+    }
+
+
+def resumen_asignaciones(inicio, fin):
+    """
+    Totales de las asignaciones con inicio entre dos fechas (inclusive), desde
+    el resumen diario, en una consulta. Los vehículos y conductores utilizados
+    cuentan "sin asignar" como uno más, igual que values().distinct().
+    """
+    totales = ResumenDiario.objects.filter(fecha__range=[inicio, fin]).aggregate(
+        total=Sum('viajes'),
+        **{valor: Sum('viajes', filter=Q(estado=valor)) for valor, _ in Asignacion.ESTADO_ASIGNACION_CHOICES},
+        distancia_km=Sum('distancia_km'),
+        distancia_estimada_pendiente_km=Sum(
+            'distancia_estimada_km', filter=Q(estado__in=ESTADOS_PENDIENTES)
+        ),
+        vehiculos_utilizados=Count('vehiculo', distinct=True),
+        sin_vehiculo=Count('id', filter=Q(vehiculo__isnull=True)),
+        conductores_utilizados=Count('conductor', distinct=True),
+        sin_conductor=Count('id', filter=Q(conductor__isnull=True)),
+    )
+    totales = {clave: valor or 0 for clave, valor in totales.items()}
+    totales['vehiculos_utilizados'] += 1 if totales.pop('sin_vehiculo') else 0
+    totales['conductores_utilizados'] += 1 if totales.pop('sin_conductor') else 0
+    return totales
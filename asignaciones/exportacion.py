@@ -0,0 +1,92 @@
+# asignaciones/exportacion.py
+"""
+Exportación del historial de asignaciones en CSV o NDJSON (una línea JSON
+por viaje), generada fila a fila desde .values_list().iterator() para que
+la memoria no dependa de la cantidad de filas. En PostgreSQL el iterador
+usa un cursor del lado del servidor.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# (columna, campo de la consulta)
+COLUMNAS = (
+    ('id', 'id'),
+    ('estado', 'estado'),
+    ('fecha_hora_requerida_inicio', 'fecha_hora_requerida_inicio'),
+    ('fecha_hora_fin_prevista', 'fecha_hora_fin_prevista'),
+    ('vehiculo_id', 'vehiculo_id'),
+    ('vehiculo_patente', 'vehiculo__patente'),
+    ('conductor_id', 'conductor_id'),
+    ('conductor_nombre', 'conductor__nombre'),
+    ('conductor_apellido', 'conductor__apellido'),
+    ('origen_descripcion', 'origen_descripcion'),
+    ('origen_lat', 'origen_lat'),
+    ('origen_lon', 'origen_lon'),
+    ('destino_descripcion', 'destino_descripcion'),
+    ('destino_lat', 'destino_lat'),
+    ('destino_lon', 'destino_lon'),
+    ('req_pasajeros', 'req_pasajeros'),
+    ('solicitante_nombre', 'solicitante_nombre'),
+    ('solicitante_jerarquia', 'solicitante_jerarquia'),
+    ('responsable_nombre', 'responsable_nombre'),
+    ('distancia_recorrida_km', 'distancia_recorrida_km'),
+    ('distancia_estimada_km', 'distancia_estimada_km'),
+    ('observaciones', 'observaciones'),
+)
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+# Filas por viaje a la base y por fragmento enviado al cliente
+TAMANO_LOTE = 2000
+FILAS_POR_FRAGMENTO = 500
+
+
+def _filas(queryset, tamano_lote):
+    return queryset.values_list(*(campo for _, campo in COLUMNAS)).iterator(chunk_size=tamano_lote)
+
+
+class _Buffer:
+    """Destino de csv.writer que devuelve lo escrito en vez de guardarlo"""
+
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(queryset, tamano_lote=TAMANO_LOTE):
+    escritor = csv.writer(_Buffer())
+    yield escritor.writerow([columna for columna, _ in COLUMNAS])
+    fragmento = []
+    for fila in _filas(queryset, tamano_lote):
+        fragmento.append(escritor.writerow(
+            [valor.isoformat() if hasattr(valor, 'isoformat') else valor for valor in fila]
+        ))
+        if len(fragmento) >= FILAS_POR_FRAGMENTO:
+            yield ''.join(fragmento)
+            fragmento = []
+    if fragmento:
+        yield ''.join(fragmento)
+
+
+def lineas_ndjson(queryset, tamano_lote=TAMANO_LOTE):
+    columnas = [columna for columna, _ in COLUMNAS]
+    fragmento = []
+    for fila in _filas(queryset, tamano_lote):
+        fragmento.append(json.dumps(dict(zip(columnas, fila)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+        if len(fragmento) >= FILAS_POR_FRAGMENTO:
+            yield ''.join(fragmento)
+            fragmento = []
+    if fragmento:
+        yield ''.join(fragmento)
+
+
+def lineas_exportacion(queryset, formato, tamano_lote=TAMANO_LOTE):
+    """Generador de fragmentos de texto del `formato` pedido ('csv' o 'ndjson')"""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}. Opciones: {', '.join(FORMATOS)}.")
+    generador = lineas_csv if formato == 'csv' else lineas_ndjson
+    return generador(queryset, tamano_lote)
@@ -0,0 +1,26 @@
+# asignaciones/fechas.py
+"""
+Rangos de fechas locales expresados como intervalos semiabiertos de
+fecha-hora, [inicio del primer día, inicio del día siguiente al último).
+A diferencia de __date/__date__range, que aplican una conversión a la
+columna, estos filtros pueden usar los índices sobre el campo.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def inicio_dia(fecha):
+    """Primer instante de `fecha` en la zona horaria actual"""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def rango_dias(desde, hasta):
+    """(inicio, fin) semiabierto que cubre los días locales desde..hasta inclusive"""
+    return inicio_dia(desde), inicio_dia(hasta + timedelta(days=1))
+
+
+def filtro_dias(campo, desde, hasta):
+    """kwargs de filter() equivalentes a {campo}__date__range=[desde, hasta]"""
+    inicio, fin = rango_dias(desde, hasta)
+    return {f'{campo}__gte': inicio, f'{campo}__lt': fin}
@@ -0,0 +1,45 @@
+# asignaciones/filters.py
+from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
+
+from .fechas import filtro_dias
+from .models import Asignacion, RegistroTurno
+
+
+class FechaLocalFilter(filters.DateFilter):
+    """
+    Filtra un DateTimeField por día local con un rango semiabierto, en vez de
+    convertir la columna con __date (que impide usar sus índices)
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        qs = qs.filter(**filtro_dias(self.field_name, value, value))
+        return qs.distinct() if self.distinct else qs
+
+
+class AsignacionFilter(filters.FilterSet):
+    fecha_hora_requerida_inicio__date = FechaLocalFilter(field_name='fecha_hora_requerida_inicio')
+
+    class Meta:
+        model = Asignacion
+        fields = {
+            'estado': ['exact'],
+            'vehiculo__patente': ['exact', 'icontains'], # Ajustado para buscar por patente
+            'conductor__apellido': ['exact', 'icontains'],
+            'fecha_hora_requerida_inicio': ['exact', 'gte', 'lte'],
+            'solicitante_nombre': ['icontains'], # Para buscar por nombre del solicitante
+            'solicitante_jerarquia': ['exact'], # Para filtrar por jerarquía
+        }
+
+
+class RegistroTurnoFilter(filters.FilterSet):
+    fecha_hora__date = FechaLocalFilter(field_name='fecha_hora')
+
+    class Meta:
+        model = RegistroTurno
+        fields = {
+            'conductor': ['exact'],
+            'fecha_hora': ['gte', 'lte'],
+        }
@@ -0,0 +1,128 @@
+# asignaciones/flota.py
+"""
+Foto en memoria de la flota asignable (vehículos, conductores y franjas
+reservadas) para la asignación incremental. Se mantiene al día con las
+señales post_save/post_delete de signals.py y se recarga completa cada
+EDAD_MAXIMA, lo que cubre las escrituras hechas por otros procesos.
+"""
+import threading
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .disponibilidad import IndiceDisponibilidad
+from .elegibilidad import ElegibilidadConductores
+from .espacial import IndiceEspacial
+from .models import Vehiculo
+from .perfiles import cargar_perfiles
+
+# Estados de vehículo que el motor puede comprometer; un vehículo 'reservado'
+# sigue siendo elegible para franjas que no se traslapen con sus reservas.
+ESTADOS_VEHICULO_ASIGNABLES = ('disponible', 'reservado')
+
+# Antigüedad máxima de la foto antes de recargarla completa
+EDAD_MAXIMA = timedelta(minutes=5)
+
+
+class SnapshotFlota:
+    """
+    Vehículos asignables con su índice espacial, elegibilidad de conductores,
+    perfiles de scoring e índices de franjas
+    """
+
+    def __init__(self):
+        self.candado = threading.RLock()
+        self.cargar()
+
+    def cargar(self):
+        with self.candado:
+            ahora = timezone.now()
+            self.vehiculos = {
+                v.pk: v for v in Vehiculo.objects.filter(estado__in=ESTADOS_VEHICULO_ASIGNABLES)
+            }
+            self.espacial = IndiceEspacial.desde_vehiculos(self.vehiculos.values())
+            self.elegibilidad = ElegibilidadConductores.desde_bd()
+            self.perfiles = cargar_perfiles()
+            self.indice_vehiculos = IndiceDisponibilidad.desde_bd(desde=ahora)
+            self.indice_conductores = IndiceDisponibilidad.desde_bd(campo='conductor_id', desde=ahora)
+            self.cargado_en = ahora
+
+    @property
+    def vencido(self):
+        return timezone.now() - self.cargado_en > EDAD_MAXIMA
+
+    def actualizar_vehiculo(self, vehiculo_id):
+        # Se relee la fila: la instancia que dispara la señal puede tener la
+        # versión todavía como expresión F sin resolver
+        vehiculo = Vehiculo.objects.filter(
+            pk=vehiculo_id, estado__in=ESTADOS_VEHICULO_ASIGNABLES
+        ).first()
+        with self.candado:
+            if vehiculo is None:
+                self.vehiculos.pop(vehiculo_id, None)
+                self.espacial.quitar(vehiculo_id)
+            else:
+                self.vehiculos[vehiculo_id] = vehiculo
+                self.espacial.actualizar_vehiculo(vehiculo)
+                # Una versión nueva puede deberse a reservas de otro proceso
+                # que la foto no vio: se releen también sus franjas
+                self.indice_vehiculos.recargar_recurso(vehiculo_id)
+
+    def actualizar_franjas_conductor(self, conductor_id):
+        with self.candado:
+            self.indice_conductores.recargar_recurso(conductor_id)
+
+    def quitar_vehiculo(self, vehiculo_id):
+        with self.candado:
+            self.vehiculos.pop(vehiculo_id, None)
+            self.espacial.quitar(vehiculo_id)
+
+    def recargar_perfiles(self):
+        perfiles = cargar_perfiles()
+        with self.candado:
+            self.perfiles = perfiles
+
+    def actualizar_conductor(self, conductor):
+        with self.candado:
+            self.elegibilidad.actualizar(conductor)
+
+    def quitar_conductor(self, conductor_id):
+        with self.candado:
+            self.elegibilidad.quitar(conductor_id)
+
+    def actualizar_asignacion(self, asignacion):
+        with self.candado:
+            self.indice_vehiculos.registrar(asignacion)
+            self.indice_conductores.registrar(asignacion)
+
+    def quitar_asignacion(self, asignacion_id):
+        with self.candado:
+            self.indice_vehiculos.quitar(asignacion_id)
+            self.indice_conductores.quitar(asignacion_id)
+
+
+_snapshot = None
+_candado_global = threading.Lock()
+
+
+def obtener_snapshot(recargar=False):
+    """Devuelve la foto de la flota del proceso, cargándola o recargándola si hace falta"""
+    global _snapshot
+    with _candado_global:
+        if _snapshot is None:
+            _snapshot = SnapshotFlota()
+        elif recargar or _snapshot.vencido:
+            _snapshot.cargar()
+        return _snapshot
+
+
+def snapshot_actual():
+    """La foto ya cargada, o None; las señales no deben forzar una carga"""
+    return _snapshot
+
+
+def invalidar_snapshot():
+    """Fuerza la recarga en el próximo uso (p. ej. tras escrituras en bloque)"""
+    global _snapshot
+    with _candado_global:
+        _snapshot = None
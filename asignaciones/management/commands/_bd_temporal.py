@@ -0,0 +1,40 @@
+# asignaciones/management/commands/_bd_temporal.py
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.core.management.base import CommandError
+from django.db import connection
+
+
+@contextmanager
+def bd_temporal(en_memoria=False, forzar=False):
+    """
+    Crea una base de datos desechable (con todas las migraciones aplicadas)
+    sobre el motor configurado y la elimina al salir. Permite correr pruebas
+    de carga y simulaciones sin tocar los datos reales. Con SQLite y
+    `en_memoria` la base vive en memoria (sólo para un hilo).
+
+    En otro motor (p. ej. Azure SQL) crear la base implica borrar sin aviso
+    una de igual nombre en ese servidor, así que sólo se hace con `forzar`.
+    """
+    if connection.vendor != 'sqlite' and not forzar:
+        raise CommandError(
+            f'Refusing to create a throwaway database on the {connection.vendor} server '
+            f"'{connection.settings_dict['NAME']}'; use SQLite (USE_LOCAL_DB=True) or pass --forzar."
+        )
+    archivo = None
+    if connection.vendor == 'sqlite' and not en_memoria:
+        # En archivo (no en memoria) para que varios hilos compartan los datos
+        descriptor, archivo = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(descriptor)
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = archivo
+    nombre_original = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+        if archivo and os.path.exists(archivo):
+            os.remove(archivo)
@@ -0,0 +1,93 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from asignaciones.distancias import distancia_estimada_km
+from asignaciones.models import Asignacion, ZonaRuta, DistanciaRuta
+from asignaciones.resumenes import reconstruir_resumenes
+from asignaciones.rutas import (
+    GrafoVial, zonas_frecuentes, calcular_distancias_zonas, invalidar_matriz
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a local road-network extract (GeoJSON lines, e.g. converted from an OSM '
+        'region) and precompute the road distance matrix between frequent trip zones. '
+        'Runs fully offline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('grafo', help='Path to the road network GeoJSON file')
+        parser.add_argument('--zonas', type=int, default=40, help='Number of frequent zones to keep (default: 40)')
+        parser.add_argument('--radio', type=float, default=1.0, help='Zone radius in km (default: 1.0)')
+        parser.add_argument(
+            '--consulta', nargs=4, type=float, metavar=('ORIGEN_LAT', 'ORIGEN_LON', 'DESTINO_LAT', 'DESTINO_LON'),
+            help='Only print the road distance between two points with A* and exit'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            grafo = GrafoVial.desde_geojson(options['grafo'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot load road network {options['grafo']}: {e}")
+        if not grafo.nodos:
+            raise CommandError('The road network file has no line features.')
+        self.stdout.write(
+            f'Road network loaded: {len(grafo.nodos)} nodes, {grafo.cantidad_aristas} directed edges '
+            f'({time.perf_counter() - inicio:.1f}s)'
+        )
+
+        if options['consulta']:
+            self._consultar(grafo, *options['consulta'])
+            return
+
+        zonas = zonas_frecuentes(options['zonas'], radio_km=options['radio'])
+        if not zonas:
+            raise CommandError('There are no trips with coordinates to derive zones from.')
+
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            ZonaRuta.objects.all().delete()
+            zonas = ZonaRuta.objects.bulk_create(zonas)
+            distancias = DistanciaRuta.objects.bulk_create(
+                calcular_distancias_zonas(grafo, zonas), batch_size=1000
+            )
+        self.stdout.write(
+            f'{len(distancias)} zone pairs computed for {len(zonas)} zones '
+            f'({time.perf_counter() - inicio:.1f}s)'
+        )
+
+        invalidar_matriz()
+        actualizadas = self._actualizar_solicitudes()
+        if actualizadas:
+            # bulk_update no pasa por las señales que mantienen el resumen diario
+            reconstruir_resumenes()
+        self.stdout.write(self.style.SUCCESS(f'Road distance matrix saved; {actualizadas} stored trip distances updated.'))
+
+    def _consultar(self, grafo, origen_lat, origen_lon, destino_lat, destino_lon):
+        ruta = grafo.ruta_entre_puntos(origen_lat, origen_lon, destino_lat, destino_lon)
+        recta = distancia_estimada_km(origen_lat, origen_lon, destino_lat, destino_lon, vial=False)
+        if ruta is None:
+            self.stdout.write(self.style.WARNING(f'No road path found (straight line: {recta:.2f} km).'))
+            return
+        self.stdout.write(f'Road: {ruta[0]:.2f} km, {ruta[1]:.0f} min (straight line: {recta:.2f} km)')
+
+    def _actualizar_solicitudes(self):
+        """Recalcula la distancia almacenada de los viajes con la nueva matriz"""
+        actualizadas = 0
+        lote = []
+        for asignacion in Asignacion.objects.only(
+            'id', 'origen_lat', 'origen_lon', 'destino_lat', 'destino_lon', 'distancia_estimada_km'
+        ).iterator(chunk_size=1000):
+            anterior = asignacion.distancia_estimada_km
+            if asignacion.calcular_distancia_estimada() != anterior:
+                lote.append(asignacion)
+            if len(lote) >= 1000:
+                Asignacion.objects.bulk_update(lote, ['distancia_estimada_km'])
+                actualizadas += len(lote)
+                lote = []
+        Asignacion.objects.bulk_update(lote, ['distancia_estimada_km'])
+        return actualizadas + len(lote)
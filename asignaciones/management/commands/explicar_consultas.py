@@ -0,0 +1,136 @@
+import random
+import statistics
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from asignaciones.fechas import filtro_dias
+from asignaciones.models import Vehiculo, Conductor, Asignacion, RegistroTurno
+
+from ._bd_temporal import bd_temporal
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare query plans and timings of date filters written with __date (casts the '
+        'column) against the equivalent half-open datetime ranges (can use the indexes)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sintetico', type=int, default=0, metavar='N',
+            help='Run on a throwaway database seeded with N synthetic trips instead of the real data'
+        )
+        parser.add_argument('--dias', type=int, default=7, help='Width in days of the filtered range (default: 7)')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Executions timed per query (default: 20)')
+        parser.add_argument('--semilla', type=int, default=1, help='Random seed for the synthetic data')
+        parser.add_argument(
+            '--forzar', action='store_true',
+            help='Allow --sintetico to create (and overwrite) a throwaway database on a non-SQLite server'
+        )
+
+    def handle(self, *args, **options):
+        contexto = bd_temporal(forzar=options['forzar']) if options['sintetico'] else nullcontext()
+        with contexto:
+            if options['sintetico']:
+                random.seed(options['semilla'])
+                self._sembrar(options['sintetico'])
+            self._comparar(options)
+
+    def _sembrar(self, cantidad):
+        self.stdout.write(f'Seeding {cantidad} synthetic trips...')
+        Vehiculo.objects.bulk_create([
+            Vehiculo(marca='Sim', modelo='Test', patente=f'EX-{i:04d}') for i in range(50)
+        ])
+        Conductor.objects.bulk_create([
+            Conductor(
+                nombre=f'Sim{i}', apellido='Test', numero_licencia=f'EX-{i:05d}',
+                fecha_vencimiento_licencia=timezone.now().date() + timedelta(days=365),
+            )
+            for i in range(50)
+        ])
+        vehiculos = list(Vehiculo.objects.values_list('pk', flat=True))
+        conductores = list(Conductor.objects.values_list('pk', flat=True))
+        estados = [e for e, _ in Asignacion.ESTADO_ASIGNACION_CHOICES]
+        ahora = timezone.now()
+        Asignacion.objects.bulk_create(
+            (
+                Asignacion(
+                    fecha_hora_requerida_inicio=ahora - timedelta(minutes=random.randint(0, 2 * 365 * 24 * 60)),
+                    estado=random.choice(estados),
+                    vehiculo_id=random.choice(vehiculos),
+                    conductor_id=random.choice(conductores),
+                )
+                for _ in range(cantidad)
+            ),
+            batch_size=2000,
+        )
+        RegistroTurno.objects.bulk_create(
+            (
+                RegistroTurno(
+                    conductor_id=random.choice(conductores), tipo=random.choice(['entrada', 'salida']),
+                    fecha_hora=ahora - timedelta(minutes=random.randint(0, 2 * 365 * 24 * 60)),
+                )
+                for _ in range(cantidad // 2)
+            ),
+            batch_size=2000,
+        )
+
+    def _comparar(self, options):
+        hasta = timezone.localdate()
+        desde = hasta - timedelta(days=options['dias'] - 1)
+        vehiculo = Asignacion.objects.exclude(vehiculo=None).values_list('vehiculo_id', flat=True).first()
+        conductor = Asignacion.objects.exclude(conductor=None).values_list('conductor_id', flat=True).first()
+        rango = filtro_dias('fecha_hora_requerida_inicio', desde, hasta)
+        casos = [
+            (
+                'Trips in period (dashboard map)',
+                Asignacion.objects.filter(fecha_hora_requerida_inicio__date__range=[desde, hasta]),
+                Asignacion.objects.filter(**rango),
+            ),
+            (
+                'Trips in period by estado',
+                Asignacion.objects.filter(estado='programada', fecha_hora_requerida_inicio__date__range=[desde, hasta]),
+                Asignacion.objects.filter(estado='programada', **rango),
+            ),
+            (
+                'Trips in period by vehicle',
+                Asignacion.objects.filter(vehiculo_id=vehiculo, fecha_hora_requerida_inicio__date__range=[desde, hasta]),
+                Asignacion.objects.filter(vehiculo_id=vehiculo, **rango),
+            ),
+            (
+                'Trips in period by driver',
+                Asignacion.objects.filter(conductor_id=conductor, fecha_hora_requerida_inicio__date__range=[desde, hasta]),
+                Asignacion.objects.filter(conductor_id=conductor, **rango),
+            ),
+            (
+                'Shift records of a driver on a day',
+                RegistroTurno.objects.filter(conductor_id=conductor, fecha_hora__date=hasta),
+                RegistroTurno.objects.filter(conductor_id=conductor, **filtro_dias('fecha_hora', hasta, hasta)),
+            ),
+        ]
+        self.stdout.write(
+            f'{Asignacion.objects.count()} trips, {RegistroTurno.objects.count()} shift records; '
+            f'range {desde} .. {hasta}\n'
+        )
+        for titulo, con_cast, semiabierto in casos:
+            self.stdout.write(self.style.MIGRATE_HEADING(titulo))
+            for etiqueta, consulta in (('__date', con_cast), ('range', semiabierto)):
+                consulta = consulta.order_by()
+                filas, milisegundos = self._medir(consulta, options['repeticiones'])
+                self.stdout.write(f'  {etiqueta:7} {filas:>7} rows  median {milisegundos:8.2f} ms')
+                for linea in consulta.explain().splitlines():
+                    self.stdout.write(f'          {linea}')
+            self.stdout.write('')
+
+    def _medir(self, consulta, repeticiones):
+        tiempos = []
+        filas = 0
+        for _ in range(max(1, repeticiones)):
+            inicio = time.perf_counter()
+            filas = len(consulta.values_list('pk', flat=True))
+            tiempos.append(time.perf_counter() - inicio)
+        return filas, statistics.median(tiempos) * 1000
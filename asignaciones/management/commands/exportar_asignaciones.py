@@ -0,0 +1,61 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from asignaciones.exportacion import FORMATOS, TAMANO_LOTE, lineas_exportacion
+from asignaciones.filters import AsignacionFilter
+from asignaciones.models import Asignacion
+
+
+class Command(BaseCommand):
+    help = (
+        'Export the assignment history as CSV or NDJSON, streaming rows from the '
+        'database so memory stays flat. Accepts the same filters as the API listing.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv', help='Output format (default: csv)')
+        parser.add_argument('--salida', help='Output file (default: standard output)')
+        parser.add_argument(
+            '--filtro', action='append', default=[], metavar='CAMPO=VALOR',
+            help='API filter, e.g. --filtro estado=completada '
+                 '--filtro fecha_hora_requerida_inicio__gte=2025-01-01 (repeatable)'
+        )
+        parser.add_argument(
+            '--tamano-lote', type=int, default=TAMANO_LOTE,
+            help=f'Rows fetched from the database per round trip (default: {TAMANO_LOTE})'
+        )
+
+    def handle(self, *args, **options):
+        datos = {}
+        for filtro in options['filtro']:
+            campo, separador, valor = filtro.partition('=')
+            if not separador:
+                raise CommandError(f'Invalid filter {filtro!r}; expected CAMPO=VALOR.')
+            datos[campo] = valor
+
+        filtros = AsignacionFilter(
+            datos, queryset=Asignacion.objects.order_by('fecha_hora_requerida_inicio', 'id')
+        )
+        desconocidos = set(datos) - set(filtros.filters)
+        if desconocidos:
+            raise CommandError(
+                f"Unknown filters: {', '.join(sorted(desconocidos))}. "
+                f"Available: {', '.join(sorted(filtros.filters))}."
+            )
+        if not filtros.is_valid():
+            raise CommandError(f'Invalid filter values: {filtros.errors.as_text()}')
+
+        inicio = time.perf_counter()
+        salida = open(options['salida'], 'w', encoding='utf-8', newline='') if options['salida'] else sys.stdout
+        try:
+            for fragmento in lineas_exportacion(filtros.qs, options['formato'], options['tamano_lote']):
+                salida.write(fragmento)
+        finally:
+            if salida is not sys.stdout:
+                salida.close()
+        if options['salida']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Exported to {options['salida']} ({time.perf_counter() - inicio:.1f}s)"
+            ))
@@ -1,9 +1,9 @@
 import random
-import math
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from faker import Faker
 from asignaciones.models import Vehiculo, Conductor, Asignacion, RegistroTurno
+from asignaciones.services import calcular_distancia_km
 
 class Command(BaseCommand):
     help = 'Populate the database with synthetic data'
@@ -118,19 +118,7 @@ class Command(BaseCommand):
             destino_lon = destino_info['lon'] + random.uniform(-0.02, 0.02)
 
             # Calcular distancia haversine
-            R = 6371  # Radio de la Tierra en km
-            lat1_rad = math.radians(origen_lat)
-            lon1_rad = math.radians(origen_lon)
-            lat2_rad = math.radians(destino_lat)
-            lon2_rad = math.radians(destino_lon)
-
-            dlon = lon2_rad - lon1_rad
-            dlat = lat2_rad - lat1_rad
-
-            a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-            distancia_viaje = round(R * c, 2)
+            distancia_viaje = round(calcular_distancia_km(origen_lat, origen_lon, destino_lat, destino_lon), 2)
 
             # Asignar estado de manera realista basado en la fecha
             estados_posibles = [
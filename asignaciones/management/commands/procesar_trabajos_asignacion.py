@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from asignaciones.trabajos import reclamar_trabajo, ejecutar_trabajo
+
+
+class Command(BaseCommand):
+    help = 'Worker that claims and runs queued batch auto-assignment jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Process the jobs currently queued and exit instead of polling forever',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty (default: 2)',
+        )
+
+    def handle(self, *args, **options):
+        una_vez = options['una_vez']
+        intervalo = options['intervalo']
+        self.stdout.write('Waiting for auto-assignment jobs...')
+
+        while True:
+            close_old_connections()
+            trabajo = reclamar_trabajo()
+            if trabajo is None:
+                if una_vez:
+                    break
+                time.sleep(intervalo)
+                continue
+
+            self.stdout.write(f'Running job #{trabajo.pk}...')
+            try:
+                ejecutar_trabajo(trabajo)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Job #{trabajo.pk} failed: {str(e)}'))
+                continue
+            asignadas = sum(1 for r in trabajo.resultados if r['vehiculo_asignado'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Job #{trabajo.pk} completed: {asignadas}/{trabajo.total} requests assigned.'
+            ))
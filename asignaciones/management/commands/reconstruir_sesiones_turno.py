@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from asignaciones.models import Conductor, SesionTurno
+from asignaciones.turnos import reconstruir_sesiones
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the driver shift sessions (SesionTurno) by pairing each entrada punch '
+        'of RegistroTurno with its salida, for all drivers or only one'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conductor-id', type=int, help='Rebuild only the shifts of this driver (by ID)')
+
+    def handle(self, *args, **options):
+        conductor_id = options['conductor_id']
+        if conductor_id is not None and not Conductor.objects.filter(pk=conductor_id).exists():
+            raise CommandError(f'Driver with ID {conductor_id} not found.')
+
+        inicio = time.perf_counter()
+        creadas = reconstruir_sesiones(None if conductor_id is None else [conductor_id])
+        abiertas = SesionTurno.objects.filter(salida__isnull=True)
+        if conductor_id is not None:
+            abiertas = abiertas.filter(conductor_id=conductor_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Shift sessions rebuilt: {creadas} sessions, {abiertas.count()} without salida '
+            f'({time.perf_counter() - inicio:.1f}s)'
+        ))
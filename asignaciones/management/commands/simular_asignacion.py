@@ -0,0 +1,323 @@
+import csv
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from asignaciones.flota import invalidar_snapshot
+from asignaciones.models import Vehiculo, Conductor, Asignacion
+from asignaciones.services import (
+    asignar_vehiculos_automatico_lote, asignar_asignacion_incremental,
+    registrar_posicion_vehiculo, calcular_score, calcular_distancia_km
+)
+from ._bd_temporal import bd_temporal
+
+# Columnas aceptadas en el CSV de solicitudes (--archivo)
+COLUMNAS_CSV = (
+    'fecha_solicitud', 'fecha_hora_requerida_inicio', 'fecha_hora_fin_prevista',
+    'req_pasajeros', 'req_tipo_vehiculo_preferente', 'solicitante_jerarquia',
+    'origen_lat', 'origen_lon', 'destino_lat', 'destino_lon',
+)
+
+# Puntos de la región usados para generar viajes sintéticos
+LUGARES = [
+    (-33.0472, -71.6127),  # Valparaíso
+    (-33.0246, -71.5522),  # Viña del Mar
+    (-32.8823, -71.2489),  # Quillota
+    (-32.8337, -70.5983),  # Los Andes
+    (-32.7507, -70.7251),  # San Felipe
+    (-33.5934, -71.6061),  # San Antonio
+    (-33.0471, -71.4408),  # Quilpué
+    (-33.0600, -71.3800),  # Villa Alemana
+    (-32.9837, -71.2730),  # Limache
+    (-32.7770, -71.5270),  # Quintero
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a year of synthetic (or CSV-loaded) requests through the auto-assignment '
+        'engine in simulated time on a throwaway database and report throughput, '
+        'query counts, decision latency and assignment quality'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=365, help='Simulated days of requests (default: 365)')
+        parser.add_argument('--solicitudes-dia', type=int, default=20, help='Average requests per weekday (default: 20)')
+        parser.add_argument('--vehiculos', type=int, default=30, help='Fleet size (default: 30)')
+        parser.add_argument('--conductores', type=int, default=40, help='Drivers on shift (default: 40)')
+        parser.add_argument(
+            '--modo', choices=['lote', 'incremental'], default='lote',
+            help="'lote' runs the batch engine on each tick; 'incremental' assigns each request "
+                 "on arrival and runs the batch for leftovers (default: lote)"
+        )
+        parser.add_argument(
+            '--candidatos', type=int,
+            help='Nearest vehicles considered per request (default: ASIGNACION_CANDIDATOS_CERCANOS; 0 = whole fleet)'
+        )
+        parser.add_argument('--intervalo', type=int, default=60, help='Simulated minutes between engine runs (default: 60)')
+        parser.add_argument('--archivo', help=f"CSV of requests to replay instead of generating them (columns: {', '.join(COLUMNAS_CSV)})")
+        parser.add_argument('--en-memoria', action='store_true', help='Use an in-memory SQLite database')
+        parser.add_argument('--semilla', type=int, default=42, help='Random seed (default: 42)')
+        parser.add_argument(
+            '--forzar', action='store_true',
+            help='Allow creating (and overwriting) the throwaway database on a non-SQLite server'
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['semilla'])
+        inicio_simulacion = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        if options['archivo']:
+            solicitudes = self._cargar_csv(options['archivo'], inicio_simulacion)
+        else:
+            solicitudes = self._generar_solicitudes(options, inicio_simulacion)
+        if not solicitudes:
+            raise CommandError('No requests to replay.')
+
+        self.stdout.write(
+            f"Replaying {len(solicitudes)} requests on a throwaway {connection.vendor} database "
+            f"({options['modo']} mode)..."
+        )
+        candidatos = options['candidatos']
+        if candidatos is None:
+            candidatos = settings.ASIGNACION_CANDIDATOS_CERCANOS
+        with bd_temporal(en_memoria=options['en_memoria'], forzar=options['forzar']), \
+                override_settings(ASIGNACION_CANDIDATOS_CERCANOS=candidatos):
+            invalidar_snapshot()
+            self._crear_flota(options['vehiculos'], options['conductores'])
+            metricas = self._simular(solicitudes, inicio_simulacion, options)
+            metricas.update(self._calidad())
+            invalidar_snapshot()
+        self._reportar(metricas)
+
+    # Datos de entrada
+
+    def _generar_solicitudes(self, options, inicio_simulacion):
+        """
+        Solicitudes sintéticas en horario hábil, con menos demanda los fines de
+        semana. Devuelve pares (llegada, asignación) ordenados por llegada.
+        """
+        solicitudes = []
+        for dia in range(options['dias']):
+            fecha = inicio_simulacion + timedelta(days=dia)
+            media = options['solicitudes_dia'] * (0.25 if fecha.weekday() >= 5 else 1)
+            for _ in range(max(0, round(random.gauss(media, media ** 0.5)))):
+                inicio = fecha + timedelta(minutes=random.randint(7 * 60, 19 * 60))
+                origen, destino = random.sample(LUGARES, 2)
+                # Llegan entre 1 y 72 horas antes del viaje
+                llegada = max(inicio_simulacion, inicio - timedelta(minutes=random.randint(60, 72 * 60)))
+                solicitudes.append((llegada, Asignacion(
+                    fecha_hora_requerida_inicio=inicio,
+                    fecha_hora_fin_prevista=inicio + timedelta(minutes=random.randint(30, 240)),
+                    req_pasajeros=random.choice([1, 1, 2, 3, 4, 6, 10]),
+                    solicitante_jerarquia=random.choice([0, 1, 1, 1, 2, 2, 3]),
+                    origen_lat=origen[0] + random.uniform(-0.02, 0.02),
+                    origen_lon=origen[1] + random.uniform(-0.02, 0.02),
+                    destino_lat=destino[0] + random.uniform(-0.02, 0.02),
+                    destino_lon=destino[1] + random.uniform(-0.02, 0.02),
+                )))
+        return sorted(solicitudes, key=lambda s: s[0])
+
+    def _cargar_csv(self, ruta, inicio_simulacion):
+        """
+        Carga solicitudes de un CSV y desplaza sus fechas para que la primera
+        comience en el primer día simulado.
+        """
+        def fecha(valor):
+            valor = datetime.fromisoformat(valor)
+            return valor if timezone.is_aware(valor) else timezone.make_aware(valor)
+
+        def numero(valor, tipo=float):
+            return tipo(valor) if valor not in (None, '') else None
+
+        try:
+            with open(ruta, newline='', encoding='utf-8') as f:
+                filas = list(csv.DictReader(f))
+        except OSError as e:
+            raise CommandError(f'Cannot read {ruta}: {e}')
+
+        solicitudes = []
+        for fila in filas:
+            inicio = fecha(fila['fecha_hora_requerida_inicio'])
+            llegada = fecha(fila['fecha_solicitud']) if fila.get('fecha_solicitud') else inicio - timedelta(hours=24)
+            solicitudes.append((llegada, Asignacion(
+                fecha_hora_requerida_inicio=inicio,
+                fecha_hora_fin_prevista=fecha(fila['fecha_hora_fin_prevista']) if fila.get('fecha_hora_fin_prevista') else None,
+                req_pasajeros=numero(fila.get('req_pasajeros'), int) or 1,
+                req_tipo_vehiculo_preferente=fila.get('req_tipo_vehiculo_preferente') or None,
+                solicitante_jerarquia=numero(fila.get('solicitante_jerarquia'), int) or 0,
+                origen_lat=numero(fila.get('origen_lat')),
+                origen_lon=numero(fila.get('origen_lon')),
+                destino_lat=numero(fila.get('destino_lat')),
+                destino_lon=numero(fila.get('destino_lon')),
+            )))
+        if not solicitudes:
+            return []
+        desfase = inicio_simulacion - min(llegada for llegada, _ in solicitudes)
+        for _, a in solicitudes:
+            a.fecha_hora_requerida_inicio += desfase
+            if a.fecha_hora_fin_prevista:
+                a.fecha_hora_fin_prevista += desfase
+        return sorted(((llegada + desfase, a) for llegada, a in solicitudes), key=lambda s: s[0])
+
+    def _crear_flota(self, vehiculos, conductores):
+        tipos = [t for t, _ in Vehiculo.TIPO_VEHICULO_CHOICES]
+        bases = [random.choice(LUGARES) for _ in range(vehiculos)]
+        Vehiculo.objects.bulk_create([
+            Vehiculo(
+                marca='Sim', modelo='Test', patente=f'SM-{i:04d}',
+                anio=random.randint(2010, 2025),
+                tipo_vehiculo=random.choice(tipos),
+                capacidad_pasajeros=random.choice([4, 4, 5, 8, 12]),
+                base_lat=base_lat, base_lon=base_lon,
+            )
+            for i, (base_lat, base_lon) in enumerate(bases)
+        ])
+        Conductor.objects.bulk_create([
+            Conductor(
+                nombre=f'Sim{i}', apellido='Test', numero_licencia=f'SIM-{i:05d}',
+                fecha_vencimiento_licencia=timezone.now().date() + timedelta(days=3 * 365),
+                estado_disponibilidad='disponible',
+            )
+            for i in range(conductores)
+        ])
+
+    # Simulación
+
+    def _simular(self, solicitudes, inicio_simulacion, options):
+        consultas = [0]
+
+        def contar_consultas(execute, sql, params, many, context):
+            consultas[0] += 1
+            return execute(sql, params, many, context)
+
+        latencias = []         # segundos por decisión
+        decisiones = 0
+        paso = timedelta(minutes=options['intervalo'])
+        reloj = inicio_simulacion
+        siguiente = 0
+        transcurrido = 0.0
+
+        with connection.execute_wrapper(contar_consultas):
+            while siguiente < len(solicitudes):
+                reloj += paso
+                llegadas = []
+                while siguiente < len(solicitudes) and solicitudes[siguiente][0] <= reloj:
+                    llegadas.append(solicitudes[siguiente][1])
+                    siguiente += 1
+
+                self._completar_viajes(reloj)
+                if not llegadas:
+                    continue
+
+                if options['modo'] == 'incremental':
+                    for a in llegadas:
+                        a.save()
+                        t0 = time.perf_counter()
+                        asignar_asignacion_incremental(a)
+                        latencias.append(time.perf_counter() - t0)
+                        transcurrido += latencias[-1]
+                    decisiones += len(llegadas)
+                    # Las que no se pudieron colocar las resuelve el lote del tick
+                    t0 = time.perf_counter()
+                    resultados = asignar_vehiculos_automatico_lote()
+                    transcurrido += time.perf_counter() - t0
+                else:
+                    for a in llegadas:
+                        a.calcular_distancia_estimada()
+                    Asignacion.objects.bulk_create(llegadas)
+                    t0 = time.perf_counter()
+                    resultados = asignar_vehiculos_automatico_lote()
+                    duracion = time.perf_counter() - t0
+                    transcurrido += duracion
+                    decisiones += len(resultados)
+                    # En el lote cada decisión espera la ejecución completa
+                    latencias.extend([duracion] * len(resultados))
+
+        return {
+            'decisiones': decisiones,
+            'segundos': transcurrido,
+            'consultas': consultas[0],
+            'latencias': latencias,
+        }
+
+    def _completar_viajes(self, reloj):
+        """
+        Los viajes ya terminados en el tiempo simulado liberan su franja y
+        dejan al vehículo en su destino.
+        """
+        terminados = list(
+            Asignacion.objects.filter(estado='programada', fecha_hora_fin_prevista__lte=reloj)
+            .order_by('fecha_hora_fin_prevista')
+            .values_list('pk', 'vehiculo_id', 'destino_lat', 'destino_lon', 'fecha_hora_fin_prevista')
+        )
+        if not terminados:
+            return
+        Asignacion.objects.filter(pk__in=[t[0] for t in terminados]).update(estado='completada')
+        for _, vehiculo_id, lat, lon, fin in terminados:
+            if lat is not None and lon is not None:
+                registrar_posicion_vehiculo(vehiculo_id, lat, lon, fin)
+        # El UPDATE en bloque no dispara señales
+        invalidar_snapshot()
+
+    def _calidad(self):
+        total = Asignacion.objects.count()
+        fallos = Asignacion.objects.filter(estado='fallo_auto').count()
+        colocadas = list(
+            Asignacion.objects.filter(vehiculo__isnull=False)
+            .select_related('vehiculo')
+            .order_by('vehiculo_id', 'fecha_hora_requerida_inicio')
+        )
+        scores = [calcular_score(a, a.vehiculo) for a in colocadas]
+
+        # Km en vacío: de la base al primer origen y del destino de cada viaje
+        # al origen del siguiente del mismo vehículo
+        vacio_km = 0.0
+        por_vehiculo = defaultdict(list)
+        for a in colocadas:
+            por_vehiculo[a.vehiculo_id].append(a)
+        for viajes in por_vehiculo.values():
+            lat, lon = viajes[0].vehiculo.base_lat, viajes[0].vehiculo.base_lon
+            for viaje in viajes:
+                vacio_km += calcular_distancia_km(lat, lon, viaje.origen_lat, viaje.origen_lon)
+                lat, lon = viaje.destino_lat, viaje.destino_lon
+        sin_conductor = sum(1 for a in colocadas if a.conductor_id is None)
+        viajes_por_vehiculo = [len(v) for v in por_vehiculo.values()]
+        return {
+            'total': total,
+            'fallos': fallos,
+            'colocadas': len(colocadas),
+            'sin_conductor': sin_conductor,
+            'score_promedio': statistics.fmean(scores) if scores else 0.0,
+            'vacio_km': vacio_km,
+            'viajes_por_vehiculo': statistics.fmean(viajes_por_vehiculo) if viajes_por_vehiculo else 0.0,
+        }
+
+    def _reportar(self, m):
+        decisiones = m['decisiones'] or 1
+        latencias = sorted(m['latencias']) or [0.0]
+
+        def percentil(p):
+            return latencias[min(len(latencias) - 1, int(p * len(latencias)))] * 1000
+
+        self.stdout.write(f"Decisions: {m['decisiones']} in {m['segundos']:.2f}s engine time "
+                          f"({m['decisiones'] / m['segundos'] if m['segundos'] else 0:.1f} assignments/s)")
+        self.stdout.write(f"DB queries: {m['consultas']} ({m['consultas'] / decisiones:.2f} per assignment)")
+        self.stdout.write(f"Decision latency: p50 {percentil(0.50):.2f} ms, p99 {percentil(0.99):.2f} ms")
+        self.stdout.write(
+            f"Quality: fallo_auto rate {m['fallos'] / (m['total'] or 1):.1%}, "
+            f"average score {m['score_promedio']:.3f}, deadhead {m['vacio_km']:.0f} km "
+            f"({m['vacio_km'] / (m['colocadas'] or 1):.1f} km/trip)"
+        )
+        self.stdout.write(
+            f"Placed {m['colocadas']}/{m['total']} requests, {m['sin_conductor']} without driver, "
+            f"{m['viajes_por_vehiculo']:.1f} trips per vehicle"
+        )
+        self.stdout.write(self.style.SUCCESS('Simulation finished.'))
@@ -0,0 +1,69 @@
+# asignaciones/mantenimiento.py
+"""
+Próximo mantenimiento por kilometraje.
+
+Cada vehículo guarda el kilometraje de su último servicio (registrado con
+Mantenimiento), el kilometraje en que le toca el siguiente y los km que le
+faltan (Vehiculo.km_para_mantenimiento, indexado). Se recalculan al guardar
+el vehículo o sus mantenimientos, así que las urgencias salen de filtros
+sobre esa columna. Sin servicios registrados se asume uno cada
+INTERVALO_KM desde el km 0.
+"""
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Q, Value, When
+
+INTERVALO_KM = 10000
+
+# Urgencia según los km que faltan, de la más a la menos urgente
+# (equivalen al 95 %, 90 % y 80 % del intervalo recorrido)
+UMBRALES_KM = (
+    ('critico', INTERVALO_KM * 0.05),
+    ('urgente', INTERVALO_KM * 0.10),
+    ('proximo', INTERVALO_KM * 0.20),
+)
+
+
+def proximo_mantenimiento(kilometraje, km_ultimo_mantenimiento):
+    """(km del próximo servicio, km que faltan); negativo si está vencido"""
+    kilometraje = kilometraje or 0
+    if km_ultimo_mantenimiento is None:
+        proximo = (kilometraje // INTERVALO_KM + 1) * INTERVALO_KM
+    else:
+        proximo = km_ultimo_mantenimiento + INTERVALO_KM
+    return proximo, proximo - kilometraje
+
+
+def urgencia(km_restantes):
+    for nombre, limite in UMBRALES_KM:
+        if km_restantes <= limite:
+            return nombre
+    return 'ok'
+
+
+def porcentaje_recorrido(km_restantes):
+    """Porcentaje del intervalo ya recorrido (más de 100 si está vencido)"""
+    return round((INTERVALO_KM - km_restantes) / INTERVALO_KM * 100, 1)
+
+
+def anotar_urgencia(vehiculos):
+    """Anota 'urgencia_mantenimiento' y 'porcentaje_mantenimiento' calculados en la base"""
+    return vehiculos.annotate(
+        urgencia_mantenimiento=Case(
+            *(When(km_para_mantenimiento__lte=limite, then=Value(nombre)) for nombre, limite in UMBRALES_KM),
+            default=Value('ok'),
+        ),
+        porcentaje_mantenimiento=ExpressionWrapper(
+            (Value(float(INTERVALO_KM)) - F('km_para_mantenimiento')) * 100.0 / INTERVALO_KM,
+            output_field=FloatField(),
+        ),
+    )
+
+
+def conteo_urgencias(vehiculos):
+    """{'criticos', 'urgentes', 'proximos', 'ok'} en una consulta sobre el índice"""
+    critico, urgente, proximo = (limite for _, limite in UMBRALES_KM)
+    return vehiculos.aggregate(
+        criticos=Count('id', filter=Q(km_para_mantenimiento__lte=critico)),
+        urgentes=Count('id', filter=Q(km_para_mantenimiento__gt=critico, km_para_mantenimiento__lte=urgente)),
+        proximos=Count('id', filter=Q(km_para_mantenimiento__gt=urgente, km_para_mantenimiento__lte=proximo)),
+        ok=Count('id', filter=Q(km_para_mantenimiento__gt=proximo)),
+    )
@@ -0,0 +1,62 @@
+# asignaciones/mapa_calor.py
+"""
+Mapa de calor de orígenes y destinos de viajes.
+
+Los puntos se agrupan en celdas de una grilla lat/lon de 10^-precision
+grados de lado (precisión 2 ≈ 1,1 km) directamente en la base,
+FLOOR(coordenada * 10^precision) + GROUP BY, así que a Python sólo llegan
+las celdas con viajes y no los viajes.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F
+from django.db.models.functions import Floor
+
+from .fechas import filtro_dias
+from .models import Asignacion
+
+# Precisión: grados de lado de la celda (~km en latitud)
+PRECISIONES = {
+    1: 0.1,     # ~11 km
+    2: 0.01,    # ~1,1 km
+    3: 0.001,   # ~110 m
+    4: 0.0001,  # ~11 m
+}
+PRECISION_POR_DEFECTO = 2
+
+PUNTOS = (
+    ('origenes', 'origen_lat', 'origen_lon'),
+    ('destinos', 'destino_lat', 'destino_lon'),
+)
+
+
+def _conteo_celdas(asignaciones, campo_lat, campo_lon, factor):
+    return asignaciones.filter(**{f'{campo_lat}__isnull': False, f'{campo_lon}__isnull': False}).annotate(
+        fila=Floor(F(campo_lat) * factor), columna=Floor(F(campo_lon) * factor)
+    ).values('fila', 'columna').annotate(total=Count('id')).order_by()
+
+
+def celdas_mapa_calor(desde, hasta, precision=PRECISION_POR_DEFECTO):
+    """
+    Celdas con orígenes o destinos de los viajes que inician en los días
+    desde..hasta: [{'lat', 'lon' (centro), 'origenes', 'destinos'}].
+    ValueError si la precisión no existe.
+    """
+    if precision not in PRECISIONES:
+        raise ValueError(
+            f"Precisión desconocida: {precision}. Opciones: {', '.join(map(str, PRECISIONES))}."
+        )
+    factor = 10 ** precision
+    asignaciones = Asignacion.objects.filter(**filtro_dias('fecha_hora_requerida_inicio', desde, hasta))
+    conteos = defaultdict(lambda: dict.fromkeys((nombre for nombre, _, _ in PUNTOS), 0))
+    for nombre, campo_lat, campo_lon in PUNTOS:
+        for fila in _conteo_celdas(asignaciones, campo_lat, campo_lon, factor):
+            conteos[(int(fila['fila']), int(fila['columna']))][nombre] += fila['total']
+    return [
+        {
+            'lat': round((fila + 0.5) / factor, precision + 1),
+            'lon': round((columna + 0.5) / factor, precision + 1),
+            **valores,
+        }
+        for (fila, columna), valores in sorted(conteos.items())
+    ]
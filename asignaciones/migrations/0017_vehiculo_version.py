@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0016_conductor_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehiculo',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Versión de la fila para control de concurrencia optimista'),
+        ),
+    ]
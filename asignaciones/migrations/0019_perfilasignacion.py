@@ -0,0 +1,36 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0018_trabajoasignacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfilAsignacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('peso_cargo', models.FloatField(default=0.4, help_text='Peso de la jerarquía del solicitante')),
+                ('peso_capacidad', models.FloatField(default=0.3, help_text='Peso del ajuste de capacidad')),
+                ('peso_distancia', models.FloatField(default=0.3, help_text='Peso de la distancia del viaje')),
+                ('tipo_vehiculo', models.CharField(blank=True, choices=[('automovil', 'Automóvil'), ('camioneta', 'Camioneta'), ('minibus', 'Minibús'), ('station_wagon', 'Station Wagon')], help_text='Aplicar a solicitudes con este tipo de vehículo preferente (opcional)', max_length=50)),
+                ('activo', models.BooleanField(default=True)),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Perfil de Asignación',
+                'verbose_name_plural': 'Perfiles de Asignación',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.AddField(
+            model_name='trabajoasignacion',
+            name='perfil',
+            field=models.CharField(blank=True, help_text='Perfil de scoring a usar (vacío = estándar)', max_length=50),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0019_perfilasignacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehiculo',
+            name='base_lat',
+            field=models.FloatField(blank=True, help_text='Latitud de la base del vehículo', null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='base_lon',
+            field=models.FloatField(blank=True, help_text='Longitud de la base del vehículo', null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='fecha_ultima_posicion',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='ultima_lat',
+            field=models.FloatField(blank=True, help_text='Latitud de la última posición conocida', null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='ultima_lon',
+            field=models.FloatField(blank=True, help_text='Longitud de la última posición conocida', null=True),
+        ),
+    ]
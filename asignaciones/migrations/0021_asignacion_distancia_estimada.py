@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+from asignaciones.distancias import distancia_estimada_km
+
+
+def calcular_distancias(apps, schema_editor):
+    Asignacion = apps.get_model('asignaciones', 'Asignacion')
+    pendientes = []
+    for asignacion in Asignacion.objects.filter(distancia_estimada_km__isnull=True).iterator(chunk_size=1000):
+        asignacion.distancia_estimada_km = distancia_estimada_km(
+            asignacion.origen_lat, asignacion.origen_lon,
+            asignacion.destino_lat, asignacion.destino_lon, vial=False
+        )
+        if asignacion.distancia_estimada_km is not None:
+            pendientes.append(asignacion)
+        if len(pendientes) >= 1000:
+            Asignacion.objects.bulk_update(pendientes, ['distancia_estimada_km'])
+            pendientes = []
+    Asignacion.objects.bulk_update(pendientes, ['distancia_estimada_km'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0020_vehiculo_posicion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asignacion',
+            name='distancia_estimada_km',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Distancia estimada origen-destino en km, calculada al guardar', null=True),
+        ),
+        migrations.RunPython(calcular_distancias, migrations.RunPython.noop),
+    ]
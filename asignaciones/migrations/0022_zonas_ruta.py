@@ -0,0 +1,46 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0021_asignacion_distancia_estimada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZonaRuta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('lat', models.FloatField()),
+                ('lon', models.FloatField()),
+                ('radio_km', models.FloatField(default=1.0, help_text='Radio dentro del cual un punto pertenece a la zona')),
+                ('solicitudes', models.PositiveIntegerField(default=0, help_text='Orígenes y destinos de viajes en la zona al calcularla')),
+                ('fecha_calculo', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Zona de Ruta',
+                'verbose_name_plural': 'Zonas de Ruta',
+                'ordering': ['-solicitudes'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DistanciaRuta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distancia_km', models.FloatField()),
+                ('duracion_min', models.FloatField()),
+                ('destino', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='distancias_llegada', to='asignaciones.zonaruta')),
+                ('origen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='distancias_salida', to='asignaciones.zonaruta')),
+            ],
+            options={
+                'verbose_name': 'Distancia de Ruta',
+                'verbose_name_plural': 'Distancias de Ruta',
+                'unique_together': {('origen', 'destino')},
+            },
+        ),
+    ]
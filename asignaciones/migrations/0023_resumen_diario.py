@@ -0,0 +1,60 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def construir_resumenes(apps, schema_editor):
+    Asignacion = apps.get_model('asignaciones', 'Asignacion')
+    ResumenDiario = apps.get_model('asignaciones', 'ResumenDiario')
+    filas = Asignacion.objects.annotate(
+        fecha=TruncDate('fecha_hora_requerida_inicio')
+    ).values('fecha', 'vehiculo_id', 'conductor_id', 'estado').annotate(
+        total=Count('id'),
+        km=Coalesce(Sum('distancia_recorrida_km'), 0.0),
+        km_estimados=Coalesce(Sum('distancia_estimada_km'), 0.0),
+    ).order_by()
+    ResumenDiario.objects.bulk_create(
+        [
+            ResumenDiario(
+                fecha=fila['fecha'], vehiculo_id=fila['vehiculo_id'],
+                conductor_id=fila['conductor_id'], estado=fila['estado'],
+                viajes=fila['total'], distancia_km=fila['km'],
+                distancia_estimada_km=fila['km_estimados'],
+            )
+            for fila in filas
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0022_zonas_ruta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(help_text='Fecha local de inicio de los viajes')),
+                ('estado', models.CharField(choices=[('pendiente_auto', 'Pendiente de Asignación Automática'), ('programada', 'Programada (Auto/Manual)'), ('activa', 'Activa'), ('completada', 'Completada'), ('cancelada', 'Cancelada'), ('fallo_auto', 'Falló Asignación Automática')], max_length=20)),
+                ('viajes', models.IntegerField(default=0)),
+                ('distancia_km', models.FloatField(default=0.0, help_text='Suma de distancia_recorrida_km')),
+                ('distancia_estimada_km', models.FloatField(default=0.0, help_text='Suma de distancia_estimada_km')),
+                ('conductor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resumenes_diarios', to='asignaciones.conductor')),
+                ('vehiculo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resumenes_diarios', to='asignaciones.vehiculo')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario',
+                'verbose_name_plural': 'Resúmenes Diarios',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['fecha', 'estado', 'vehiculo', 'conductor'], name='resumen_fecha_claves_idx')],
+            },
+        ),
+        migrations.RunPython(construir_resumenes, migrations.RunPython.noop),
+    ]
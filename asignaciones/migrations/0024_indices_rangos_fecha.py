@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0023_resumen_diario'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asignacion',
+            index=models.Index(fields=['fecha_hora_requerida_inicio'], name='asig_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asignacion',
+            index=models.Index(fields=['estado', 'fecha_hora_requerida_inicio'], name='asig_estado_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asignacion',
+            index=models.Index(fields=['vehiculo', 'fecha_hora_requerida_inicio'], name='asig_vehiculo_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asignacion',
+            index=models.Index(fields=['conductor', 'fecha_hora_requerida_inicio'], name='asig_conductor_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroturno',
+            index=models.Index(fields=['conductor', 'fecha_hora'], name='turno_conductor_fecha_idx'),
+        ),
+    ]
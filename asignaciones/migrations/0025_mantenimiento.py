@@ -0,0 +1,63 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+from asignaciones.mantenimiento import proximo_mantenimiento
+
+
+def calcular_proximo_mantenimiento(apps, schema_editor):
+    Vehiculo = apps.get_model('asignaciones', 'Vehiculo')
+    vehiculos = list(Vehiculo.objects.only('kilometraje', 'km_ultimo_mantenimiento'))
+    for vehiculo in vehiculos:
+        vehiculo.proximo_mantenimiento_km, vehiculo.km_para_mantenimiento = proximo_mantenimiento(
+            vehiculo.kilometraje, vehiculo.km_ultimo_mantenimiento
+        )
+    Vehiculo.objects.bulk_update(
+        vehiculos, ['proximo_mantenimiento_km', 'km_para_mantenimiento'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0024_indices_rangos_fecha'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehiculo',
+            name='km_para_mantenimiento',
+            field=models.FloatField(db_index=True, default=10000, editable=False, help_text='Km que faltan para el próximo mantenimiento (negativo si está vencido)'),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='km_ultimo_mantenimiento',
+            field=models.FloatField(blank=True, editable=False, help_text='Kilometraje del último mantenimiento registrado', null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='proximo_mantenimiento_km',
+            field=models.FloatField(default=10000, editable=False, help_text='Kilometraje en que corresponde el próximo mantenimiento'),
+        ),
+        migrations.CreateModel(
+            name='Mantenimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(default=django.utils.timezone.localdate)),
+                ('kilometraje', models.FloatField(help_text='Kilometraje del vehículo al momento del servicio')),
+                ('tipo', models.CharField(choices=[('preventivo', 'Preventivo'), ('correctivo', 'Correctivo')], default='preventivo', max_length=20)),
+                ('descripcion', models.TextField(blank=True, null=True)),
+                ('costo', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('vehiculo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mantenimientos', to='asignaciones.vehiculo')),
+            ],
+            options={
+                'verbose_name': 'Mantenimiento',
+                'verbose_name_plural': 'Mantenimientos',
+                'ordering': ['-fecha', '-kilometraje'],
+                'indexes': [models.Index(fields=['vehiculo', 'kilometraje'], name='mant_vehiculo_km_idx')],
+            },
+        ),
+        migrations.RunPython(calcular_proximo_mantenimiento, migrations.RunPython.noop),
+    ]
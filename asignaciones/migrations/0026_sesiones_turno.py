@@ -0,0 +1,64 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:30
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def emparejar_turnos(apps, schema_editor):
+    # Mismo recorrido que turnos.emparejar, con los modelos históricos
+    RegistroTurno = apps.get_model('asignaciones', 'RegistroTurno')
+    SesionTurno = apps.get_model('asignaciones', 'SesionTurno')
+    sesiones = []
+    abierta = None
+    conductor_actual = None
+    marcas = RegistroTurno.objects.only('pk', 'conductor_id', 'tipo', 'fecha_hora').order_by(
+        'conductor_id', 'fecha_hora', 'pk'
+    )
+    for marca in marcas.iterator(chunk_size=2000):
+        if marca.conductor_id != conductor_actual:
+            conductor_actual, abierta = marca.conductor_id, None
+        if marca.tipo == 'entrada':
+            abierta = SesionTurno(
+                conductor_id=marca.conductor_id, entrada_id=marca.pk,
+                fecha=timezone.localtime(marca.fecha_hora).date(), inicio=marca.fecha_hora,
+            )
+            sesiones.append(abierta)
+        elif abierta is not None and marca.fecha_hora - abierta.inicio <= timedelta(hours=24):
+            abierta.salida_id = marca.pk
+            abierta.fin = marca.fecha_hora
+            abierta.horas = (marca.fecha_hora - abierta.inicio).total_seconds() / 3600
+            abierta = None
+    SesionTurno.objects.bulk_create(sesiones, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0025_mantenimiento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SesionTurno',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(help_text='Fecha local de la entrada')),
+                ('inicio', models.DateTimeField()),
+                ('fin', models.DateTimeField(blank=True, null=True)),
+                ('horas', models.FloatField(default=0.0, help_text='Duración del turno en horas (0 si sigue abierto)')),
+                ('conductor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sesiones_turno', to='asignaciones.conductor')),
+                ('entrada', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sesion_iniciada', to='asignaciones.registroturno')),
+                ('salida', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sesion_cerrada', to='asignaciones.registroturno')),
+            ],
+            options={
+                'verbose_name': 'Sesión de Turno',
+                'verbose_name_plural': 'Sesiones de Turno',
+                'ordering': ['-inicio'],
+                'indexes': [models.Index(fields=['conductor', 'inicio'], name='sesion_conductor_inicio_idx'), models.Index(fields=['fecha', 'conductor'], name='sesion_fecha_conductor_idx')],
+            },
+        ),
+        migrations.RunPython(emparejar_turnos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:39
+
+from django.db import migrations, models
+
+
+def latido_inicial(apps, schema_editor):
+    # Los trabajos ya en proceso parten con su fecha de inicio como último latido
+    TrabajoAsignacion = apps.get_model('asignaciones', 'TrabajoAsignacion')
+    TrabajoAsignacion.objects.filter(estado='en_proceso').update(fecha_actualizacion=models.F('fecha_inicio'))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0026_sesiones_turno'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajoasignacion',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(blank=True, help_text='Último latido del worker mientras el trabajo está en proceso', null=True),
+        ),
+        migrations.RunPython(latido_inicial, migrations.RunPython.noop),
+    ]
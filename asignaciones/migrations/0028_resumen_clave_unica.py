@@ -0,0 +1,57 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+def fusionar_duplicados(apps, schema_editor):
+    # Antes se toleraban varias filas por clave: se suman en la primera
+    ResumenDiario = apps.get_model('asignaciones', 'ResumenDiario')
+    primeras = {}
+    fusionadas = {}
+    duplicadas = []
+    for fila in ResumenDiario.objects.order_by('pk'):
+        clave = (fila.fecha, fila.vehiculo_id, fila.conductor_id, fila.estado)
+        primera = primeras.setdefault(clave, fila)
+        if primera is not fila:
+            primera.viajes += fila.viajes
+            primera.distancia_km += fila.distancia_km
+            primera.distancia_estimada_km += fila.distancia_estimada_km
+            fusionadas[primera.pk] = primera
+            duplicadas.append(fila.pk)
+    ResumenDiario.objects.bulk_update(
+        fusionadas.values(), ['viajes', 'distancia_km', 'distancia_estimada_km'], batch_size=1000
+    )
+    for i in range(0, len(duplicadas), 1000):
+        ResumenDiario.objects.filter(pk__in=duplicadas[i:i + 1000]).delete()
+    ResumenDiario.objects.filter(viajes__lte=0).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0027_latido_trabajos'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionar_duplicados, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='resumendiario',
+            name='resumen_fecha_claves_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiario',
+            constraint=models.UniqueConstraint(fields=('fecha', 'estado', 'vehiculo', 'conductor'), name='resumen_clave_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiario',
+            constraint=models.UniqueConstraint(condition=models.Q(('vehiculo__isnull', True)), fields=('fecha', 'estado', 'conductor'), name='resumen_clave_sin_vehiculo'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiario',
+            constraint=models.UniqueConstraint(condition=models.Q(('conductor__isnull', True)), fields=('fecha', 'estado', 'vehiculo'), name='resumen_clave_sin_conductor'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiario',
+            constraint=models.UniqueConstraint(condition=models.Q(('conductor__isnull', True), ('vehiculo__isnull', True)), fields=('fecha', 'estado'), name='resumen_clave_sin_recursos'),
+        ),
+    ]
@@ -1,7 +1,12 @@
 # asignaciones/models.py
+from django.conf import settings
 from django.db import models
+from django.db.models import F, Q
 from django.utils import timezone
 
+from .distancias import distancia_estimada_km
+from .mantenimiento import INTERVALO_KM, proximo_mantenimiento
+
 class Vehiculo(models.Model):
     ESTADO_CHOICES = [
         ('disponible', 'Disponible'),
@@ -44,10 +49,65 @@ class Vehiculo(models.Model):
         help_text="Número máximo de pasajeros (sin incluir conductor)"
     )
     kilometraje = models.FloatField(default=0.0, help_text="Kilometraje total del vehículo en km.")
+    base_lat = models.FloatField(null=True, blank=True, help_text="Latitud de la base del vehículo")
+    base_lon = models.FloatField(null=True, blank=True, help_text="Longitud de la base del vehículo")
+    ultima_lat = models.FloatField(null=True, blank=True, help_text="Latitud de la última posición conocida")
+    ultima_lon = models.FloatField(null=True, blank=True, help_text="Longitud de la última posición conocida")
+    fecha_ultima_posicion = models.DateTimeField(null=True, blank=True)
+    version = models.PositiveIntegerField(
+        default=0, editable=False,
+        help_text="Versión de la fila para control de concurrencia optimista"
+    )
+    km_ultimo_mantenimiento = models.FloatField(
+        null=True, blank=True, editable=False,
+        help_text="Kilometraje del último mantenimiento registrado"
+    )
+    proximo_mantenimiento_km = models.FloatField(
+        default=INTERVALO_KM, editable=False,
+        help_text="Kilometraje en que corresponde el próximo mantenimiento"
+    )
+    km_para_mantenimiento = models.FloatField(
+        default=INTERVALO_KM, editable=False, db_index=True,
+        help_text="Km que faltan para el próximo mantenimiento (negativo si está vencido)"
+    )
+
+    CAMPOS_MANTENIMIENTO = {'kilometraje', 'km_ultimo_mantenimiento'}
 
     def __str__(self):
         return f"{self.marca} {self.modelo} ({self.patente}) - Año {self.anio or 'N/A'}"
 
+    def calcular_mantenimiento(self):
+        """Actualiza el próximo mantenimiento según el kilometraje (para bulk_create)"""
+        self.proximo_mantenimiento_km, self.km_para_mantenimiento = proximo_mantenimiento(
+            self.kilometraje, self.km_ultimo_mantenimiento
+        )
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.calcular_mantenimiento()
+        elif self.CAMPOS_MANTENIMIENTO & set(update_fields):
+            self.calcular_mantenimiento()
+            update_fields = kwargs['update_fields'] = [
+                *update_fields, 'proximo_mantenimiento_km', 'km_para_mantenimiento'
+            ]
+        # Toda escritura invalida las reservas calculadas sobre la versión
+        # anterior. El incremento va en el mismo UPDATE; en memoria queda la
+        # versión leída + 1, que a lo más es menor que la real si otro proceso
+        # escribió entretanto, y entonces la reserva (CAS) sólo falla de más.
+        if self.pk is None:
+            return super().save(*args, **kwargs)
+        anterior = self.version
+        self.version = F('version') + 1
+        if update_fields is not None and 'version' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'version']
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            self.version = anterior
+            raise
+        self.version = anterior + 1
+
 class Conductor(models.Model):
     ESTADO_DISPONIBILIDAD_CHOICES = [
         ('disponible', 'Disponible'),
@@ -154,12 +214,49 @@ class Asignacion(models.Model):
         help_text="Marca temporal cuando un funcionario crea la asignación"
     )
     distancia_recorrida_km = models.FloatField(null=True, blank=True, help_text="Distancia del viaje en km.")
+    distancia_estimada_km = models.FloatField(
+        null=True, blank=True, editable=False, db_index=True,
+        help_text="Distancia estimada origen-destino en km, calculada al guardar"
+    )
+
+    CAMPOS_COORDENADAS = {'origen_lat', 'origen_lon', 'destino_lat', 'destino_lon'}
+
+    def calcular_distancia_estimada(self):
+        """Actualiza distancia_estimada_km según las coordenadas (para bulk_create)"""
+        self.distancia_estimada_km = distancia_estimada_km(
+            self.origen_lat, self.origen_lon, self.destino_lat, self.destino_lon
+        )
+        return self.distancia_estimada_km
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.calcular_distancia_estimada()
+        elif self.CAMPOS_COORDENADAS & set(update_fields):
+            self.calcular_distancia_estimada()
+            kwargs['update_fields'] = [*update_fields, 'distancia_estimada_km']
+        super().save(*args, **kwargs)
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        # Los valores cargados con que signals.py calcula el aporte al resumen
+        # diario ya no corresponden: el próximo guardado los lee de la base
+        self._valores_resumen = None
 
     def __str__(self):
         conductor_str = f"{self.conductor.nombre} {self.conductor.apellido}" if self.conductor else "Por asignar"
         vehiculo_str = str(self.vehiculo.patente) if self.vehiculo else "Por asignar"
         return f"Traslado a {self.destino_descripcion} ({self.fecha_hora_requerida_inicio.strftime('%Y-%m-%d %H:%M')}) - Vehículo: {vehiculo_str}, Conductor: {conductor_str}, Solicitante: {self.solicitante_nombre or 'N/A'}"
 
+    class Meta:
+        # Para filtrar por rangos semiabiertos de fecha-hora (ver fechas.py)
+        indexes = [
+            models.Index(fields=['fecha_hora_requerida_inicio'], name='asig_inicio_idx'),
+            models.Index(fields=['estado', 'fecha_hora_requerida_inicio'], name='asig_estado_inicio_idx'),
+            models.Index(fields=['vehiculo', 'fecha_hora_requerida_inicio'], name='asig_vehiculo_inicio_idx'),
+            models.Index(fields=['conductor', 'fecha_hora_requerida_inicio'], name='asig_conductor_inicio_idx'),
+        ]
+
 class RegistroTurno(models.Model):
     TIPO_REGISTRO_CHOICES = [
         ('entrada', 'Entrada de turno'),
@@ -176,4 +273,206 @@ class RegistroTurno(models.Model):
     class Meta:
         ordering = ['-fecha_hora']
         verbose_name = "Registro de Turno"
-        verbose_name_plural = "Registros de Turno"
\ No newline at end of file
+        verbose_name_plural = "Registros de Turno"
+        indexes = [
+            models.Index(fields=['conductor', 'fecha_hora'], name='turno_conductor_fecha_idx'),
+        ]
+
+class SesionTurno(models.Model):
+    """
+    Turno de un conductor: una entrada con su salida (puede terminar al día
+    siguiente). La mantiene turnos.py a partir de los RegistroTurno; sin
+    salida queda abierta y no suma horas.
+    """
+    conductor = models.ForeignKey(Conductor, on_delete=models.CASCADE, related_name='sesiones_turno')
+    entrada = models.OneToOneField(RegistroTurno, on_delete=models.CASCADE, related_name='sesion_iniciada')
+    salida = models.OneToOneField(
+        RegistroTurno, on_delete=models.SET_NULL, null=True, blank=True, related_name='sesion_cerrada'
+    )
+    fecha = models.DateField(help_text="Fecha local de la entrada")
+    inicio = models.DateTimeField()
+    fin = models.DateTimeField(null=True, blank=True)
+    horas = models.FloatField(default=0.0, help_text="Duración del turno en horas (0 si sigue abierto)")
+
+    def __str__(self):
+        fin = self.fin.strftime('%Y-%m-%d %H:%M') if self.fin else 'abierto'
+        return f"Turno de {self.conductor} {self.inicio.strftime('%Y-%m-%d %H:%M')} - {fin}"
+
+    class Meta:
+        ordering = ['-inicio']
+        verbose_name = "Sesión de Turno"
+        verbose_name_plural = "Sesiones de Turno"
+        indexes = [
+            models.Index(fields=['conductor', 'inicio'], name='sesion_conductor_inicio_idx'),
+            models.Index(fields=['fecha', 'conductor'], name='sesion_fecha_conductor_idx'),
+        ]
+
+class Mantenimiento(models.Model):
+    """
+    Servicio realizado a un vehículo. El de mayor kilometraje define
+    Vehiculo.km_ultimo_mantenimiento y con él el próximo (ver signals.py).
+    """
+    TIPO_CHOICES = [
+        ('preventivo', 'Preventivo'),
+        ('correctivo', 'Correctivo'),
+    ]
+
+    vehiculo = models.ForeignKey(Vehiculo, on_delete=models.CASCADE, related_name='mantenimientos')
+    fecha = models.DateField(default=timezone.localdate)
+    kilometraje = models.FloatField(help_text="Kilometraje del vehículo al momento del servicio")
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, default='preventivo')
+    descripcion = models.TextField(blank=True, null=True)
+    costo = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} de {self.vehiculo.patente} a los {self.kilometraje:.0f} km ({self.fecha})"
+
+    class Meta:
+        ordering = ['-fecha', '-kilometraje']
+        verbose_name = "Mantenimiento"
+        verbose_name_plural = "Mantenimientos"
+        indexes = [
+            models.Index(fields=['vehiculo', 'kilometraje'], name='mant_vehiculo_km_idx'),
+        ]
+
+class PerfilAsignacion(models.Model):
+    """
+    Perfil de scoring del motor de asignación editable desde el admin.
+    Si tiene tipo de vehículo, se aplica a las solicitudes con ese tipo preferente.
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    peso_cargo = models.FloatField(default=0.4, help_text="Peso de la jerarquía del solicitante")
+    peso_capacidad = models.FloatField(default=0.3, help_text="Peso del ajuste de capacidad")
+    peso_distancia = models.FloatField(default=0.3, help_text="Peso de la distancia del viaje")
+    tipo_vehiculo = models.CharField(
+        max_length=50, choices=Vehiculo.TIPO_VEHICULO_CHOICES, blank=True,
+        help_text="Aplicar a solicitudes con este tipo de vehículo preferente (opcional)"
+    )
+    activo = models.BooleanField(default=True)
+    fecha_modificacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.nombre
+
+    class Meta:
+        ordering = ['nombre']
+        verbose_name = "Perfil de Asignación"
+        verbose_name_plural = "Perfiles de Asignación"
+
+class ZonaRuta(models.Model):
+    """
+    Zona frecuente de origen/destino de viajes. Entre zonas se guarda la
+    distancia por la red vial precalculada (DistanciaRuta).
+    """
+    nombre = models.CharField(max_length=100)
+    lat = models.FloatField()
+    lon = models.FloatField()
+    radio_km = models.FloatField(default=1.0, help_text="Radio dentro del cual un punto pertenece a la zona")
+    solicitudes = models.PositiveIntegerField(default=0, help_text="Orígenes y destinos de viajes en la zona al calcularla")
+    fecha_calculo = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.nombre
+
+    class Meta:
+        ordering = ['-solicitudes']
+        verbose_name = "Zona de Ruta"
+        verbose_name_plural = "Zonas de Ruta"
+
+class DistanciaRuta(models.Model):
+    """Distancia y tiempo por la red vial entre dos zonas frecuentes"""
+    origen = models.ForeignKey(ZonaRuta, on_delete=models.CASCADE, related_name='distancias_salida')
+    destino = models.ForeignKey(ZonaRuta, on_delete=models.CASCADE, related_name='distancias_llegada')
+    distancia_km = models.FloatField()
+    duracion_min = models.FloatField()
+
+    def __str__(self):
+        return f"{self.origen} → {self.destino}: {self.distancia_km:.1f} km"
+
+    class Meta:
+        unique_together = ('origen', 'destino')
+        verbose_name = "Distancia de Ruta"
+        verbose_name_plural = "Distancias de Ruta"
+
+class ResumenDiario(models.Model):
+    """
+    Viajes y kilómetros por (fecha, vehículo, conductor, estado), mantenido en
+    forma incremental por resumenes.py, con una sola fila por combinación.
+    `reconstruir_resumenes` lo recalcula desde las asignaciones.
+    """
+    fecha = models.DateField(help_text="Fecha local de inicio de los viajes")
+    vehiculo = models.ForeignKey(Vehiculo, on_delete=models.SET_NULL, null=True, blank=True, related_name='resumenes_diarios')
+    conductor = models.ForeignKey(Conductor, on_delete=models.SET_NULL, null=True, blank=True, related_name='resumenes_diarios')
+    estado = models.CharField(max_length=20, choices=Asignacion.ESTADO_ASIGNACION_CHOICES)
+    viajes = models.IntegerField(default=0)
+    distancia_km = models.FloatField(default=0.0, help_text="Suma de distancia_recorrida_km")
+    distancia_estimada_km = models.FloatField(default=0.0, help_text="Suma de distancia_estimada_km")
+
+    def __str__(self):
+        return f"{self.fecha} {self.get_estado_display()}: {self.viajes} viajes"
+
+    class Meta:
+        ordering = ['-fecha']
+        verbose_name = "Resumen Diario"
+        verbose_name_plural = "Resúmenes Diarios"
+        # Una fila por clave. En una restricción UNIQUE dos NULL no chocan
+        # (y nulls_distinct sólo existe en PostgreSQL 15+), así que las claves
+        # sin vehículo o sin conductor se restringen con índices parciales
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'estado', 'vehiculo', 'conductor'], name='resumen_clave_unica'
+            ),
+            models.UniqueConstraint(
+                fields=['fecha', 'estado', 'conductor'], condition=Q(vehiculo__isnull=True),
+                name='resumen_clave_sin_vehiculo'
+            ),
+            models.UniqueConstraint(
+                fields=['fecha', 'estado', 'vehiculo'], condition=Q(conductor__isnull=True),
+                name='resumen_clave_sin_conductor'
+            ),
+            models.UniqueConstraint(
+                fields=['fecha', 'estado'], condition=Q(vehiculo__isnull=True, conductor__isnull=True),
+                name='resumen_clave_sin_recursos'
+            ),
+        ]
+
+class TrabajoAsignacion(models.Model):
+    """
+    Ejecución encolada del lote de asignación automática. La procesa en
+    segundo plano el comando `procesar_trabajos_asignacion`.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En Proceso'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    perfil = models.CharField(max_length=50, blank=True, help_text="Perfil de scoring a usar (vacío = estándar)")
+    etapa = models.CharField(max_length=50, blank=True, help_text="Etapa actual del motor de asignación")
+    total = models.PositiveIntegerField(default=0, help_text="Solicitudes pendientes al iniciar el lote")
+    procesadas = models.PositiveIntegerField(default=0, help_text="Solicitudes ya resueltas")
+    resultados = models.JSONField(default=list, blank=True, help_text="Resultado por solicitud")
+    error = models.TextField(blank=True, null=True)
+    solicitado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='trabajos_asignacion'
+    )
+    fecha_creacion = models.DateTimeField(default=timezone.now)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_actualizacion = models.DateTimeField(
+        null=True, blank=True, help_text="Último latido del worker mientras el trabajo está en proceso"
+    )
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Trabajo de asignación #{self.pk} ({self.get_estado_display()})"
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        verbose_name = "Trabajo de Asignación"
+        verbose_name_plural = "Trabajos de Asignación"
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='trabajo_estado_creacion_idx'),
+        ]
@@ -0,0 +1,90 @@
+# asignaciones/optimizacion.py
+"""
+Resolución del problema de asignación (método húngaro) para el motor de
+asignación automática por lotes.
+"""
+
+import numpy as np
+
+INFACTIBLE = float('inf')
+
+
+def resolver_asignacion_min_costo(costos):
+    """
+    Resuelve la asignación de costo mínimo sobre una matriz rectangular
+    (filas = solicitudes, columnas = vehículos), dada como lista de listas o
+    arreglo NumPy.
+
+    Las celdas con costo INFACTIBLE (o None/NaN) nunca se asignan. Devuelve
+    una lista de pares (fila, columna); las filas sin columna factible quedan
+    fuera del resultado.
+    """
+    costos = np.array(costos, dtype=float)
+    if costos.ndim != 2 or costos.size == 0:
+        return []
+
+    # El algoritmo requiere filas <= columnas: si no, se resuelve la traspuesta
+    traspuesta = costos.shape[0] > costos.shape[1]
+    if traspuesta:
+        costos = costos.T
+    n, m = costos.shape
+
+    # Las celdas infactibles se reemplazan por un costo mayor que cualquier
+    # asignación factible completa, de modo que sólo se usen si no queda otra.
+    infactibles = ~np.isfinite(costos)
+    if infactibles.all():
+        return []
+    grande = (np.abs(costos[~infactibles]).max() + 1) * (n + 1)
+    matriz = np.where(infactibles, grande, costos)
+
+    # Método húngaro con potenciales (O(n^2 * m)), índices desde 1; cada paso
+    # del camino aumentante actualiza todas las columnas con operaciones de
+    # arreglo
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=int)
+    camino = np.zeros(m + 1, dtype=int)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, INFACTIBLE)
+        usado = np.zeros(m + 1, dtype=bool)
+        while True:
+            usado[j0] = True
+            i0 = p[j0]
+            libres = ~usado[1:]
+            actual = matriz[i0 - 1] - u[i0] - v[1:]
+            mejora = libres & (actual < minv[1:])
+            minv[1:][mejora] = actual[mejora]
+            camino[1:][mejora] = j0
+            candidatos = np.where(libres, minv[1:], INFACTIBLE)
+            j1 = int(np.argmin(candidatos)) + 1
+            delta = candidatos[j1 - 1]
+            u[p[usado]] += delta
+            v[usado] -= delta
+            minv[~usado] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while True:
+            j1 = camino[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+
+    columnas = np.flatnonzero(p[1:]) + 1
+    filas = p[columnas]
+    factibles = ~infactibles[filas - 1, columnas - 1]
+    filas, columnas = filas[factibles] - 1, columnas[factibles] - 1
+    if traspuesta:
+        filas, columnas = columnas, filas
+    return sorted(zip(filas.tolist(), columnas.tolist()))
+
+
+def resolver_asignacion_max_score(scores):
+    """
+    Igual que resolver_asignacion_min_costo, pero maximizando el score.
+    Las celdas None o NaN se consideran infactibles.
+    """
+    return resolver_asignacion_min_costo(-np.array(scores, dtype=float))
@@ -0,0 +1,124 @@
+# asignaciones/perfiles.py
+"""
+Perfiles de scoring del motor de asignación.
+
+Un perfil define los pesos de cargo, capacidad y distancia. Los perfiles se
+registran en código (registrar_perfil) o se crean/ajustan desde el admin
+(modelo PerfilAsignacion) sin redesplegar; se eligen por ejecución o por tipo
+de vehículo preferente de la solicitud.
+"""
+import numpy as np
+
+from .models import PerfilAsignacion
+
+# Pesos del perfil estándar
+PESO_CARGO = 0.4
+PESO_CAPACIDAD = 0.3
+PESO_DISTANCIA = 0.3
+
+CARGO_SCORE = {
+    3: 1.0,  # Jefatura/Subdirección
+    2: 0.8,  # Coordinación/Referente
+    1: 0.5,  # Funcionario
+    0: 0.2,  # Otro/No especificado
+}
+
+PERFIL_POR_DEFECTO = 'estandar'
+
+# Componentes del score que sólo dependen del vehículo, por pk:
+# (version, capacidad, novedad). Se invalidan solos cuando cambia la versión.
+_componentes_vehiculo = {}
+
+
+def componentes_vehiculo(vehiculo):
+    """Devuelve (capacidad, novedad_score) del vehículo, calculados una vez por versión"""
+    pk = getattr(vehiculo, 'pk', None)
+    version = getattr(vehiculo, 'version', None)
+    cache = _componentes_vehiculo.get(pk) if pk is not None else None
+    if cache is not None and cache[0] == version:
+        return cache[1], cache[2]
+
+    capacidad = vehiculo.capacidad_pasajeros or 1
+    anio = getattr(vehiculo, 'anio', None)
+    if anio:
+        novedad_score = min(1, max(0, (anio - 2010) / 15))  # Normaliza entre 2010 y 2025
+    else:
+        novedad_score = 0.5  # Valor por defecto
+    if pk is not None and isinstance(version, int):
+        _componentes_vehiculo[pk] = (version, capacidad, novedad_score)
+    return capacidad, novedad_score
+
+
+def componentes_flota(vehiculos):
+    """Arreglos (capacidad, novedad) de una lista de vehículos"""
+    componentes = [componentes_vehiculo(v) for v in vehiculos]
+    capacidad = np.array([c for c, _ in componentes], dtype=float)
+    novedad = np.array([n for _, n in componentes], dtype=float)
+    return capacidad, novedad
+
+
+class PerfilScore:
+    """Pesos de un perfil de scoring"""
+
+    def __init__(self, nombre, peso_cargo=PESO_CARGO, peso_capacidad=PESO_CAPACIDAD,
+                 peso_distancia=PESO_DISTANCIA, cargo_score=None, tipo_vehiculo=None):
+        self.nombre = nombre
+        self.peso_cargo = peso_cargo
+        self.peso_capacidad = peso_capacidad
+        self.peso_distancia = peso_distancia
+        self.cargo_score = cargo_score or CARGO_SCORE
+        self.tipo_vehiculo = tipo_vehiculo
+
+    @classmethod
+    def desde_modelo(cls, perfil):
+        return cls(
+            perfil.nombre,
+            peso_cargo=perfil.peso_cargo,
+            peso_capacidad=perfil.peso_capacidad,
+            peso_distancia=perfil.peso_distancia,
+            tipo_vehiculo=perfil.tipo_vehiculo or None,
+        )
+
+    def __repr__(self):
+        return f"<PerfilScore {self.nombre}>"
+
+
+_registro = {PERFIL_POR_DEFECTO: PerfilScore(PERFIL_POR_DEFECTO)}
+
+
+def registrar_perfil(perfil):
+    """Registra (o reemplaza) un perfil definido en código"""
+    _registro[perfil.nombre] = perfil
+
+
+def obtener_perfil(nombre=None):
+    """Perfil registrado en código; el estándar si no se indica nombre"""
+    return _registro[nombre or PERFIL_POR_DEFECTO]
+
+
+class SeleccionPerfiles:
+    """
+    Perfiles vigentes para una ejecución: el perfil por defecto de la
+    ejecución y, por tipo de vehículo preferente, el perfil asociado.
+    """
+
+    def __init__(self, perfiles, por_defecto=None):
+        self.perfiles = perfiles
+        if por_defecto is not None and por_defecto not in perfiles:
+            raise ValueError(f"Perfil de asignación desconocido: '{por_defecto}'")
+        self.por_defecto = perfiles[por_defecto or PERFIL_POR_DEFECTO]
+        self.por_tipo = {p.tipo_vehiculo: p for p in perfiles.values() if p.tipo_vehiculo}
+
+    def para(self, asignacion):
+        return self.por_tipo.get(asignacion.req_tipo_vehiculo_preferente, self.por_defecto)
+
+
+def cargar_perfiles(por_defecto=None):
+    """
+    Perfiles de código más los activos en base de datos (éstos prevalecen
+    ante un mismo nombre). Una sola consulta por ejecución.
+    """
+    perfiles = dict(_registro)
+    for perfil in PerfilAsignacion.objects.filter(activo=True):
+        perfiles[perfil.nombre] = PerfilScore.desde_modelo(perfil)
+    return SeleccionPerfiles(perfiles, por_defecto)
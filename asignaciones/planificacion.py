@@ -0,0 +1,556 @@
+# asignaciones/planificacion.py
+"""
+Planificación diaria por recorridos (ruteo de vehículos con ventanas de
+tiempo).
+
+Toma todos los viajes de una fecha y arma para cada vehículo una secuencia
+de viajes encadenables: el vehículo termina un viaje, se traslada en vacío
+al origen del siguiente y debe llegar antes de su hora de inicio. Minimiza
+primero los vehículos usados y luego los kilómetros en vacío (desde la base,
+entre viajes y de vuelta a la base).
+
+Heurística: inserción por orden de inicio y búsqueda local (eliminación de
+recorridos, reubicación de viajes, intercambio de colas entre recorridos y
+reasignación de vehículos a recorridos con el método húngaro), acotada por
+un tiempo máximo para poder replanificar en forma interactiva.
+"""
+import time
+from bisect import bisect_left
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .cache_dashboard import invalidar_dashboard
+from .disponibilidad import franja_asignacion, IndiceDisponibilidad
+from .elegibilidad import ElegibilidadConductores, asignar_conductores
+from .espacial import posicion_vehiculo
+from .fechas import inicio_dia, rango_dias
+from .flota import ESTADOS_VEHICULO_ASIGNABLES, invalidar_snapshot
+from .models import Asignacion, Vehiculo
+from .optimizacion import INFACTIBLE, resolver_asignacion_min_costo
+from .resumenes import cambios_en_bloque, descartar_valores_cargados
+from .rutas import obtener_matriz
+from .services import calcular_distancia_km_vectorizada, ConflictoReserva, _reservar_vehiculos
+
+# Estados que se replanifican; los viajes 'activa' quedan fijos en su vehículo,
+# y los 'programada' también salvo que se pida replanificarlos (pueden venir
+# de un despachador)
+ESTADOS_PLANIFICABLES = ('pendiente_auto', 'programada')
+ESTADOS_FIJOS = ('activa',)
+
+# Velocidad supuesta para los traslados en vacío sin distancia por la red
+VELOCIDAD_MEDIA_KMH = 40
+
+# Costo (en km equivalentes) de usar un vehículo más: domina a los km en vacío
+COSTO_VEHICULO = 10000.0
+
+# Tiempo máximo de la búsqueda local por defecto
+LIMITE_SEGUNDOS = 3.0
+
+EPSILON = 1e-9
+
+
+class PlanDia:
+    """Recorridos por vehículo resultantes de planificar una fecha"""
+
+    def __init__(self, fecha, recorridos, sin_asignar, km_vacio, segundos, actual, fijos=frozenset()):
+        self.fecha = fecha
+        self.recorridos = recorridos      # [(vehiculo, [asignaciones], km_vacio)]
+        self.sin_asignar = sin_asignar    # [asignaciones]
+        self.fijos = fijos                # pks de los viajes que el plan no mueve
+        self.km_vacio = km_vacio
+        self.segundos = segundos
+        self.actual = actual              # {'vehiculos_usados', 'km_vacio'} de la asignación vigente
+
+    @property
+    def vehiculos_usados(self):
+        return len(self.recorridos)
+
+    def como_dict(self):
+        return {
+            'fecha': self.fecha.isoformat(),
+            'vehiculos_usados': self.vehiculos_usados,
+            'km_vacio': round(self.km_vacio, 2),
+            'segundos': round(self.segundos, 3),
+            'actual': {
+                'vehiculos_usados': self.actual['vehiculos_usados'],
+                'km_vacio': round(self.actual['km_vacio'], 2),
+            },
+            'recorridos': [
+                {
+                    'vehiculo_id': vehiculo.id,
+                    'patente': vehiculo.patente,
+                    'capacidad_pasajeros': vehiculo.capacidad_pasajeros,
+                    'km_vacio': round(km, 2),
+                    'viajes': [
+                        {
+                            'asignacion_id': a.id,
+                            'inicio': a.fecha_hora_requerida_inicio.isoformat(),
+                            'fin': franja_asignacion(a)[1].isoformat(),
+                            'req_pasajeros': a.req_pasajeros,
+                            'destino_descripcion': a.destino_descripcion,
+                        }
+                        for a in viajes
+                    ],
+                }
+                for vehiculo, viajes, km in self.recorridos
+            ],
+            'sin_asignar': [a.id for a in self.sin_asignar],
+        }
+
+
+class _Problema:
+    """Datos numéricos del día: tiempos en minutos desde medianoche y km"""
+
+    def __init__(self, viajes, vehiculos, medianoche, fijos, ocupados=None):
+        self.viajes = viajes
+        self.vehiculos = vehiculos
+        n, m = len(viajes), len(vehiculos)
+        franjas = [franja_asignacion(a) for a in viajes]
+        self.inicio = np.array([(i - medianoche).total_seconds() / 60 for i, _ in franjas])
+        self.fin = np.array([(f - medianoche).total_seconds() / 60 for _, f in franjas])
+        self.req = np.array([a.req_pasajeros or 1 for a in viajes])
+        self.capacidad = np.array([v.capacidad_pasajeros or 1 for v in vehiculos])
+        # Viaje fijo -> índice de su vehículo
+        self.fijos = fijos
+        # El vehículo v está libre para el viaje i según las reservas que no
+        # son parte del plan (índice `ocupados`)
+        self.libre = np.ones((m, n), dtype=bool)
+        if ocupados is not None:
+            for v, vehiculo in enumerate(vehiculos):
+                self.libre[v] = [ocupados.esta_libre(vehiculo.pk, inicio, fin) for inicio, fin in franjas]
+
+        origen = [(a.origen_lat, a.origen_lon) for a in viajes]
+        destino = [(a.destino_lat, a.destino_lon) for a in viajes]
+        bases = [posicion_vehiculo(v) or (None, None) for v in vehiculos]
+
+        # Traslados en vacío: destino de i -> origen de j, base de v -> origen de j, destino de i -> base de v
+        self.vacio_km, self.vacio_min = _trayectos(destino, origen)
+        self.salida_km, _ = _trayectos(bases, origen)
+        self.regreso_km, _ = _trayectos(destino, bases)
+
+        # i puede preceder a j en un mismo vehículo
+        self.encadenable = (self.fin[:, None] + self.vacio_min) <= self.inicio[None, :] + EPSILON
+        np.fill_diagonal(self.encadenable, False)
+        self.n, self.m = n, m
+
+    def cabe(self, v, i):
+        return self.capacidad[v] >= self.req[i] and self.fijos.get(i, v) == v and self.libre[v, i]
+
+    def costo_recorrido(self, v, secuencia):
+        if not secuencia:
+            return 0.0
+        km = self.salida_km[v, secuencia[0]] + self.regreso_km[secuencia[-1], v]
+        for a, b in zip(secuencia, secuencia[1:]):
+            km += self.vacio_km[a, b]
+        return km
+
+    def factible(self, v, secuencia):
+        return all(self.cabe(v, i) for i in secuencia) and all(
+            self.encadenable[a, b] for a, b in zip(secuencia, secuencia[1:])
+        )
+
+    def posicion(self, secuencia, i):
+        """Posición de i en la secuencia (ordenada por inicio) o None si no encadena"""
+        p = bisect_left([self.inicio[k] for k in secuencia], self.inicio[i])
+        if p > 0 and not self.encadenable[secuencia[p - 1], i]:
+            return None
+        if p < len(secuencia) and not self.encadenable[i, secuencia[p]]:
+            return None
+        return p
+
+    def costo_insercion(self, v, secuencia, i):
+        """(delta_km, posición) de insertar i en el recorrido de v, o None"""
+        if not self.cabe(v, i):
+            return None
+        if not secuencia:
+            return self.salida_km[v, i] + self.regreso_km[i, v], 0
+        p = self.posicion(secuencia, i)
+        if p is None:
+            return None
+        anterior = secuencia[p - 1] if p > 0 else None
+        siguiente = secuencia[p] if p < len(secuencia) else None
+        antes = self._tramo(v, anterior, siguiente)
+        despues = self._tramo(v, anterior, i) + self._tramo(v, i, siguiente)
+        return despues - antes, p
+
+    def _tramo(self, v, a, b):
+        if a is None and b is None:
+            return 0.0
+        if a is None:
+            return self.salida_km[v, b]
+        if b is None:
+            return self.regreso_km[a, v]
+        return self.vacio_km[a, b]
+
+
+def _trayectos(desde, hasta):
+    """Matrices (km, minutos) entre dos listas de puntos; 0 si falta una coordenada"""
+    if not desde or not hasta:
+        return np.zeros((len(desde), len(hasta))), np.zeros((len(desde), len(hasta)))
+    d = np.array([[np.nan if c is None else c for c in p] for p in desde], dtype=float)
+    h = np.array([[np.nan if c is None else c for c in p] for p in hasta], dtype=float)
+    km = calcular_distancia_km_vectorizada(d[:, 0, None], d[:, 1, None], h[None, :, 0], h[None, :, 1])
+    km = np.nan_to_num(km)
+    minutos = km / VELOCIDAD_MEDIA_KMH * 60
+
+    # Donde ambos puntos caen en zonas de la matriz vial se usa la red
+    matriz = obtener_matriz()
+    if matriz.distancias:
+        zonas_desde = [matriz.zona_de(*p) if None not in p else None for p in desde]
+        zonas_hasta = [matriz.zona_de(*p) if None not in p else None for p in hasta]
+        for i, zo in enumerate(zonas_desde):
+            if zo is None:
+                continue
+            for j, zd in enumerate(zonas_hasta):
+                ruta = matriz.distancias.get((zo, zd)) if zd is not None else None
+                if ruta is not None:
+                    km[i, j], minutos[i, j] = ruta
+    return km, minutos
+
+
+def _construir(problema):
+    """Inserción por orden de inicio: primero en recorridos abiertos, luego un vehículo nuevo"""
+    recorridos = {}
+    sin_asignar = []
+    for i, v in problema.fijos.items():
+        recorridos.setdefault(v, []).append(i)
+    for v in recorridos:
+        recorridos[v].sort(key=lambda k: problema.inicio[k])
+
+    for i in sorted(range(problema.n), key=lambda k: (problema.inicio[k], -problema.req[k])):
+        if i in problema.fijos:
+            continue
+        mejor = None
+        for v in range(problema.m):
+            secuencia = recorridos.get(v)
+            resultado = problema.costo_insercion(v, secuencia or [], i)
+            if resultado is None:
+                continue
+            delta, p = resultado
+            if not secuencia:
+                # Abrir un vehículo cuesta más que cualquier km en vacío; entre
+                # vehículos libres se prefiere el de menor capacidad suficiente
+                delta += COSTO_VEHICULO + problema.capacidad[v] * 0.01
+            if mejor is None or delta < mejor[0]:
+                mejor = (delta, v, p)
+        if mejor is None:
+            sin_asignar.append(i)
+            continue
+        _, v, p = mejor
+        recorridos.setdefault(v, []).insert(p, i)
+    return recorridos, sin_asignar
+
+
+def _costo_total(problema, recorridos):
+    return sum(
+        COSTO_VEHICULO + problema.costo_recorrido(v, s) for v, s in recorridos.items() if s
+    )
+
+
+def _eliminar_recorridos(problema, recorridos):
+    """Intenta vaciar los recorridos más cortos reubicando sus viajes en los demás"""
+    mejoro = False
+    for v in sorted(recorridos, key=lambda k: len(recorridos[k])):
+        secuencia = recorridos.get(v)
+        if not secuencia or any(i in problema.fijos for i in secuencia):
+            continue
+        tentativos = {k: list(s) for k, s in recorridos.items() if k != v and s}
+        for i in secuencia:
+            mejor = None
+            for w, otra in tentativos.items():
+                resultado = problema.costo_insercion(w, otra, i)
+                if resultado is not None and (mejor is None or resultado[0] < mejor[0]):
+                    mejor = (resultado[0], w, resultado[1])
+            if mejor is None:
+                break
+            tentativos[mejor[1]].insert(mejor[2], i)
+        else:
+            recorridos.clear()
+            recorridos.update(tentativos)
+            mejoro = True
+    return mejoro
+
+
+def _reubicar(problema, recorridos):
+    """Mueve viajes sueltos a otro recorrido cuando baja el costo"""
+    mejoro = False
+    for v in list(recorridos):
+        secuencia = recorridos.get(v)
+        p = 0
+        while secuencia and p < len(secuencia):
+            i = secuencia[p]
+            if i in problema.fijos:
+                p += 1
+                continue
+            sin_i = secuencia[:p] + secuencia[p + 1:]
+            ahorro = problema.costo_recorrido(v, secuencia) - problema.costo_recorrido(v, sin_i)
+            if not sin_i:
+                ahorro += COSTO_VEHICULO
+            mejor = None
+            for w, otra in recorridos.items():
+                if w == v or not otra:
+                    continue
+                resultado = problema.costo_insercion(w, otra, i)
+                if resultado is not None and resultado[0] < ahorro - EPSILON and (
+                        mejor is None or resultado[0] < mejor[0]):
+                    mejor = (resultado[0], w, resultado[1])
+            if mejor is None:
+                p += 1
+                continue
+            recorridos[mejor[1]].insert(mejor[2], i)
+            recorridos[v] = secuencia = sin_i
+            mejoro = True
+        if not recorridos.get(v):
+            recorridos.pop(v, None)
+    return mejoro
+
+
+def _intercambiar_colas(problema, recorridos, limite):
+    """
+    2-opt* entre pares de recorridos: A[:x] + B[y:] y B[:y] + A[x:], si ambos
+    encadenan, respetan capacidades y bajan los km en vacío. Cada corte se
+    evalúa en O(1) con sumas acumuladas de los tramos internos.
+    """
+    mejoro = False
+    vehiculos = list(recorridos)
+    for a_idx, v in enumerate(vehiculos):
+        for w in vehiculos[a_idx + 1:]:
+            if time.perf_counter() > limite:
+                return mejoro
+            a, b = recorridos[v], recorridos[w]
+            if not a or not b:
+                continue
+            pa, sa, ma, fa = _acumulados(problema, a)
+            pb, sb, mb, fb = _acumulados(problema, b)
+            libres_a, libres_b = _colas_libres(problema, w, a), _colas_libres(problema, v, b)
+            actual = problema.costo_recorrido(v, a) + problema.costo_recorrido(w, b)
+            mejor = None
+            for x in range(len(a) + 1):
+                for y in range(len(b) + 1):
+                    # Ambos recorridos deben quedar con viajes y cambiar
+                    if (x == 0 and y == 0) or (x == len(a) and y == len(b)):
+                        continue
+                    if (x == 0 and y == len(b)) or (y == 0 and x == len(a)):
+                        continue
+                    # Capacidad, viajes fijos y reservas de las colas que cambian de vehículo
+                    if mb[y] > problema.capacidad[v] or ma[x] > problema.capacidad[w] or fb[y] or fa[x]:
+                        continue
+                    if not libres_b[y] or not libres_a[x]:
+                        continue
+                    if x > 0 and y < len(b) and not problema.encadenable[a[x - 1], b[y]]:
+                        continue
+                    if y > 0 and x < len(a) and not problema.encadenable[b[y - 1], a[x]]:
+                        continue
+                    costo = (
+                        _costo_union(problema, v, a, x, b, y, pa, sb) +
+                        _costo_union(problema, w, b, y, a, x, pb, sa)
+                    )
+                    if costo < actual - EPSILON and (mejor is None or costo < mejor[0]):
+                        mejor = (costo, x, y)
+            if mejor is not None:
+                _, x, y = mejor
+                recorridos[v], recorridos[w] = a[:x] + b[y:], b[:y] + a[x:]
+                mejoro = True
+    return mejoro
+
+
+def _acumulados(problema, secuencia):
+    """
+    Para cada corte k de la secuencia: km internos de secuencia[:k] y de
+    secuencia[k:], pasajeros máximos de secuencia[k:] y si secuencia[k:]
+    tiene viajes fijos.
+    """
+    n = len(secuencia)
+    prefijo = [0.0] * (n + 1)
+    for k in range(2, n + 1):
+        prefijo[k] = prefijo[k - 1] + problema.vacio_km[secuencia[k - 2], secuencia[k - 1]]
+    sufijo = [0.0] * (n + 1)
+    maximo = [0] * (n + 1)
+    fijos = [False] * (n + 1)
+    for k in range(n - 1, -1, -1):
+        if k < n - 1:
+            sufijo[k] = sufijo[k + 1] + problema.vacio_km[secuencia[k], secuencia[k + 1]]
+        maximo[k] = max(maximo[k + 1], problema.req[secuencia[k]])
+        fijos[k] = fijos[k + 1] or secuencia[k] in problema.fijos
+    return prefijo, sufijo, maximo, fijos
+
+
+def _colas_libres(problema, v, secuencia):
+    """Para cada corte k, si el vehículo v está libre en todos los viajes de secuencia[k:]"""
+    libres = [True] * (len(secuencia) + 1)
+    for k in range(len(secuencia) - 1, -1, -1):
+        libres[k] = libres[k + 1] and problema.libre[v, secuencia[k]]
+    return libres
+
+
+def _costo_union(problema, v, cabeza, x, cola, y, prefijo_cabeza, sufijo_cola):
+    """km en vacío del vehículo v haciendo cabeza[:x] + cola[y:]"""
+    primero = cabeza[0] if x > 0 else cola[y]
+    ultimo = cola[-1] if y < len(cola) else cabeza[x - 1]
+    km = problema.salida_km[v, primero] + problema.regreso_km[ultimo, v]
+    km += prefijo_cabeza[x] + sufijo_cola[y]
+    if x > 0 and y < len(cola):
+        km += problema.vacio_km[cabeza[x - 1], cola[y]]
+    return km
+
+
+def _reasignar_vehiculos(problema, recorridos):
+    """Elige con el método húngaro qué vehículo hace cada recorrido (base y capacidad)"""
+    secuencias = [s for s in recorridos.values() if s]
+    costos = []
+    for s in secuencias:
+        fila = []
+        for v in range(problema.m):
+            fila.append(problema.costo_recorrido(v, s) if problema.factible(v, s) else INFACTIBLE)
+        costos.append(fila)
+    pares = resolver_asignacion_min_costo(costos)
+    if len(pares) < len(secuencias):
+        return False
+    nuevos = {v: secuencias[fila] for fila, v in pares}
+    if _costo_total(problema, nuevos) < _costo_total(problema, recorridos) - EPSILON:
+        recorridos.clear()
+        recorridos.update(nuevos)
+        return True
+    return False
+
+
+def planificar_dia(fecha, limite_segundos=LIMITE_SEGUNDOS, replanificar_programadas=False):
+    """
+    Arma los recorridos de los viajes de `fecha` (date en hora local). Los
+    viajes 'pendiente_auto' se planifican; los 'activa' y los 'programada'
+    quedan en su vehículo, salvo que `replanificar_programadas` permita mover
+    estos últimos. Un programado que el plan no logra encadenar en otro lado
+    vuelve a fijarse en su vehículo. Las demás reservas que ocupan a un
+    vehículo en el día (p. ej. un viaje del día anterior que termina pasada la
+    medianoche) lo bloquean en su franja. Devuelve un PlanDia sin guardar nada.
+    """
+    inicio_calculo = time.perf_counter()
+    medianoche, siguiente = rango_dias(fecha, fecha)
+    estados_fijos = ESTADOS_FIJOS if replanificar_programadas else ESTADOS_FIJOS + ('programada',)
+    viajes = list(
+        Asignacion.objects.filter(
+            fecha_hora_requerida_inicio__gte=medianoche,
+            fecha_hora_requerida_inicio__lt=siguiente,
+            estado__in=ESTADOS_PLANIFICABLES + ESTADOS_FIJOS,
+        ).order_by('fecha_hora_requerida_inicio', 'id')
+    )
+    ids_fijos = {a.vehiculo_id for a in viajes if a.estado in estados_fijos and a.vehiculo_id}
+    vehiculos = list(
+        Vehiculo.objects.filter(estado__in=ESTADOS_VEHICULO_ASIGNABLES) | Vehiculo.objects.filter(pk__in=ids_fijos)
+    )
+    columna = {v.pk: j for j, v in enumerate(vehiculos)}
+    fijos = {
+        i: columna[a.vehiculo_id] for i, a in enumerate(viajes)
+        if a.estado in estados_fijos and a.vehiculo_id in columna
+    }
+    ocupados = IndiceDisponibilidad.desde_bd(desde=medianoche)
+    for a in viajes:
+        ocupados.quitar(a.pk)
+    problema = _Problema(viajes, vehiculos, medianoche, fijos, ocupados)
+    # Un vehículo no asignable (p. ej. en mantenimiento) sólo lleva sus viajes fijos
+    for j, vehiculo in enumerate(vehiculos):
+        if vehiculo.estado not in ESTADOS_VEHICULO_ASIGNABLES:
+            problema.libre[j] &= np.isin(np.arange(len(viajes)), [i for i, v in fijos.items() if v == j])
+    actual = _evaluar_actual(problema)
+
+    limite = inicio_calculo + limite_segundos
+    recorridos, sin_asignar = _buscar(problema, limite)
+    devueltos = {
+        i: columna[viajes[i].vehiculo_id] for i in sin_asignar
+        if viajes[i].estado == 'programada' and viajes[i].vehiculo_id in columna
+    }
+    if devueltos:
+        # Se replanifica con esos programados en su vehículo, para no dejar
+        # franjas traslapadas con ellos
+        fijos.update(devueltos)
+        recorridos, sin_asignar = _buscar(problema, limite)
+
+    resultado = []
+    km_total = 0.0
+    for v, secuencia in sorted(recorridos.items(), key=lambda par: problema.inicio[par[1][0]]):
+        if not secuencia:
+            continue
+        km = float(problema.costo_recorrido(v, secuencia))
+        km_total += km
+        resultado.append((vehiculos[v], [viajes[i] for i in secuencia], km))
+    return PlanDia(
+        fecha, resultado, [viajes[i] for i in sin_asignar], km_total,
+        time.perf_counter() - inicio_calculo, actual, frozenset(viajes[i].pk for i in fijos),
+    )
+
+
+def _buscar(problema, limite):
+    """Construcción inicial y búsqueda local hasta no mejorar o llegar a `limite`"""
+    recorridos, sin_asignar = _construir(problema)
+    mejoro = True
+    while mejoro and time.perf_counter() < limite:
+        mejoro = _eliminar_recorridos(problema, recorridos)
+        mejoro |= _reubicar(problema, recorridos)
+        mejoro |= _intercambiar_colas(problema, recorridos, limite)
+        mejoro |= _reasignar_vehiculos(problema, recorridos)
+    return recorridos, sin_asignar
+
+
+def _evaluar_actual(problema):
+    """Vehículos y km en vacío de la asignación vigente de los viajes del día"""
+    columna = {v.pk: j for j, v in enumerate(problema.vehiculos)}
+    actuales = {}
+    for i, a in enumerate(problema.viajes):
+        if a.vehiculo_id in columna:
+            actuales.setdefault(columna[a.vehiculo_id], []).append(i)
+    km = sum(
+        problema.costo_recorrido(v, sorted(s, key=lambda k: problema.inicio[k]))
+        for v, s in actuales.items()
+    )
+    return {'vehiculos_usados': len(actuales), 'km_vacio': float(km)}
+
+
+def aplicar_plan(plan):
+    """
+    Guarda el plan: reserva los vehículos con compare-and-swap y mueve cada
+    viaje a su vehículo, sólo si sigue en el estado con el que se planificó.
+    Los conductores que no pueden manejar el nuevo vehículo se reemplazan.
+    Los viajes fijos y los que el plan no pudo encadenar (plan.sin_asignar)
+    no se tocan. Lanza ConflictoReserva si algo cambió entretanto (nada
+    queda guardado).
+    """
+    desde = inicio_dia(plan.fecha)
+    por_mover = [(v, [a for a in viajes if a.pk not in plan.fijos]) for v, viajes, _ in plan.recorridos]
+    with transaction.atomic(), cambios_en_bloque([a.pk for _, viajes in por_mover for a in viajes]):
+        # Los vehículos que sólo llevan viajes fijos ya están comprometidos
+        por_reservar = [v for v, viajes in por_mover if v.estado in ESTADOS_VEHICULO_ASIGNABLES and viajes]
+        if len(_reservar_vehiculos(por_reservar)) != len(por_reservar):
+            raise ConflictoReserva
+
+        elegibilidad = ElegibilidadConductores.desde_bd()
+        movidas = []
+        for vehiculo, viajes in por_mover:
+            for a in viajes:
+                actualizadas = Asignacion.objects.filter(
+                    pk=a.pk, estado=a.estado, vehiculo_id=a.vehiculo_id
+                ).update(vehiculo=vehiculo, estado='programada')
+                if not actualizadas:
+                    raise ConflictoReserva
+                inicio, _ = franja_asignacion(a)
+                if a.conductor_id and not elegibilidad.puede_conducir(
+                        a.conductor_id, vehiculo.tipo_vehiculo, timezone.localtime(inicio).date()):
+                    a.conductor = None
+                a.vehiculo = vehiculo
+                a.estado = 'programada'
+                movidas.append(a)
+
+        sin_conductor = [a for a in movidas if a.conductor_id is None]
+        if sin_conductor:
+            indice = IndiceDisponibilidad.desde_bd(campo='conductor_id', desde=desde)
+            for a in sin_conductor:
+                indice.quitar(a.pk)
+            asignar_conductores(
+                sin_conductor, [franja_asignacion(a) for a in sin_conductor], elegibilidad, indice
+            )
+        Asignacion.objects.bulk_update(movidas, ['conductor'])
+    descartar_valores_cargados(movidas)
+    invalidar_snapshot()
+    invalidar_dashboard()
+    return len(movidas)
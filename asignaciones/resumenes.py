@@ -0,0 +1,212 @@
+# asignaciones/resumenes.py
+"""
+Mantenimiento incremental de ResumenDiario.
+
+Cada asignación aporta un viaje y sus distancias a la fila de su (fecha
+local de inicio, vehículo, conductor, estado). Al guardarla o eliminarla se
+resta su aporte anterior y se suma el nuevo (señales en signals.py); las
+escrituras en bloque, que no disparan señales, se envuelven en
+cambios_en_bloque(). reconstruir_resumenes() recalcula desde cero.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .cache_dashboard import invalidar_historico
+from .fechas import inicio_dia
+from .models import Asignacion, ResumenDiario
+
+CAMPOS = (
+    'fecha_hora_requerida_inicio', 'vehiculo_id', 'conductor_id', 'estado',
+    'distancia_recorrida_km', 'distancia_estimada_km',
+)
+
+# Máximo de parámetros por consulta pk__in (SQL Server admite 2100)
+TAMANO_LOTE = 1000
+
+
+def aporte(inicio, vehiculo_id, conductor_id, estado, distancia_km, distancia_estimada_km):
+    """(clave, (viajes, km, km_estimados)) con que una asignación suma al resumen"""
+    clave = (timezone.localtime(inicio).date(), vehiculo_id, conductor_id, estado)
+    return clave, (1, distancia_km or 0.0, distancia_estimada_km or 0.0)
+
+
+def aporte_asignacion(asignacion):
+    return aporte(*(getattr(asignacion, campo) for campo in CAMPOS))
+
+
+# Marca un valor de CAMPOS que no se conoce sin consultar la base
+NO_CARGADO = object()
+
+
+def valores_cargados(asignacion):
+    """Valores de CAMPOS en memoria, sin leer de la base los campos diferidos"""
+    return tuple(asignacion.__dict__.get(campo, NO_CARGADO) for campo in CAMPOS)
+
+
+def aporte_en_memoria(valores):
+    """
+    Aporte a partir de `valores` (ver valores_cargados), o NO_CARGADO si
+    alguno no es un valor concreto: un campo diferido, una expresión F() o un
+    tipo que sólo la base normaliza (p. ej. una fecha como texto).
+    """
+    if valores is None or NO_CARGADO in valores:
+        return NO_CARGADO
+    inicio, vehiculo_id, conductor_id, estado, distancia_km, distancia_estimada_km = valores
+    if not isinstance(inicio, datetime) or timezone.is_naive(inicio) or not isinstance(estado, str):
+        return NO_CARGADO
+    if not all(v is None or isinstance(v, int) for v in (vehiculo_id, conductor_id)):
+        return NO_CARGADO
+    if not all(v is None or isinstance(v, (int, float)) for v in (distancia_km, distancia_estimada_km)):
+        return NO_CARGADO
+    return aporte(*valores)
+
+
+def descartar_valores_cargados(asignaciones):
+    """
+    Para instancias en memoria cuya fila se escribió con update() o
+    bulk_update(): su próximo save() lee el aporte anterior de la base.
+    """
+    for asignacion in asignaciones:
+        asignacion._valores_resumen = None
+
+
+def aporte_guardado(pk):
+    """Aporte de la fila tal como está en la base, o None si no existe"""
+    fila = Asignacion.objects.filter(pk=pk).values_list(*CAMPOS).first()
+    return None if fila is None else aporte(*fila)
+
+
+def registrar_cambio(anterior, actual):
+    """Pasa del aporte `anterior` al `actual` (cualquiera puede ser None)"""
+    if anterior == actual:
+        return
+    deltas = defaultdict(lambda: [0, 0.0, 0.0])
+    _acumular(deltas, anterior, -1)
+    _acumular(deltas, actual, 1)
+    _aplicar(deltas)
+
+
+def _acumular(deltas, aporte_, signo):
+    if aporte_ is None:
+        return
+    clave, valores = aporte_
+    for posicion, valor in enumerate(valores):
+        deltas[clave][posicion] += signo * valor
+
+
+def _aplicar(deltas):
+    """Suma cada delta a la única fila de su clave, creándola o borrándola según haga falta"""
+    for (fecha, vehiculo_id, conductor_id, estado), (viajes, km, km_estimados) in deltas.items():
+        if not viajes and not km and not km_estimados:
+            continue
+        clave = {'fecha': fecha, 'vehiculo_id': vehiculo_id, 'conductor_id': conductor_id, 'estado': estado}
+        incremento = {
+            'viajes': F('viajes') + viajes,
+            'distancia_km': F('distancia_km') + km,
+            'distancia_estimada_km': F('distancia_estimada_km') + km_estimados,
+        }
+        if ResumenDiario.objects.filter(**clave).update(**incremento):
+            if viajes < 0:
+                ResumenDiario.objects.filter(**clave, viajes__lte=0).delete()
+            continue
+        try:
+            with transaction.atomic():
+                ResumenDiario.objects.create(
+                    **clave, viajes=viajes, distancia_km=km, distancia_estimada_km=km_estimados
+                )
+        except IntegrityError:
+            # Otra transacción creó la fila de la clave entretanto
+            ResumenDiario.objects.filter(**clave).update(**incremento)
+
+
+def desvincular_recurso(campo, recurso):
+    """
+    Antes de eliminar un vehículo o conductor (`campo` 'vehiculo_id' o
+    'conductor_id'), mueve sus filas a la clave sin ese recurso, que es donde
+    quedan sus viajes (on_delete=SET_NULL) y donde las pondría
+    reconstruir_resumenes().
+    """
+    deltas = defaultdict(lambda: [0, 0.0, 0.0])
+    filas = ResumenDiario.objects.filter(**{campo: recurso}).values_list(
+        'fecha', 'vehiculo_id', 'conductor_id', 'estado', 'viajes', 'distancia_km', 'distancia_estimada_km'
+    )
+    for fecha, vehiculo_id, conductor_id, estado, *valores in filas:
+        clave = (fecha, vehiculo_id, conductor_id, estado)
+        sin_recurso = (
+            (fecha, None, conductor_id, estado) if campo == 'vehiculo_id' else (fecha, vehiculo_id, None, estado)
+        )
+        _acumular(deltas, (clave, valores), -1)
+        _acumular(deltas, (sin_recurso, valores), 1)
+    with transaction.atomic():
+        _aplicar(deltas)
+
+
+def _aportes(pks):
+    aportes = {}
+    for i in range(0, len(pks), TAMANO_LOTE):
+        filas = Asignacion.objects.filter(pk__in=pks[i:i + TAMANO_LOTE]).values_list('pk', *CAMPOS)
+        for pk, *valores in filas:
+            aportes[pk] = aporte(*valores)
+    return aportes
+
+
+@contextmanager
+def cambios_en_bloque(pks):
+    """
+    Envuelve escrituras que no disparan señales (update(), bulk_update())
+    sobre las asignaciones `pks`: compara sus aportes antes y después y
+    aplica sólo las diferencias, agrupadas por clave.
+    """
+    pks = list(pks)
+    with transaction.atomic():
+        antes = _aportes(pks)
+        yield
+        despues = _aportes(pks)
+        deltas = defaultdict(lambda: [0, 0.0, 0.0])
+        for pk in pks:
+            if antes.get(pk) != despues.get(pk):
+                _acumular(deltas, antes.get(pk), -1)
+                _acumular(deltas, despues.get(pk), 1)
+        _aplicar(deltas)
+        invalidar_historico([fecha for fecha, *_ in deltas])
+
+
+def reconstruir_resumenes(desde=None, hasta=None):
+    """
+    Recalcula el resumen de las fechas [desde, hasta] (todas si se omiten)
+    con una consulta agrupada sobre Asignacion. Devuelve las filas creadas.
+    """
+    asignaciones = Asignacion.objects.annotate(fecha=TruncDate('fecha_hora_requerida_inicio'))
+    resumenes = ResumenDiario.objects.all()
+    if desde is not None:
+        asignaciones = asignaciones.filter(fecha_hora_requerida_inicio__gte=inicio_dia(desde))
+        resumenes = resumenes.filter(fecha__gte=desde)
+    if hasta is not None:
+        asignaciones = asignaciones.filter(fecha_hora_requerida_inicio__lt=inicio_dia(hasta + timedelta(days=1)))
+        resumenes = resumenes.filter(fecha__lte=hasta)
+    filas = asignaciones.values('fecha', 'vehiculo_id', 'conductor_id', 'estado').annotate(
+        total=Count('id'),
+        km=Coalesce(Sum('distancia_recorrida_km'), 0.0),
+        km_estimados=Coalesce(Sum('distancia_estimada_km'), 0.0),
+    ).order_by()
+    with transaction.atomic():
+        resumenes.delete()
+        invalidar_historico()
+        return len(ResumenDiario.objects.bulk_create(
+            (
+                ResumenDiario(
+                    fecha=fila['fecha'], vehiculo_id=fila['vehiculo_id'],
+                    conductor_id=fila['conductor_id'], estado=fila['estado'],
+                    viajes=fila['total'], distancia_km=fila['km'],
+                    distancia_estimada_km=fila['km_estimados'],
+                )
+                for fila in filas.iterator(chunk_size=2000)
+            ),
+            batch_size=1000,
+        ))
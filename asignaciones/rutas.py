@@ -0,0 +1,307 @@
+# asignaciones/rutas.py
+"""
+Distancias por la red vial, calculadas sin servicios externos.
+
+GrafoVial carga un extracto local de la red (GeoJSON de líneas, como el que
+producen osmtogeojson u ogr2ogr a partir de un .osm.pbf de la región) y
+calcula caminos mínimos con Dijkstra o A*. Entre las zonas frecuentes de
+origen/destino (ZonaRuta) la matriz se precalcula y se guarda en
+DistanciaRuta; MatrizOD la mantiene en memoria para consultarla en O(1).
+"""
+import heapq
+import json
+import threading
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .distancias import calcular_distancia_km, limpiar_cache
+from .espacial import IndiceEspacial
+from .models import Asignacion, ZonaRuta, DistanciaRuta
+
+# Velocidad (km/h) por tipo de vía de OSM cuando la vía no indica maxspeed
+VELOCIDAD_POR_TIPO = {
+    'motorway': 100, 'motorway_link': 60,
+    'trunk': 80, 'trunk_link': 50,
+    'primary': 60, 'primary_link': 40,
+    'secondary': 50, 'secondary_link': 40,
+    'tertiary': 40, 'tertiary_link': 30,
+    'unclassified': 40, 'residential': 30,
+    'living_street': 10, 'service': 20, 'track': 20,
+}
+VELOCIDAD_POR_DEFECTO = 40
+
+# Antigüedad máxima de la matriz en memoria antes de releerla
+EDAD_MAXIMA = timedelta(hours=1)
+
+# Versión de la matriz en el caché compartido: calcular_rutas la incrementa y
+# cada proceso la revisa cada INTERVALO_VERSION para releer la suya
+CLAVE_VERSION = 'rutas:version_matriz'
+INTERVALO_VERSION = timedelta(minutes=1)
+
+
+def _velocidad(propiedades):
+    maxspeed = str(propiedades.get('maxspeed') or '').split(' ')[0]
+    if maxspeed.isdigit():
+        return int(maxspeed)
+    return VELOCIDAD_POR_TIPO.get(propiedades.get('highway'), VELOCIDAD_POR_DEFECTO)
+
+
+class GrafoVial:
+    """Nodos (lat, lon) y aristas dirigidas con km y minutos"""
+
+    def __init__(self):
+        self.nodos = {}
+        self.aristas = defaultdict(list)
+        self._ids = {}
+        self._espacial = None
+
+    @classmethod
+    def desde_geojson(cls, ruta):
+        """
+        Carga un FeatureCollection de LineString/MultiLineString. Respeta las
+        propiedades 'oneway' ('yes'/'-1') y 'maxspeed'/'highway' de OSM.
+        """
+        with open(ruta, encoding='utf-8') as f:
+            datos = json.load(f)
+        grafo = cls()
+        for feature in datos.get('features', []):
+            geometria = feature.get('geometry') or {}
+            propiedades = feature.get('properties') or {}
+            if geometria.get('type') == 'LineString':
+                lineas = [geometria['coordinates']]
+            elif geometria.get('type') == 'MultiLineString':
+                lineas = geometria['coordinates']
+            else:
+                continue
+            oneway = str(propiedades.get('oneway', 'no')).lower()
+            velocidad = _velocidad(propiedades)
+            for linea in lineas:
+                puntos = [grafo._nodo(lat, lon) for lon, lat, *_ in linea]
+                if oneway == '-1':
+                    puntos.reverse()
+                for a, b in zip(puntos, puntos[1:]):
+                    km = calcular_distancia_km(*grafo.nodos[a], *grafo.nodos[b])
+                    grafo.agregar_arista(
+                        a, b, km, km / velocidad * 60,
+                        doble_sentido=oneway not in ('yes', 'true', '1', '-1')
+                    )
+        return grafo
+
+    def _nodo(self, lat, lon):
+        # Los extremos compartidos por dos vías son el mismo nodo
+        clave = (round(lat, 7), round(lon, 7))
+        nodo = self._ids.get(clave)
+        if nodo is None:
+            nodo = self._ids[clave] = len(self._ids)
+            self.nodos[nodo] = (lat, lon)
+            self._espacial = None
+        return nodo
+
+    def agregar_arista(self, a, b, km, minutos, doble_sentido=True):
+        self.aristas[a].append((b, km, minutos))
+        if doble_sentido:
+            self.aristas[b].append((a, km, minutos))
+
+    @property
+    def cantidad_aristas(self):
+        return sum(len(v) for v in self.aristas.values())
+
+    def nodo_mas_cercano(self, lat, lon):
+        """(nodo, distancia_km) del nodo más cercano al punto, o None si el grafo está vacío"""
+        if self._espacial is None:
+            self._espacial = IndiceEspacial(tamano_celda=0.005)
+            for nodo, (nlat, nlon) in self.nodos.items():
+                self._espacial.agregar(nodo, nlat, nlon)
+        cercanos = self._espacial.cercanos(lat, lon, 1)
+        return cercanos[0] if cercanos else None
+
+    def dijkstra(self, origen):
+        """Camino más corto (en km) desde `origen` a todos los nodos: {nodo: (km, minutos)}"""
+        resultado = {}
+        cola = [(0.0, 0.0, origen)]
+        while cola:
+            km, minutos, nodo = heapq.heappop(cola)
+            if nodo in resultado:
+                continue
+            resultado[nodo] = (km, minutos)
+            for vecino, km_arista, min_arista in self.aristas.get(nodo, ()):
+                if vecino not in resultado:
+                    heapq.heappush(cola, (km + km_arista, minutos + min_arista, vecino))
+        return resultado
+
+    def a_estrella(self, origen, destino):
+        """
+        Camino más corto (en km) entre dos nodos guiado por la distancia en
+        línea recta, que nunca sobreestima. Devuelve (km, minutos) o None.
+        """
+        destino_lat, destino_lon = self.nodos[destino]
+
+        def estimado(nodo):
+            return calcular_distancia_km(*self.nodos[nodo], destino_lat, destino_lon)
+
+        mejor = {origen: 0.0}
+        cola = [(estimado(origen), 0.0, 0.0, origen)]
+        cerrados = set()
+        while cola:
+            _, km, minutos, nodo = heapq.heappop(cola)
+            if nodo == destino:
+                return km, minutos
+            if nodo in cerrados:
+                continue
+            cerrados.add(nodo)
+            for vecino, km_arista, min_arista in self.aristas.get(nodo, ()):
+                nuevo = km + km_arista
+                if nuevo < mejor.get(vecino, float('inf')):
+                    mejor[vecino] = nuevo
+                    heapq.heappush(cola, (nuevo + estimado(vecino), nuevo, minutos + min_arista, vecino))
+        return None
+
+    def ruta_entre_puntos(self, origen_lat, origen_lon, destino_lat, destino_lon):
+        """(km, minutos) por la red entre dos puntos, sumando el tramo en línea recta hasta la red"""
+        origen = self.nodo_mas_cercano(origen_lat, origen_lon)
+        destino = self.nodo_mas_cercano(destino_lat, destino_lon)
+        if origen is None or destino is None:
+            return None
+        ruta = self.a_estrella(origen[0], destino[0])
+        if ruta is None:
+            return None
+        acceso_km = origen[1] + destino[1]
+        return ruta[0] + acceso_km, ruta[1] + acceso_km / VELOCIDAD_POR_DEFECTO * 60
+
+
+def zonas_frecuentes(limite, tamano_celda=0.01, radio_km=1.0):
+    """
+    Zonas (sin guardar) en las celdas con más orígenes y destinos de viajes,
+    centradas en el promedio de los puntos de cada celda.
+    """
+    puntos = defaultdict(list)
+    filas = Asignacion.objects.values_list('origen_lat', 'origen_lon', 'destino_lat', 'destino_lon')
+    for origen_lat, origen_lon, destino_lat, destino_lon in filas.iterator(chunk_size=2000):
+        for lat, lon in ((origen_lat, origen_lon), (destino_lat, destino_lon)):
+            if lat is not None and lon is not None:
+                puntos[(round(lat / tamano_celda), round(lon / tamano_celda))].append((lat, lon))
+    conteo = Counter({celda: len(p) for celda, p in puntos.items()})
+    zonas = []
+    for celda, cantidad in conteo.most_common(limite):
+        lat = sum(p[0] for p in puntos[celda]) / cantidad
+        lon = sum(p[1] for p in puntos[celda]) / cantidad
+        zonas.append(ZonaRuta(
+            nombre=f"Zona {lat:.3f}, {lon:.3f}", lat=lat, lon=lon,
+            radio_km=radio_km, solicitudes=cantidad,
+        ))
+    return zonas
+
+
+def calcular_distancias_zonas(grafo, zonas):
+    """
+    Matriz origen/destino entre zonas ya guardadas: un Dijkstra por zona de
+    origen. Los pares sin camino por la red se omiten.
+    """
+    nodos = {}
+    for zona in zonas:
+        cercano = grafo.nodo_mas_cercano(zona.lat, zona.lon)
+        if cercano is not None:
+            nodos[zona.pk] = cercano
+    distancias = []
+    for origen in zonas:
+        if origen.pk not in nodos:
+            continue
+        nodo_origen, acceso_origen = nodos[origen.pk]
+        alcanzados = grafo.dijkstra(nodo_origen)
+        for destino in zonas:
+            if destino.pk == origen.pk or destino.pk not in nodos:
+                continue
+            nodo_destino, acceso_destino = nodos[destino.pk]
+            if nodo_destino not in alcanzados:
+                continue
+            km, minutos = alcanzados[nodo_destino]
+            acceso_km = acceso_origen + acceso_destino
+            distancias.append(DistanciaRuta(
+                origen=origen, destino=destino,
+                distancia_km=km + acceso_km,
+                duracion_min=minutos + acceso_km / VELOCIDAD_POR_DEFECTO * 60,
+            ))
+    return distancias
+
+
+class MatrizOD:
+    """Zonas y distancias entre ellas, en memoria"""
+
+    def __init__(self, zonas, distancias, version=0):
+        self.version = version
+        self.radios = {}
+        self.espacial = IndiceEspacial(tamano_celda=0.02)
+        for zona_id, lat, lon, radio_km in zonas:
+            self.radios[zona_id] = radio_km
+            self.espacial.agregar(zona_id, lat, lon)
+        self.radio_maximo = max(self.radios.values(), default=0)
+        self.distancias = {
+            (origen_id, destino_id): (km, minutos)
+            for origen_id, destino_id, km, minutos in distancias
+        }
+        self.cargada_en = self.revisada_en = timezone.now()
+
+    @classmethod
+    def desde_bd(cls):
+        version = cache.get(CLAVE_VERSION, 0)
+        return cls(
+            ZonaRuta.objects.values_list('id', 'lat', 'lon', 'radio_km'),
+            DistanciaRuta.objects.values_list('origen_id', 'destino_id', 'distancia_km', 'duracion_min'),
+            version,
+        )
+
+    def zona_de(self, lat, lon):
+        cercana = self.espacial.cercanos(lat, lon, 1, hasta_km=self.radio_maximo)
+        if cercana and cercana[0][1] <= self.radios[cercana[0][0]]:
+            return cercana[0][0]
+        return None
+
+    def ruta(self, origen_lat, origen_lon, destino_lat, destino_lon):
+        """(km, minutos) entre las zonas de ambos puntos, o None si no están en la matriz"""
+        if not self.distancias:
+            return None
+        origen = self.zona_de(origen_lat, origen_lon)
+        destino = self.zona_de(destino_lat, destino_lon)
+        if origen is None or destino is None:
+            return None
+        return self.distancias.get((origen, destino))
+
+
+_matriz = None
+_candado = threading.Lock()
+
+
+def obtener_matriz():
+    """
+    Matriz origen/destino del proceso, cargándola o recargándola si hace
+    falta: al cumplir EDAD_MAXIMA o si otro proceso publicó una versión nueva.
+    """
+    global _matriz
+    with _candado:
+        ahora = timezone.now()
+        if _matriz is not None and ahora - _matriz.revisada_en > INTERVALO_VERSION:
+            _matriz.revisada_en = ahora
+            if cache.get(CLAVE_VERSION, 0) != _matriz.version:
+                _matriz = None
+        if _matriz is None or ahora - _matriz.cargada_en > EDAD_MAXIMA:
+            _matriz = MatrizOD.desde_bd()
+            limpiar_cache()
+        return _matriz
+
+
+def invalidar_matriz():
+    """
+    Fuerza releer la matriz en este proceso y publica una versión nueva para
+    que los demás la relean (y dejen de usar sus distancias en caché).
+    """
+    global _matriz
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 1, None)
+    with _candado:
+        _matriz = None
+    limpiar_cache()
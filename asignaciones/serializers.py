@@ -1,6 +1,6 @@
 # asignaciones/serializers.py
 from rest_framework import serializers
-from .models import Vehiculo, Conductor, Asignacion, RegistroTurno
+from .models import Vehiculo, Conductor, Asignacion, RegistroTurno, TrabajoAsignacion, Mantenimiento, SesionTurno
 from django.utils import timezone
 
 class VehiculoSerializer(serializers.ModelSerializer):
@@ -24,6 +24,14 @@ class VehiculoSerializer(serializers.ModelSerializer):
             'tipo_vehiculo',
             'tipo_vehiculo_display', 
             'kilometraje',
+            'km_ultimo_mantenimiento',
+            'proximo_mantenimiento_km',
+            'km_para_mantenimiento',
+            'base_lat',
+            'base_lon',
+            'ultima_lat',
+            'ultima_lon',
+            'fecha_ultima_posicion',
         ]
         extra_kwargs = { # NUEVO
             'foto': {'write_only': True, 'required': False}
@@ -118,6 +126,7 @@ class AsignacionSerializer(serializers.ModelSerializer):
             'responsable_nombre',
             'responsable_telefono',
             'distancia_recorrida_km',
+            'distancia_estimada_km',
         ]
 
     def validate(self, data):
@@ -156,4 +165,59 @@ class RegistroTurnoSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = RegistroTurno
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class SesionTurnoSerializer(serializers.ModelSerializer):
+    """
+    Serializer de solo lectura para los turnos armados desde las marcas.
+    """
+    class Meta:
+        model = SesionTurno
+        fields = ['id', 'conductor', 'fecha', 'inicio', 'fin', 'horas', 'entrada', 'salida']
+        read_only_fields = fields
+
+class MantenimientoSerializer(serializers.ModelSerializer):
+    """
+    Serializer para los servicios realizados a un vehículo.
+    """
+    tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
+    vehiculo_patente = serializers.CharField(source='vehiculo.patente', read_only=True)
+
+    class Meta:
+        model = Mantenimiento
+        fields = [
+            'id',
+            'vehiculo',
+            'vehiculo_patente',
+            'fecha',
+            'kilometraje',
+            'tipo',
+            'tipo_display',
+            'descripcion',
+            'costo',
+        ]
+
+class TrabajoAsignacionSerializer(serializers.ModelSerializer):
+    """
+    Serializer para el estado y resultado de un trabajo de asignación automática.
+    """
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+
+    class Meta:
+        model = TrabajoAsignacion
+        fields = [
+            'id',
+            'estado',
+            'estado_display',
+            'etapa',
+            'perfil',
+            'total',
+            'procesadas',
+            'resultados',
+            'error',
+            'fecha_creacion',
+            'fecha_inicio',
+            'fecha_actualizacion',
+            'fecha_fin',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,136 @@
+# asignaciones/series.py
+"""
+Series de viajes por hora, día, semana o mes para los gráficos del
+dashboard: cantidad de viajes, completados y km recorridos por intervalo,
+agrupados en la base (Trunc + GROUP BY). Días, semanas y meses salen del
+resumen diario; las horas, de las asignaciones.
+
+Los intervalos se alinean a su granularidad (semanas de lunes a domingo,
+meses completos), así el valor de cada uno no depende del rango pedido y se
+guarda en caché por separado (cache_dashboard.obtener_intervalos).
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+
+from .cache_dashboard import obtener_intervalos
+from .fechas import inicio_dia
+from .models import Asignacion, ResumenDiario
+
+GRANULARIDADES = ('hour', 'day', 'week', 'month')
+
+# Tope de intervalos por respuesta (un mes por hora son 744)
+MAX_INTERVALOS = 2000
+
+
+def _siguiente(granularidad, inicio):
+    if granularidad == 'hour':
+        return inicio + timedelta(hours=1)
+    if granularidad == 'day':
+        return inicio + timedelta(days=1)
+    if granularidad == 'week':
+        return inicio + timedelta(days=7)
+    return (inicio + timedelta(days=32)).replace(day=1)
+
+
+def intervalos(granularidad, desde, hasta):
+    """Inicios de los intervalos que cubren los días desde..hasta (inclusive)"""
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f"Granularidad desconocida: {granularidad}. Opciones: {', '.join(GRANULARIDADES)}.")
+    if granularidad == 'hour':
+        # Horas completas en UTC: no se repiten ni se saltan con el cambio de
+        # horario, y coinciden con las horas locales sólo si la zona horaria
+        # se desfasa de UTC en horas enteras (America/Santiago: -3/-4)
+        inicio = inicio_dia(desde).astimezone(dt_timezone.utc)
+        fin = inicio_dia(hasta + timedelta(days=1))
+        if any(borde.utcoffset() % timedelta(hours=1) for borde in (inicio_dia(desde), fin)):
+            raise ValueError(
+                f'La zona horaria {timezone.get_current_timezone_name()} no se desfasa de UTC '
+                'en horas enteras; use una granularidad por día o mayor.'
+            )
+        cantidad = int((fin - inicio).total_seconds() // 3600)
+    elif granularidad == 'day':
+        inicio, fin = desde, hasta + timedelta(days=1)
+        cantidad = (fin - inicio).days
+    elif granularidad == 'week':
+        inicio = desde - timedelta(days=desde.weekday())
+        fin = hasta + timedelta(days=1)
+        cantidad = -(-(fin - inicio).days // 7)
+    else:
+        inicio, fin = desde.replace(day=1), hasta + timedelta(days=1)
+        cantidad = (hasta.year - inicio.year) * 12 + hasta.month - inicio.month + 1
+    if cantidad > MAX_INTERVALOS:
+        raise ValueError(
+            f'El período abarca {cantidad} intervalos de tipo {granularidad}; '
+            f'el máximo es {MAX_INTERVALOS}. Use una granularidad mayor.'
+        )
+    inicios = []
+    while inicio < fin:
+        inicios.append(inicio)
+        inicio = _siguiente(granularidad, inicio)
+    return inicios
+
+
+def _cerrado(granularidad, inicio):
+    """Si el intervalo terminó antes de hoy (ya no recibe viajes nuevos)"""
+    fin = _siguiente(granularidad, inicio)
+    if granularidad == 'hour':
+        return fin <= inicio_dia(timezone.localdate())
+    return fin <= timezone.localdate()
+
+
+def calcular_intervalos(granularidad, inicios):
+    """{inicio: {'viajes', 'completadas', 'distancia_km'}} con una consulta agrupada"""
+    desde, hasta = min(inicios), _siguiente(granularidad, max(inicios))
+    if granularidad == 'hour':
+        filas = Asignacion.objects.filter(
+            fecha_hora_requerida_inicio__gte=desde, fecha_hora_requerida_inicio__lt=hasta
+        ).annotate(
+            intervalo=Trunc('fecha_hora_requerida_inicio', 'hour', tzinfo=dt_timezone.utc)
+        ).values('intervalo').annotate(
+            total=Count('id'),
+            completadas=Count('id', filter=Q(estado='completada')),
+            km=Coalesce(Sum('distancia_recorrida_km'), 0.0),
+        )
+    else:
+        filas = ResumenDiario.objects.filter(fecha__gte=desde, fecha__lt=hasta).annotate(
+            intervalo=Trunc('fecha', granularidad)
+        ).values('intervalo').annotate(
+            total=Sum('viajes'),
+            completadas=Coalesce(Sum('viajes', filter=Q(estado='completada')), 0),
+            km=Coalesce(Sum('distancia_km'), 0.0),
+        )
+    agrupados = {fila['intervalo']: fila for fila in filas.order_by()}
+    datos = {}
+    for inicio in inicios:
+        fila = agrupados.get(inicio)
+        datos[inicio] = {
+            'viajes': fila['total'] if fila else 0,
+            'completadas': fila['completadas'] if fila else 0,
+            'distancia_km': round(fila['km'], 2) if fila else 0.0,
+        }
+    return datos
+
+
+def serie_viajes(granularidad, desde, hasta):
+    """
+    Serie de los días desde..hasta: ([{'inicio', 'fin', 'viajes',
+    'completadas', 'distancia_km'}], intervalos leídos del caché).
+    ValueError si la granularidad no existe o hay demasiados intervalos.
+    """
+    inicios = intervalos(granularidad, desde, hasta)
+    datos, en_cache = obtener_intervalos(
+        granularidad,
+        [(inicio, _cerrado(granularidad, inicio)) for inicio in inicios],
+        lambda faltantes: calcular_intervalos(granularidad, faltantes),
+    )
+    serie = []
+    for inicio in inicios:
+        valores = datos[inicio]
+        fin = _siguiente(granularidad, inicio)
+        if granularidad == 'hour':
+            inicio, fin = timezone.localtime(inicio), timezone.localtime(fin)
+        serie.append({'inicio': inicio.isoformat(), 'fin': fin.isoformat(), **valores})
+    return serie, en_cache
@@ -1,35 +1,42 @@
-from .models import Vehiculo, Asignacion
-from math import radians, sin, cos, sqrt, atan2
-
-# Pesos configurables
-PESO_CARGO = 0.4
-PESO_CAPACIDAD = 0.3
-PESO_DISTANCIA = 0.3
-
-CARGO_SCORE = {
-    3: 1.0,  # Jefatura/Subdirección
-    2: 0.8,  # Coordinación/Referente
-    1: 0.5,  # Funcionario
-    0: 0.2,  # Otro/No especificado
-}
-
-def calcular_distancia_km(origen_lat, origen_lon, destino_lat, destino_lon):
-    if None in (origen_lat, origen_lon, destino_lat, destino_lon):
-        return 0
-    R = 6371
-    dlat = radians(destino_lat - origen_lat)
-    dlon = radians(destino_lon - origen_lon)
-    a = sin(dlat/2)**2 + cos(radians(origen_lat)) * cos(radians(destino_lat)) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    return R * c
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from .models import Vehiculo, Asignacion, Conductor
+from .optimizacion import resolver_asignacion_max_score
+from .disponibilidad import IndiceDisponibilidad, franja_asignacion, traslapa_en_bd
+from .elegibilidad import ElegibilidadConductores, asignar_conductores
+from .distancias import calcular_distancia_km, distancia_viaje_km
+from .espacial import IndiceEspacial, posicion_vehiculo
+from .cache_dashboard import invalidar_dashboard
+from .flota import ESTADOS_VEHICULO_ASIGNABLES, obtener_snapshot, snapshot_actual, invalidar_snapshot
+from .resumenes import cambios_en_bloque, descartar_valores_cargados
+from .perfiles import (
+    PESO_CARGO, PESO_CAPACIDAD, PESO_DISTANCIA, CARGO_SCORE,
+    obtener_perfil, cargar_perfiles, componentes_vehiculo, componentes_flota
+)
+import numpy as np
+
+# Veces que el lote vuelve a resolver las solicitudes cuyo vehículo fue
+# reservado por otra ejecución concurrente antes de darlas por fallidas
+MAX_REINTENTOS_RESERVA = 5
+
+
+class ConflictoReserva(Exception):
+    """Otra transacción modificó las filas que se intentaban reservar"""
+
+def calcular_score(asignacion, vehiculo, perfil=None):
+    perfil = perfil or obtener_perfil()
 
-def calcular_score(asignacion, vehiculo):
     # Score por cargo
-    cargo_score = CARGO_SCORE.get(asignacion.solicitante_jerarquia, 0.2)
+    cargo_score = perfil.cargo_score.get(asignacion.solicitante_jerarquia, 0.2)
+
+    # Componentes propios del vehículo, precalculados por versión de la fila
+    capacidad, novedad_score = componentes_vehiculo(vehiculo)
 
     # Score por capacidad
     req_pasajeros = asignacion.req_pasajeros or 1
-    capacidad = vehiculo.capacidad_pasajeros or 1
     if capacidad < req_pasajeros:
         capacidad_score = 0
     elif capacidad == req_pasajeros:
@@ -37,25 +44,18 @@ def calcular_score(asignacion, vehiculo):
     else:
         capacidad_score = max(0.5, 1 - (capacidad - req_pasajeros) * 0.1)
 
-    # Score por distancia (más largo = más score, normalizado a 100km)
-    distancia_km = calcular_distancia_km(
-        asignacion.origen_lat, asignacion.origen_lon,
-        asignacion.destino_lat, asignacion.destino_lon
-    )
+    # Score por distancia (más largo = más score, normalizado a 100km),
+    # con la distancia almacenada al guardar la solicitud
+    distancia_km = distancia_viaje_km(asignacion)
     distancia_score = min(1, distancia_km / 100)  # 100km o más = score 1
 
-    if hasattr(vehiculo, 'anio') and vehiculo.anio:
-        novedad_score = min(1, max(0, (vehiculo.anio - 2010) / 15))  # Normaliza entre 2010 y 2025
-    else:
-        novedad_score = 0.5  # Valor por defecto
-
     # Peso de novedad depende de la distancia (más lejos, más peso)
     peso_novedad = min(0.3, 0.1 + 0.2 * distancia_score)  # Hasta 0.3 si distancia >= 100km
 
     # Ajusta los pesos de los otros factores para que sumen 1
-    peso_cargo = PESO_CARGO - peso_novedad * 0.5
-    peso_capacidad = PESO_CAPACIDAD - peso_novedad * 0.3
-    peso_distancia = PESO_DISTANCIA - peso_novedad * 0.2
+    peso_cargo = perfil.peso_cargo - peso_novedad * 0.5
+    peso_capacidad = perfil.peso_capacidad - peso_novedad * 0.3
+    peso_distancia = perfil.peso_distancia - peso_novedad * 0.2
 
     # Score total
     score = (
@@ -66,41 +66,535 @@ def calcular_score(asignacion, vehiculo):
     )
     return score
 
+def candidatos_cercanos(asignacion, vehiculos, espacial, k=None):
+    """
+    Reduce `vehiculos` a los k más cercanos al origen de la solicitud según el
+    índice espacial, conservando el orden. Los vehículos sin posición conocida
+    se mantienen siempre como candidatos, igual que todos si la solicitud no
+    tiene origen o k es 0.
+    """
+    k = settings.ASIGNACION_CANDIDATOS_CERCANOS if k is None else k
+    if not k or asignacion.origen_lat is None or asignacion.origen_lon is None:
+        return list(vehiculos)
+    disponibles = {v.pk for v in vehiculos}
+    cercanos = {
+        pk for pk, _ in espacial.cercanos(
+            asignacion.origen_lat, asignacion.origen_lon, k, filtro=disponibles.__contains__
+        )
+    }
+    return [v for v in vehiculos if v.pk in cercanos or v.pk not in espacial]
+
+def registrar_posicion_vehiculo(vehiculo_id, lat, lon, momento):
+    """
+    Actualiza la última posición conocida de un vehículo si `momento` es más
+    reciente que la registrada. No incrementa la versión: la posición no
+    invalida reservas en curso.
+    """
+    actualizado = Vehiculo.objects.filter(
+        Q(fecha_ultima_posicion__isnull=True) | Q(fecha_ultima_posicion__lt=momento),
+        pk=vehiculo_id
+    ).update(ultima_lat=lat, ultima_lon=lon, fecha_ultima_posicion=momento)
+    snapshot = snapshot_actual()
+    if actualizado and snapshot is not None:
+        snapshot.actualizar_vehiculo(vehiculo_id)
+    return bool(actualizado)
+
+def _vehiculo_traslapa(vehiculo, asignacion, inicio, fin):
+    """
+    Con el vehículo ya reservado (su fila bloqueada por el UPDATE), revisa en
+    la base que no tenga otra reserva en la franja que el índice no conocía
+    """
+    return traslapa_en_bd('vehiculo_id', vehiculo.pk, inicio, fin, excluir=asignacion.pk)
+
+def _asignar_conductor_confirmado(asignacion, inicio, fin, elegibilidad, indice, candado=nullcontext()):
+    """
+    Elige conductor con asignar_conductores y lo confirma contra la base
+    dentro de la transacción en curso: bloquea su fila y, si tiene otra
+    reserva que traslapa (hecha por un proceso que el índice no vio), relee
+    sus franjas y elige otro. Sin conductor libre la asignación queda sólo
+    con vehículo. `candado` protege el índice si es compartido.
+    """
+    for _ in range(MAX_REINTENTOS_RESERVA):
+        with candado:
+            asignar_conductores([asignacion], [(inicio, fin)], elegibilidad, indice)
+        conductor_id = asignacion.conductor_id
+        if conductor_id is None:
+            return
+        list(Conductor.objects.select_for_update().filter(pk=conductor_id).values_list('pk'))
+        if not traslapa_en_bd('conductor_id', conductor_id, inicio, fin, excluir=asignacion.pk):
+            return
+        asignacion.conductor = None
+        with candado:
+            indice.quitar(asignacion.pk)
+            indice.recargar_recurso(conductor_id)
+    asignacion.conductor = None
+
 def asignar_vehiculo_automatico(asignacion):
-    vehiculos = Vehiculo.objects.filter(
-        estado='disponible',
+    vehiculos = list(Vehiculo.objects.filter(
+        estado__in=ESTADOS_VEHICULO_ASIGNABLES,
         capacidad_pasajeros__gte=asignacion.req_pasajeros or 1
+    ))
+    inicio, fin = franja_asignacion(asignacion)
+    indice = IndiceDisponibilidad.desde_bd(desde=inicio)
+    perfil = cargar_perfiles().para(asignacion)
+    libres = [v for v in vehiculos if indice.esta_libre(v.pk, inicio, fin)]
+    candidatos = sorted(
+        candidatos_cercanos(asignacion, libres, IndiceEspacial.desde_vehiculos(libres)),
+        key=lambda v: calcular_score(asignacion, v, perfil),
+        reverse=True
+    )
+    # Si otra ejecución reserva primero al mejor candidato, se intenta el siguiente
+    for v in candidatos:
+        with transaction.atomic():
+            if not _reservar_vehiculos([v]):
+                continue
+            if _vehiculo_traslapa(v, asignacion, inicio, fin):
+                transaction.set_rollback(True)
+                continue
+            asignacion.vehiculo = v
+            asignacion.estado = 'programada'
+            if asignacion.conductor_id is None:
+                _asignar_conductor_confirmado(
+                    asignacion, inicio, fin,
+                    ElegibilidadConductores.desde_bd(),
+                    IndiceDisponibilidad.desde_bd(campo='conductor_id', desde=inicio)
+                )
+            asignacion.save(update_fields=['vehiculo', 'conductor', 'estado'])
+        return v
+    return None
+
+def asignar_asignacion_incremental(asignacion):
+    """
+    Asigna en el momento una solicitud recién creada usando la foto en memoria
+    de la flota (flota.py), sin releer la tabla de pendientes ni la flota.
+
+    Los candidatos se ordenan por score y se reservan con compare-and-swap;
+    ya dentro de la transacción se comprueba en la base que ni el vehículo ni
+    el conductor tengan otra reserva en la franja (la foto es del proceso y
+    no ve las de otros). Si la foto estaba desactualizada y se pierden todas
+    las reservas, se recarga una vez y se reintenta. Si no hay vehículo posible la solicitud
+    queda 'pendiente_auto' para el próximo lote, que es quien decide el
+    'fallo_auto'. Devuelve el vehículo asignado o None.
+    """
+    inicio, fin = franja_asignacion(asignacion)
+    for intento in range(2):
+        snapshot = obtener_snapshot(recargar=intento > 0)
+        with snapshot.candado:
+            vehiculos = [
+                v for v in snapshot.vehiculos.values()
+                if es_compatible(asignacion, v)
+                and snapshot.indice_vehiculos.esta_libre(v.pk, inicio, fin)
+            ]
+            vehiculos = candidatos_cercanos(asignacion, vehiculos, snapshot.espacial)
+        if not vehiculos:
+            return None
+        scores = construir_matriz_scores([asignacion], vehiculos, snapshot.perfiles)[0]
+        candidatos = [vehiculos[j] for j in np.argsort(-scores, kind='stable')]
+
+        for v in candidatos:
+            with transaction.atomic():
+                if not _reservar_vehiculos([v]):
+                    confirmada = None
+                elif _vehiculo_traslapa(v, asignacion, inicio, fin):
+                    transaction.set_rollback(True)
+                    confirmada = None
+                else:
+                    asignacion.vehiculo = v
+                    if asignacion.conductor_id is None:
+                        _asignar_conductor_confirmado(
+                            asignacion, inicio, fin, snapshot.elegibilidad,
+                            snapshot.indice_conductores, snapshot.candado
+                        )
+                    confirmada = _confirmar_asignaciones([asignacion])
+                    if not confirmada:
+                        transaction.set_rollback(True)
+            if confirmada is None:
+                # Otra escritura se adelantó sobre este vehículo, o ya estaba
+                # reservado en la franja: se refresca y se prueba el siguiente
+                snapshot.actualizar_vehiculo(v.pk)
+                continue
+            if not confirmada:
+                # Otra ejecución ya atendió la solicitud: la reserva se deshizo
+                snapshot.actualizar_vehiculo(v.pk)
+                snapshot.quitar_asignacion(asignacion.pk)
+                asignacion.refresh_from_db()
+                return asignacion.vehiculo
+            asignacion.estado = 'programada'
+            with snapshot.candado:
+                snapshot.indice_vehiculos.agregar(v.pk, inicio, fin, asignacion.pk)
+            invalidar_dashboard()
+            return v
+    return None
+
+def _a_float(valores):
+    """Convierte una secuencia con None a un arreglo float con NaN"""
+    return np.array([np.nan if v is None else v for v in valores], dtype=float)
+
+def calcular_distancia_km_vectorizada(origen_lat, origen_lon, destino_lat, destino_lon):
+    """
+    Versión vectorizada de calcular_distancia_km sobre arreglos NumPy.
+    Los valores NaN (coordenadas faltantes) producen distancia 0, igual que
+    la versión escalar con None.
+    """
+    origen_lat = np.asarray(origen_lat, dtype=float)
+    origen_lon = np.asarray(origen_lon, dtype=float)
+    destino_lat = np.asarray(destino_lat, dtype=float)
+    destino_lon = np.asarray(destino_lon, dtype=float)
+    R = 6371
+    dlat = np.radians(destino_lat - origen_lat)
+    dlon = np.radians(destino_lon - origen_lon)
+    a = np.sin(dlat/2)**2 + np.cos(np.radians(origen_lat)) * np.cos(np.radians(destino_lat)) * np.sin(dlon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    distancia = R * c
+    return np.where(np.isnan(distancia), 0.0, distancia)
+
+def calcular_scores_matriz(origen_lat, origen_lon, destino_lat, destino_lon,
+                           req_pasajeros, solicitante_jerarquia,
+                           capacidad_pasajeros, anio, perfil=None):
+    """
+    Calcula la matriz N x M de scores (N solicitudes, M vehículos) con
+    broadcasting de NumPy a partir de coordenadas crudas (la distancia se
+    calcula aquí, sin pasar por la columna almacenada):
+    - Los atributos de solicitudes son arreglos de largo N (None/NaN = faltante).
+    - Los atributos de vehículos son arreglos de largo M.
+    """
+    capacidad = np.array([c or 1 for c in capacidad_pasajeros], dtype=float)
+    novedad_score = np.array(
+        [min(1, max(0, (a - 2010) / 15)) if a else 0.5 for a in anio], dtype=float
+    )
+    distancia_km = calcular_distancia_km_vectorizada(
+        _a_float(origen_lat), _a_float(origen_lon),
+        _a_float(destino_lat), _a_float(destino_lon)
+    )
+    return _matriz_scores(
+        distancia_km, req_pasajeros, solicitante_jerarquia,
+        capacidad, novedad_score, perfil or obtener_perfil()
+    )
+
+def _matriz_scores(distancia_km, req_pasajeros, solicitante_jerarquia,
+                   capacidad, novedad_score, perfil):
+    """
+    Parte dependiente de la solicitud del score; `distancia_km` es la
+    distancia de cada solicitud y `capacidad` y `novedad_score` son los
+    componentes ya calculados por vehículo (arreglos de largo M).
+    """
+    # Componentes por solicitud (columna N x 1)
+    jerarquia = np.asarray(solicitante_jerarquia, dtype=object)
+    cargo_score = np.array(
+        [perfil.cargo_score.get(j, 0.2) for j in jerarquia], dtype=float
+    )[:, None]
+    req = np.array([r or 1 for r in req_pasajeros], dtype=float)[:, None]
+    distancia_km = np.asarray(distancia_km, dtype=float)[:, None]
+    distancia_score = np.minimum(1, distancia_km / 100)
+    peso_novedad = np.minimum(0.3, 0.1 + 0.2 * distancia_score)
+
+    # Componentes por vehículo (fila 1 x M)
+    capacidad = capacidad[None, :]
+    novedad_score = novedad_score[None, :]
+
+    # Score por capacidad (N x M)
+    capacidad_score = np.where(
+        capacidad < req, 0.0,
+        np.where(capacidad == req, 1.0, np.maximum(0.5, 1 - (capacidad - req) * 0.1))
+    )
+
+    peso_cargo = perfil.peso_cargo - peso_novedad * 0.5
+    peso_capacidad = perfil.peso_capacidad - peso_novedad * 0.3
+    peso_distancia = perfil.peso_distancia - peso_novedad * 0.2
+
+    return (
+        cargo_score * peso_cargo +
+        capacidad_score * peso_capacidad +
+        distancia_score * peso_distancia +
+        novedad_score * peso_novedad
+    )
+
+def es_compatible(asignacion, vehiculo):
+    """Indica si el vehículo puede atender la solicitud (capacidad suficiente)"""
+    return (vehiculo.capacidad_pasajeros or 1) >= (asignacion.req_pasajeros or 1)
+
+def construir_matriz_scores(asignaciones, vehiculos, perfiles=None):
+    """
+    Matriz de scores solicitudes x vehículos, calculada en bloque con NumPy.
+
+    `perfiles` es una SeleccionPerfiles (por defecto, el perfil estándar);
+    las filas se agrupan por el perfil que corresponde a cada solicitud. Los
+    componentes por vehículo se calculan una sola vez para toda la matriz y
+    la distancia de cada solicitud es la almacenada al guardarla.
+    Las combinaciones incompatibles (capacidad insuficiente) quedan en NaN
+    para que el optimizador no las considere.
+    """
+    capacidad, novedad_score = componentes_flota(vehiculos)
+    scores = np.empty((len(asignaciones), len(vehiculos)))
+    grupos = {}
+    for i, a in enumerate(asignaciones):
+        perfil = perfiles.para(a) if perfiles is not None else obtener_perfil()
+        grupos.setdefault(perfil.nombre, (perfil, []))[1].append(i)
+    for perfil, filas in grupos.values():
+        grupo = [asignaciones[i] for i in filas]
+        scores[filas] = _matriz_scores(
+            [distancia_viaje_km(a) for a in grupo],
+            [a.req_pasajeros for a in grupo],
+            [a.solicitante_jerarquia for a in grupo],
+            capacidad, novedad_score, perfil
+        )
+    req = np.array([a.req_pasajeros or 1 for a in asignaciones])[:, None]
+    return np.where(capacidad[None, :] >= req, scores, np.nan)
+
+def asignar_vehiculos_automatico_lote(progreso=None, perfil=None):
+    """
+    Asigna en una sola pasada todas las solicitudes 'pendiente_auto'.
+
+    Carga una vez las solicitudes, los vehículos asignables y el índice de
+    franjas ya reservadas; construye la matriz completa de scores y la
+    resuelve como un problema de asignación óptima (método húngaro).
+
+    Cada ronda asigna a lo más una solicitud por vehículo; las solicitudes
+    que quedan sin vehículo pasan a la ronda siguiente, donde un vehículo ya
+    usado puede tomar otro viaje si las franjas no se traslapan.
+
+    `perfil` es el nombre del perfil de scoring de la ejecución (ver
+    perfiles.py); las solicitudes cuyo tipo de vehículo preferente tenga un
+    perfil propio usan ése. `progreso`, si se indica, se llama como
+    progreso(etapa, procesadas, total) al pasar de una etapa a otra (lo usa
+    la cola de trabajos).
+    """
+    perfiles = cargar_perfiles(perfil)
+    progreso = progreso or (lambda etapa, procesadas, total: None)
+    asignaciones = list(
+        Asignacion.objects.filter(estado='pendiente_auto', vehiculo__isnull=True)
+        .order_by('fecha_hora_requerida_inicio', 'id')
+    )
+    if not asignaciones:
+        return []
+    vehiculos = list(Vehiculo.objects.filter(estado__in=ESTADOS_VEHICULO_ASIGNABLES))
+    franjas = [franja_asignacion(a) for a in asignaciones]
+    desde = min(inicio for inicio, _ in franjas)
+    indice = IndiceDisponibilidad.desde_bd(desde=desde)
+    progreso('resolviendo', 0, len(asignaciones))
+
+    matriz = construir_matriz_scores(asignaciones, vehiculos, perfiles)
+    elegidos = _resolver_lote(
+        matriz, franjas, asignaciones, vehiculos, indice, range(len(asignaciones)),
+        distancias=_distancias_al_origen(asignaciones, vehiculos),
+    )
+    progreso('guardando', len(asignaciones), len(asignaciones))
+    conductores = (
+        ElegibilidadConductores.desde_bd(),
+        IndiceDisponibilidad.desde_bd(campo='conductor_id', desde=desde),
+    )
+    resultados = _guardar_decisiones(
+        asignaciones, vehiculos, elegidos, matriz, franjas, indice, conductores
     )
-    mejor_score = -1
-    mejor_vehiculo = None
+    # Las escrituras en bloque no disparan señales: la foto de la flota se recarga
+    invalidar_snapshot()
+    invalidar_dashboard()
+    return resultados
+
+def _distancias_al_origen(asignaciones, vehiculos):
+    """
+    Matriz (solicitud × vehículo) de km desde la posición del vehículo al
+    origen de la solicitud; NaN si falta alguno de los dos puntos.
+    """
+    origen = np.array([
+        [np.nan if a.origen_lat is None else a.origen_lat, np.nan if a.origen_lon is None else a.origen_lon]
+        for a in asignaciones
+    ], dtype=float).reshape(-1, 2)
+    posicion = np.array(
+        [posicion_vehiculo(v) or (np.nan, np.nan) for v in vehiculos], dtype=float
+    ).reshape(-1, 2)
+    km = calcular_distancia_km_vectorizada(
+        origen[:, 0, None], origen[:, 1, None], posicion[None, :, 0], posicion[None, :, 1]
+    )
+    sin_punto = np.isnan(origen).any(axis=1)[:, None] | np.isnan(posicion).any(axis=1)[None, :]
+    return np.where(sin_punto, np.nan, km)
+
+def _filtrar_cercanos(factible, distancias, k=None):
+    """
+    Versión vectorizada de candidatos_cercanos: deja en cada fila de
+    `factible` sólo sus k vehículos factibles más cercanos. Las celdas sin
+    distancia (solicitud sin origen o vehículo sin posición) no se recortan.
+    """
+    k = settings.ASIGNACION_CANDIDATOS_CERCANOS if k is None else k
+    if not k or factible.shape[1] <= k:
+        return factible
+    sin_distancia = np.isnan(distancias)
+    lejania = np.where(factible & ~sin_distancia, distancias, np.inf)
+    umbral = np.partition(lejania, k - 1, axis=1)[:, k - 1:k]
+    return factible & ((lejania <= umbral) | sin_distancia)
+
+def _resolver_lote(matriz, franjas, asignaciones, vehiculos, indice, pendientes, excluidos=(), distancias=None):
+    """
+    Resuelve por rondas las filas `pendientes` de la matriz de scores.
+    Devuelve {fila: columna} y registra en el índice las franjas elegidas.
+    Los vehículos cuyo pk está en `excluidos` no se consideran. Con la matriz
+    `distancias` (ver _distancias_al_origen), cada solicitud sólo compite por
+    sus vehículos factibles más cercanos.
+
+    La disponibilidad se calcula una vez como matriz booleana y cada viaje
+    elegido bloquea su vehículo en las franjas que traslapa, sin volver a
+    consultar el índice celda por celda.
+    """
+    elegidos = {}
+    pendientes = list(pendientes)
+    if not pendientes or not vehiculos:
+        return elegidos
+    inicios = np.array([inicio.timestamp() for inicio, _ in franjas])
+    fines = np.array([fin.timestamp() for _, fin in franjas])
+    libre = ~indice.ocupados([v.pk for v in vehiculos], inicios, fines)
+    libre[:, [j for j, v in enumerate(vehiculos) if v.pk in excluidos]] = False
+    while pendientes:
+        sub_matriz = matriz[pendientes]
+        factible = libre[pendientes] & ~np.isnan(sub_matriz)
+        if distancias is not None:
+            factible = _filtrar_cercanos(factible, distancias[pendientes])
+        pares = resolver_asignacion_max_score(np.where(factible, sub_matriz, np.nan))
+        if not pares:
+            break
+        for fila, j in pares:
+            i = pendientes[fila]
+            elegidos[i] = j
+            inicio, fin = franjas[i]
+            indice.agregar(vehiculos[j].pk, inicio, fin, asignaciones[i].pk)
+            libre[:, j] &= (fines <= inicios[i]) | (inicios >= fines[i])
+        asignados = {pendientes[fila] for fila, _ in pares}
+        pendientes = [i for i in pendientes if i not in asignados]
+    return elegidos
+
+def _reservar_vehiculos(vehiculos):
+    """
+    Reserva vehículos con compare-and-swap sobre Vehiculo.version.
+
+    Un único UPDATE condicionado a (pk, version) de cada vehículo; si afecta
+    a todas las filas, todas quedaron reservadas por esta transacción. Si no,
+    otra escritura se adelantó: se deshace ese UPDATE y se reintenta fila por
+    fila para saber cuáles se ganaron. Devuelve el conjunto de pks reservados.
+    """
+    vehiculos = list(vehiculos)
+    if not vehiculos:
+        return set()
+    condicion = Q()
     for v in vehiculos:
-        score = calcular_score(asignacion, v)
-        if score > mejor_score:
-            mejor_score = score
-            mejor_vehiculo = v
-    if mejor_vehiculo:
-        asignacion.vehiculo = mejor_vehiculo
-        asignacion.estado = 'programada'
-        asignacion.save()
-        mejor_vehiculo.estado = 'reservado'
-        mejor_vehiculo.save()
-    return mejor_vehiculo
-
-def asignar_vehiculos_automatico_lote():
-    asignaciones = Asignacion.objects.filter(estado='pendiente_auto', vehiculo__isnull=True)
+        condicion |= Q(pk=v.pk, version=v.version)
+    try:
+        with transaction.atomic():
+            actualizados = Vehiculo.objects.filter(
+                condicion, estado__in=ESTADOS_VEHICULO_ASIGNABLES
+            ).update(estado='reservado', version=F('version') + 1)
+            if actualizados != len(vehiculos):
+                raise ConflictoReserva
+        ganados = vehiculos
+    except ConflictoReserva:
+        ganados = [
+            v for v in vehiculos
+            if Vehiculo.objects.filter(
+                pk=v.pk, version=v.version, estado__in=ESTADOS_VEHICULO_ASIGNABLES
+            ).update(estado='reservado', version=F('version') + 1)
+        ]
+    for v in ganados:
+        v.version += 1
+        v.estado = 'reservado'
+    return {v.pk for v in ganados}
+
+def _confirmar_asignaciones(asignaciones):
+    """
+    Marca como 'programada' las asignaciones colocadas, sólo si siguen
+    pendientes (otra ejecución pudo haberlas tomado). Devuelve las confirmadas.
+    """
+    if not asignaciones:
+        return []
+    descartar_valores_cargados(asignaciones)
+    with cambios_en_bloque([a.pk for a in asignaciones]):
+        try:
+            with transaction.atomic():
+                actualizadas = Asignacion.objects.filter(
+                    pk__in=[a.pk for a in asignaciones],
+                    estado='pendiente_auto', vehiculo__isnull=True
+                ).update(estado='programada')
+                if actualizadas != len(asignaciones):
+                    raise ConflictoReserva
+                Asignacion.objects.bulk_update(asignaciones, ['vehiculo', 'conductor'])
+            return asignaciones
+        except ConflictoReserva:
+            return [
+                a for a in asignaciones
+                if Asignacion.objects.filter(
+                    pk=a.pk, estado='pendiente_auto', vehiculo__isnull=True
+                ).update(estado='programada', vehiculo=a.vehiculo, conductor=a.conductor)
+            ]
+
+def _guardar_decisiones(asignaciones, vehiculos, elegidos, matriz, franjas, indice, conductores):
+    """
+    Persiste en una sola transacción las decisiones del lote.
+
+    Con los vehículos ya reservados, elige el conductor de cada viaje a
+    partir de `conductores` (elegibilidad precomputada e índice de franjas de
+    los conductores); los viajes sin conductor apto quedan programados sólo
+    con vehículo, como antes.
+
+    Los vehículos se reservan con compare-and-swap sobre su versión, de modo
+    que una ejecución concurrente o una edición del vehículo (p. ej. pasarlo
+    a mantenimiento desde el admin) nunca termine en una doble reserva. Las
+    solicitudes cuyo vehículo se perdió se vuelven a resolver contra los
+    vehículos restantes. Las escrituras son UPDATE en bloque, condicionados
+    al estado esperado, en vez de un save() por fila.
+    """
+    with transaction.atomic():
+        reservados = set()
+        perdidos = set()
+        for _ in range(MAX_REINTENTOS_RESERVA):
+            por_reservar = {
+                vehiculos[j].pk: vehiculos[j]
+                for j in elegidos.values() if vehiculos[j].pk not in reservados
+            }
+            reservados |= _reservar_vehiculos(por_reservar.values())
+            nuevos_perdidos = set(por_reservar) - reservados
+            if not nuevos_perdidos:
+                break
+            perdidos |= nuevos_perdidos
+            afectadas = [i for i, j in elegidos.items() if vehiculos[j].pk in nuevos_perdidos]
+            for i in afectadas:
+                del elegidos[i]
+                indice.quitar(asignaciones[i].pk)
+            elegidos.update(_resolver_lote(
+                matriz, franjas, asignaciones, vehiculos, indice, afectadas, excluidos=perdidos
+            ))
+        else:
+            elegidos = {i: j for i, j in elegidos.items() if vehiculos[j].pk in reservados}
+
+        colocadas = []
+        for i, j in elegidos.items():
+            asignaciones[i].vehiculo = vehiculos[j]
+            colocadas.append(asignaciones[i])
+        elegibilidad, indice_conductores = conductores
+        asignar_conductores(
+            colocadas, [franjas[i] for i in elegidos], elegibilidad, indice_conductores
+        )
+        confirmadas = {a.pk for a in _confirmar_asignaciones(colocadas)}
+
+        fallidas = [a.pk for i, a in enumerate(asignaciones) if i not in elegidos]
+        with cambios_en_bloque(fallidas):
+            Asignacion.objects.filter(
+                pk__in=fallidas, estado='pendiente_auto'
+            ).update(estado='fallo_auto')
+
     resultados = []
-    for asignacion in asignaciones:
-        vehiculo = asignar_vehiculo_automatico(asignacion)
-        if vehiculo:
-            resultados.append({
-                'asignacion_id': asignacion.id,
-                'vehiculo_asignado': vehiculo.patente
-            })
+    for i, asignacion in enumerate(asignaciones):
+        if asignacion.pk in confirmadas:
+            asignacion.estado = 'programada'
+            vehiculo_asignado = asignacion.vehiculo.patente
+            conductor = asignacion.conductor
+            conductor_asignado = f"{conductor.nombre} {conductor.apellido}" if conductor else None
+        elif i in elegidos:
+            # Otra ejecución concurrente ya atendió esta solicitud
+            continue
         else:
             asignacion.estado = 'fallo_auto'
-            asignacion.save()
-            resultados.append({
-                'asignacion_id': asignacion.id,
-                'vehiculo_asignado': None
-            })
-    return resultados
\ No newline at end of file
+            vehiculo_asignado = None
+            conductor_asignado = None
+        resultados.append({
+            'asignacion_id': asignacion.id,
+            'vehiculo_asignado': vehiculo_asignado,
+            'conductor_asignado': conductor_asignado
+        })
+    return resultados
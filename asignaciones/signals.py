@@ -0,0 +1,210 @@
+# asignaciones/signals.py
+from django.db.models import Max
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache_dashboard import invalidar_dashboard, invalidar_historico
+from .flota import snapshot_actual
+from .resumenes import (
+    CAMPOS, NO_CARGADO, aporte_en_memoria, aporte_guardado, desvincular_recurso, registrar_cambio,
+    valores_cargados,
+)
+from .services import registrar_posicion_vehiculo
+from .turnos import reparar_sesiones
+from .models import Vehiculo, Conductor, Asignacion, PerfilAsignacion, Mantenimiento, RegistroTurno
+
+
+# Mantienen al día la foto de la flota usada por la asignación incremental.
+# Si la foto no está cargada en este proceso no hay nada que actualizar.
+
+@receiver(post_save, sender=Vehiculo)
+@receiver(post_delete, sender=Vehiculo)
+@receiver(post_save, sender=Conductor)
+@receiver(post_delete, sender=Conductor)
+@receiver(post_save, sender=Asignacion)
+@receiver(post_delete, sender=Asignacion)
+@receiver(post_save, sender=RegistroTurno)
+@receiver(post_delete, sender=RegistroTurno)
+def datos_dashboard_modificados(sender, instance, **kwargs):
+    invalidar_dashboard()
+
+
+@receiver(post_save, sender=Vehiculo)
+def vehiculo_guardado(sender, instance, **kwargs):
+    snapshot = snapshot_actual()
+    if snapshot is not None:
+        snapshot.actualizar_vehiculo(instance.pk)
+
+
+@receiver(post_delete, sender=Vehiculo)
+def vehiculo_eliminado(sender, instance, **kwargs):
+    snapshot = snapshot_actual()
+    if snapshot is not None:
+        snapshot.quitar_vehiculo(instance.pk)
+
+
+@receiver(post_save, sender=Conductor)
+def conductor_guardado(sender, instance, **kwargs):
+    snapshot = snapshot_actual()
+    if snapshot is not None:
+        snapshot.actualizar_conductor(instance)
+
+
+@receiver(post_delete, sender=Conductor)
+def conductor_eliminado(sender, instance, **kwargs):
+    snapshot = snapshot_actual()
+    if snapshot is not None:
+        snapshot.quitar_conductor(instance.pk)
+
+
+def _estado_anterior(asignacion):
+    """Estado en la base antes de este guardado (capturado en pre_save), o None si es nueva"""
+    anterior = getattr(asignacion, '_aporte_resumen', None)
+    return anterior[0][3] if anterior else None
+
+
+@receiver(post_save, sender=Asignacion)
+def asignacion_guardada(sender, instance, **kwargs):
+    snapshot = snapshot_actual()
+    if snapshot is not None:
+        snapshot.actualizar_asignacion(instance)
+    # Al completar un viaje el vehículo queda en el destino. Sólo en la
+    # transición: volver a guardar un viaje ya completado (p. ej. para
+    # corregir sus km) no debe mover el vehículo a una posición antigua
+    if (instance.estado == 'completada' and _estado_anterior(instance) != 'completada'
+            and instance.vehiculo_id
+            and instance.destino_lat is not None and instance.destino_lon is not None):
+        registrar_posicion_vehiculo(
+            instance.vehiculo_id, instance.destino_lat, instance.destino_lon, timezone.now()
+        )
+
+
+@receiver(post_delete, sender=Asignacion)
+def asignacion_eliminada(sender, instance, **kwargs):
+    snapshot = snapshot_actual()
+    if snapshot is not None:
+        snapshot.quitar_asignacion(instance.pk)
+
+
+@receiver(post_save, sender=PerfilAsignacion)
+@receiver(post_delete, sender=PerfilAsignacion)
+def perfil_modificado(sender, instance, **kwargs):
+    snapshot = snapshot_actual()
+    if snapshot is not None:
+        snapshot.recargar_perfiles()
+
+
+# Resumen diario: se compara el aporte de la asignación antes y después de
+# escribirla. Ambos salen de los valores en memoria (los cargados al leerla y
+# los que se guardaron); sólo se consulta la base si alguno no es concreto.
+
+def _aporte(valores, pk):
+    resultado = aporte_en_memoria(valores)
+    return aporte_guardado(pk) if resultado is NO_CARGADO else resultado
+
+
+@receiver(post_init, sender=Asignacion)
+def asignacion_iniciada(sender, instance, **kwargs):
+    instance._valores_resumen = valores_cargados(instance)
+
+
+@receiver(pre_save, sender=Asignacion)
+def asignacion_por_guardar(sender, instance, **kwargs):
+    instance._aporte_resumen = (
+        None if instance._state.adding else _aporte(getattr(instance, '_valores_resumen', None), instance.pk)
+    )
+
+
+@receiver(post_save, sender=Asignacion)
+def resumen_asignacion_guardada(sender, instance, update_fields=None, **kwargs):
+    guardados = valores_cargados(instance)
+    if update_fields is not None:
+        # Los campos no guardados siguen en la base como estaban
+        previos = getattr(instance, '_valores_resumen', None) or (NO_CARGADO,) * len(guardados)
+        guardados = tuple(
+            valor if campo in update_fields or Asignacion._meta.get_field(campo).name in update_fields else previo
+            for campo, valor, previo in zip(CAMPOS, guardados, previos)
+        )
+    registrar_cambio(getattr(instance, '_aporte_resumen', None), _aporte(guardados, instance.pk))
+    instance._valores_resumen = guardados
+
+
+@receiver(pre_delete, sender=Asignacion)
+def asignacion_por_eliminar(sender, instance, **kwargs):
+    instance._aporte_resumen = _aporte(getattr(instance, '_valores_resumen', None), instance.pk)
+
+
+@receiver(post_delete, sender=Asignacion)
+def resumen_asignacion_eliminada(sender, instance, **kwargs):
+    registrar_cambio(getattr(instance, '_aporte_resumen', None), None)
+
+
+@receiver(pre_delete, sender=Vehiculo)
+def resumen_vehiculo_por_eliminar(sender, instance, **kwargs):
+    desvincular_recurso('vehiculo_id', instance.pk)
+
+
+@receiver(pre_delete, sender=Conductor)
+def resumen_conductor_por_eliminar(sender, instance, **kwargs):
+    desvincular_recurso('conductor_id', instance.pk)
+
+
+# Series por intervalo: un viaje de un día pasado, antes o después de
+# escribirlo, cambia intervalos que ya estaban cerrados
+
+@receiver(post_save, sender=Asignacion)
+@receiver(post_delete, sender=Asignacion)
+def series_asignacion_modificada(sender, instance, **kwargs):
+    anterior = getattr(instance, '_aporte_resumen', None)
+    invalidar_historico([
+        timezone.localtime(instance.fecha_hora_requerida_inicio).date(),
+        anterior[0][0] if anterior else None,
+    ])
+
+
+# Próximo mantenimiento: el servicio de mayor kilometraje es el último. Un
+# servicio registrado con más km que el odómetro lo adelanta.
+
+@receiver(post_save, sender=Mantenimiento)
+@receiver(post_delete, sender=Mantenimiento)
+def mantenimiento_modificado(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Vehiculo):
+        return  # se está eliminando el vehículo completo
+    vehiculo = Vehiculo.objects.filter(pk=instance.vehiculo_id).first()
+    if vehiculo is None:
+        return
+    vehiculo.km_ultimo_mantenimiento = vehiculo.mantenimientos.aggregate(km=Max('kilometraje'))['km']
+    if vehiculo.km_ultimo_mantenimiento is not None and vehiculo.km_ultimo_mantenimiento > vehiculo.kilometraje:
+        vehiculo.kilometraje = vehiculo.km_ultimo_mantenimiento
+    vehiculo.save(update_fields=['km_ultimo_mantenimiento', 'kilometraje'])
+
+
+# Sesiones de turno: se rehacen desde la marca escrita (o desde donde
+# estaba antes de moverla)
+
+@receiver(pre_save, sender=RegistroTurno)
+def registro_turno_por_guardar(sender, instance, **kwargs):
+    instance._marca_anterior = None if instance._state.adding else (
+        RegistroTurno.objects.filter(pk=instance.pk).values_list('conductor_id', 'fecha_hora').first()
+    )
+
+
+@receiver(post_save, sender=RegistroTurno)
+def registro_turno_guardado(sender, instance, **kwargs):
+    anterior = getattr(instance, '_marca_anterior', None)
+    desde = instance.fecha_hora
+    if anterior is not None:
+        conductor_anterior, fecha_hora_anterior = anterior
+        if conductor_anterior != instance.conductor_id:
+            reparar_sesiones(conductor_anterior, fecha_hora_anterior)
+        else:
+            desde = min(desde, fecha_hora_anterior)
+    reparar_sesiones(instance.conductor_id, desde)
+
+
+@receiver(post_delete, sender=RegistroTurno)
+def registro_turno_eliminado(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Conductor):
+        return  # se está eliminando el conductor completo
+    reparar_sesiones(instance.conductor_id, instance.fecha_hora)
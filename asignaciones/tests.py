@@ -1,3 +1,1300 @@
-from django.test import TestCase
+import os
+import csv
+import io
+import json
+import math
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta, timezone as dt_timezone
+from itertools import permutations
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache_dashboard import ESPERA_MAXIMA, _esperar, _generacion, obtener_intervalos
+from .disponibilidad import IndiceDisponibilidad, franja_asignacion
+from .distancias import DECIMALES_CELDA, calcular_distancia_km, distancia_estimada_km, distancia_viaje_km
+from .elegibilidad import TODOS_LOS_TIPOS, mascara_tipos
+from .fechas import inicio_dia, rango_dias
+from .mantenimiento import anotar_urgencia, conteo_urgencias, urgencia
+from .mapa_calor import celdas_mapa_calor
+from .exportacion import COLUMNAS
+from .filters import AsignacionFilter, RegistroTurnoFilter
+from .management.commands._bd_temporal import bd_temporal
+from .management.commands.simular_asignacion import Command as SimularAsignacion
+from .flota import invalidar_snapshot, obtener_snapshot
+from .models import (
+    Asignacion, Conductor, DistanciaRuta, Mantenimiento, PerfilAsignacion, RegistroTurno, ResumenDiario,
+    TrabajoAsignacion, Vehiculo, ZonaRuta,
+)
+from .optimizacion import resolver_asignacion_max_score
+from .perfiles import PERFIL_POR_DEFECTO, cargar_perfiles, componentes_vehiculo
+from .planificacion import aplicar_plan, planificar_dia
+from .resumenes import reconstruir_resumenes
+from .rutas import (
+    CLAVE_VERSION, INTERVALO_VERSION, GrafoVial, MatrizOD, calcular_distancias_zonas, invalidar_matriz,
+)
+from .series import intervalos
+from .services import (
+    asignar_asignacion_incremental, asignar_vehiculos_automatico_lote, calcular_score,
+    calcular_scores_matriz, construir_matriz_scores, es_compatible, registrar_posicion_vehiculo
+)
+from .trabajos import ejecutar_trabajo, reclamar_trabajo
+from .views import DashboardStatsView, secciones_solicitadas
+
+
+def crear_vehiculo(patente, **campos):
+    campos.setdefault('capacidad_pasajeros', 8)
+    campos.setdefault('tipo_vehiculo', 'camioneta')
+    return Vehiculo.objects.create(marca='Toyota', modelo='Hilux', patente=patente, **campos)
+
+
+def crear_conductor(licencia, **campos):
+    campos.setdefault('estado_disponibilidad', 'disponible')
+    campos.setdefault('tipos_vehiculo_habilitados', 'automovil,camioneta,minibus')
+    return Conductor.objects.create(
+        nombre='Nombre', apellido=licencia, numero_licencia=licencia,
+        fecha_vencimiento_licencia=date(2099, 1, 1), **campos
+    )
+
+
+def crear_asignacion(inicio, horas=2, **campos):
+    campos.setdefault('origen_lat', -33.45)
+    campos.setdefault('origen_lon', -70.66)
+    campos.setdefault('destino_lat', -33.50)
+    campos.setdefault('destino_lon', -70.60)
+    return Asignacion.objects.create(
+        fecha_hora_requerida_inicio=inicio, fecha_hora_fin_prevista=inicio + timedelta(hours=horas), **campos
+    )
+
+
+def manana_a_las(hora):
+    return (timezone.now() + timedelta(days=1)).replace(hour=hora, minute=0, second=0, microsecond=0)
+
+
+class MetodoHungaroTests(TestCase):
+
+    @staticmethod
+    def fuerza_bruta(scores):
+        """(filas asignadas, score total) óptimos probando todas las asignaciones"""
+        n, m = len(scores), len(scores[0])
+        mejor = (0, 0.0)
+        columnas = list(range(m)) + [None] * n
+        for permutacion in set(permutations(columnas, n)):
+            pares = [(i, j) for i, j in enumerate(permutacion) if j is not None]
+            if any(scores[i][j] is None for i, j in pares):
+                continue
+            mejor = max(mejor, (len(pares), sum(scores[i][j] for i, j in pares)))
+        return mejor
+
+    def test_igual_a_fuerza_bruta_en_matrices_pequenas(self):
+        azar = random.Random(11)
+        for _ in range(200):
+            n, m = azar.randint(1, 4), azar.randint(1, 4)
+            scores = [
+                [None if azar.random() < 0.25 else round(azar.uniform(-1, 1), 3) for _ in range(m)]
+                for _ in range(n)
+            ]
+
+            pares = resolver_asignacion_max_score(scores)
+
+            self.assertEqual(len({i for i, _ in pares}), len(pares))
+            self.assertEqual(len({j for _, j in pares}), len(pares))
+            self.assertTrue(all(scores[i][j] is not None for i, j in pares))
+            filas, total = self.fuerza_bruta(scores)
+            self.assertEqual(len(pares), filas, scores)
+            self.assertAlmostEqual(sum(scores[i][j] for i, j in pares), total, places=9, msg=scores)
+
+    def test_arreglo_numpy_con_nan_igual_que_listas(self):
+        azar = np.random.default_rng(5)
+        scores = azar.uniform(0, 1, (30, 12))
+        scores[azar.uniform(size=scores.shape) < 0.4] = np.nan
+        listas = [[None if np.isnan(s) else s for s in fila] for fila in scores.tolist()]
+
+        pares = resolver_asignacion_max_score(scores)
+
+        self.assertEqual(len(pares), len(resolver_asignacion_max_score(listas)))
+        self.assertAlmostEqual(
+            sum(scores[i, j] for i, j in pares),
+            sum(listas[i][j] for i, j in resolver_asignacion_max_score(listas)),
+        )
+
+
+class ScoresTests(TestCase):
+    """La matriz vectorizada da los mismos scores que calcular_score celda a celda"""
+
+    def setUp(self):
+        # Los componentes por vehículo se guardan por (pk, versión) y las
+        # pruebas anteriores pueden haber usado los mismos pk
+        patcher = mock.patch.dict('asignaciones.perfiles._componentes_vehiculo', clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        azar = random.Random(7)
+        self.vehiculos = [
+            crear_vehiculo(f'SC{i:04d}', capacidad_pasajeros=azar.choice([2, 4, 8, 16]),
+                           anio=azar.choice([None, 2005, 2012, 2020, 2026]))
+            for i in range(8)
+        ]
+        self.asignaciones = [
+            crear_asignacion(
+                manana_a_las(8), req_pasajeros=azar.randint(1, 12),
+                solicitante_jerarquia=azar.randint(0, 3),
+                # Coordenadas ya en la grilla de la distancia almacenada
+                origen_lat=round(-33.04 + azar.uniform(-0.5, 0.5), DECIMALES_CELDA),
+                origen_lon=round(-71.55 + azar.uniform(-0.5, 0.5), DECIMALES_CELDA),
+                destino_lat=round(-33.04 + azar.uniform(-1.5, 1.5), DECIMALES_CELDA),
+                destino_lon=round(-71.45 + azar.uniform(-1.5, 1.5), DECIMALES_CELDA),
+            )
+            for _ in range(10)
+        ]
+        # Sin coordenadas la distancia cuenta como 0
+        self.asignaciones.append(crear_asignacion(manana_a_las(9), destino_lat=None, destino_lon=None))
+
+    def test_construir_matriz_scores_igual_a_calcular_score(self):
+        matriz = construir_matriz_scores(self.asignaciones, self.vehiculos)
+
+        for i, a in enumerate(self.asignaciones):
+            for j, v in enumerate(self.vehiculos):
+                if es_compatible(a, v):
+                    self.assertAlmostEqual(matriz[i, j], calcular_score(a, v), places=9)
+                else:
+                    self.assertTrue(np.isnan(matriz[i, j]))
+
+    def test_calcular_scores_matriz_igual_a_construir_matriz_scores(self):
+        a, v = self.asignaciones, self.vehiculos
+        crudos = calcular_scores_matriz(
+            [x.origen_lat for x in a], [x.origen_lon for x in a],
+            [x.destino_lat for x in a], [x.destino_lon for x in a],
+            [x.req_pasajeros for x in a], [x.solicitante_jerarquia for x in a],
+            [x.capacidad_pasajeros for x in v], [x.anio for x in v],
+        )
+        compatibles = np.array([[es_compatible(x, y) for y in v] for x in a])
+
+        np.testing.assert_allclose(
+            np.where(compatibles, crudos, np.nan), construir_matriz_scores(a, v), rtol=1e-9, equal_nan=True
+        )
+
+    def test_perfil_por_tipo_de_vehiculo_preferente(self):
+        PerfilAsignacion.objects.create(
+            nombre='larga_distancia', peso_cargo=0.1, peso_capacidad=0.1, peso_distancia=0.8,
+            tipo_vehiculo='minibus'
+        )
+        for a in self.asignaciones[:5]:
+            a.req_tipo_vehiculo_preferente = 'minibus'
+        perfiles = cargar_perfiles()
+
+        matriz = construir_matriz_scores(self.asignaciones, self.vehiculos, perfiles)
+
+        for i, a in enumerate(self.asignaciones):
+            perfil = perfiles.para(a)
+            self.assertEqual(perfil.nombre, 'larga_distancia' if i < 5 else PERFIL_POR_DEFECTO)
+            for j, v in enumerate(self.vehiculos):
+                if es_compatible(a, v):
+                    self.assertAlmostEqual(matriz[i, j], calcular_score(a, v, perfil), places=9)
+
+    def test_perfil_de_la_base_prevalece_y_nombre_desconocido_falla(self):
+        PerfilAsignacion.objects.create(nombre=PERFIL_POR_DEFECTO, peso_cargo=1.0, peso_capacidad=0, peso_distancia=0)
+        PerfilAsignacion.objects.create(nombre='inactivo', activo=False)
+
+        self.assertEqual(cargar_perfiles().por_defecto.peso_cargo, 1.0)
+        with self.assertRaises(ValueError):
+            cargar_perfiles('inactivo')
+
+    def test_componentes_del_vehiculo_se_recalculan_al_cambiar_la_version(self):
+        vehiculo = self.vehiculos[0]
+        vehiculo.anio = 2010
+        vehiculo.save()
+        self.assertEqual(componentes_vehiculo(vehiculo)[1], 0)
+
+        vehiculo.anio = 2025
+        vehiculo.save()
+
+        self.assertEqual(componentes_vehiculo(vehiculo)[1], 1)
+
+
+class IndiceDisponibilidadTests(TestCase):
+    """Franjas semiabiertas [inicio, fin): tocarse en un extremo no es traslape"""
+
+    def setUp(self):
+        self.base = manana_a_las(0)
+        self.indice = IndiceDisponibilidad()
+        self.indice.agregar(1, self.h(10), self.h(12), 100)
+
+    def h(self, horas):
+        return self.base + timedelta(hours=horas)
+
+    def test_bordes(self):
+        libre = self.indice.esta_libre
+        self.assertTrue(libre(1, self.h(8), self.h(10)))       # termina cuando empieza
+        self.assertTrue(libre(1, self.h(12), self.h(14)))      # empieza cuando termina
+        self.assertFalse(libre(1, self.h(9), self.h(10.5)))    # traslapa el inicio
+        self.assertFalse(libre(1, self.h(11.5), self.h(13)))   # traslapa el fin
+        self.assertFalse(libre(1, self.h(10.5), self.h(11)))   # contenida
+        self.assertFalse(libre(1, self.h(9), self.h(13)))      # la contiene
+        self.assertFalse(libre(1, self.h(10), self.h(12)))     # la misma franja
+        self.assertTrue(libre(2, self.h(10), self.h(12)))      # otro recurso
+
+    def test_intervalo_largo_anterior_a_otros_cortos(self):
+        # La búsqueda hacia atrás debe llegar hasta el intervalo largo
+        self.indice.agregar(1, self.h(0), self.h(20), 101)
+        self.indice.agregar(1, self.h(1), self.h(2), 102)
+        self.assertFalse(self.indice.esta_libre(1, self.h(15), self.h(16)))
+        self.indice.quitar(101)
+        self.assertTrue(self.indice.esta_libre(1, self.h(15), self.h(16)))
+
+    def test_matriz_de_ocupados_igual_a_esta_libre(self):
+        self.indice.agregar(1, self.h(0), self.h(20), 101)
+        self.indice.agregar(2, self.h(13), self.h(14), 102)
+        franjas = [(self.h(a), self.h(b)) for a, b in [(8, 10), (12, 13), (9, 10.5), (14, 16), (21, 22), (13.5, 13.75)]]
+        inicios = np.array([inicio.timestamp() for inicio, _ in franjas])
+        fines = np.array([fin.timestamp() for _, fin in franjas])
+
+        ocupados = self.indice.ocupados([1, 2, 3], inicios, fines)
+
+        esperado = [[not self.indice.esta_libre(r, inicio, fin) for r in (1, 2, 3)] for inicio, fin in franjas]
+        self.assertEqual(ocupados.tolist(), esperado)
+
+    def test_quitar_y_registrar(self):
+        self.indice.quitar(100)
+        self.assertTrue(self.indice.esta_libre(1, self.h(10), self.h(12)))
+        asignacion = Asignacion(pk=100, vehiculo_id=1, estado='programada',
+                                fecha_hora_requerida_inicio=self.h(10), fecha_hora_fin_prevista=None)
+        self.indice.registrar(asignacion)
+        # Sin fin previsto ocupa DURACION_POR_DEFECTO (2 h)
+        self.assertFalse(self.indice.esta_libre(1, self.h(11.5), self.h(13)))
+        self.assertTrue(self.indice.esta_libre(1, self.h(12), self.h(13)))
+        asignacion.estado = 'completada'
+        self.indice.registrar(asignacion)
+        self.assertTrue(self.indice.esta_libre(1, self.h(10), self.h(12)))
+
+
+class AsignacionIncrementalTests(TestCase):
+    """La foto de la flota no ve las reservas de otros procesos: la base decide"""
+
+    def setUp(self):
+        invalidar_snapshot()
+        self.addCleanup(invalidar_snapshot)
+        self.inicio = manana_a_las(10)
+
+    def test_no_reserva_vehiculo_ocupado_fuera_de_la_foto(self):
+        ocupado = crear_vehiculo('AA1111')
+        libre = crear_vehiculo('BB2222')
+        obtener_snapshot(recargar=True)
+        # Otro proceso reserva el vehículo sin pasar por las señales de éste
+        otra = crear_asignacion(self.inicio, estado='pendiente_auto')
+        Asignacion.objects.filter(pk=otra.pk).update(vehiculo=ocupado, estado='programada')
+
+        asignacion = crear_asignacion(self.inicio + timedelta(hours=1))
+        asignado = asignar_asignacion_incremental(asignacion)
+
+        self.assertEqual(asignado.pk, libre.pk)
+        self.assertFalse(obtener_snapshot().indice_vehiculos.esta_libre(
+            ocupado.pk, self.inicio, self.inicio + timedelta(hours=2)
+        ))
+
+    def test_no_reserva_conductor_ocupado_fuera_de_la_foto(self):
+        crear_vehiculo('AA1111')
+        ocupado = crear_conductor('L-1')
+        libre = crear_conductor('L-2')
+        obtener_snapshot(recargar=True)
+        otra = crear_asignacion(self.inicio, estado='pendiente_auto')
+        Asignacion.objects.filter(pk=otra.pk).update(conductor=ocupado, estado='programada')
+        # La foto cree libre sólo al conductor ocupado
+        obtener_snapshot().elegibilidad.quitar(libre.pk)
+
+        asignacion = crear_asignacion(self.inicio + timedelta(hours=1))
+        asignar_asignacion_incremental(asignacion)
+
+        asignacion.refresh_from_db()
+        self.assertEqual(asignacion.estado, 'programada')
+        self.assertIsNone(asignacion.conductor_id)
+
+    def test_actualizar_vehiculo_relee_sus_franjas(self):
+        vehiculo = crear_vehiculo('AA1111')
+        snapshot = obtener_snapshot(recargar=True)
+        otra = crear_asignacion(self.inicio, estado='pendiente_auto')
+        Asignacion.objects.filter(pk=otra.pk).update(vehiculo=vehiculo, estado='programada')
+        self.assertTrue(snapshot.indice_vehiculos.esta_libre(
+            vehiculo.pk, self.inicio, self.inicio + timedelta(hours=1)
+        ))
+
+        snapshot.actualizar_vehiculo(vehiculo.pk)
+
+        self.assertFalse(snapshot.indice_vehiculos.esta_libre(
+            vehiculo.pk, self.inicio, self.inicio + timedelta(hours=1)
+        ))
+
+
+class LoteAsignacionTests(TestCase):
+    """El lote guarda sus decisiones en un número fijo de sentencias"""
+
+    def setUp(self):
+        invalidar_snapshot()
+        self.addCleanup(invalidar_snapshot)
+        self.inicio = manana_a_las(8)
+
+    def consultas_lote(self, solicitudes):
+        for i in range(solicitudes):
+            crear_asignacion(self.inicio + timedelta(hours=3 * i), estado='pendiente_auto')
+        with CaptureQueriesContext(connection) as consultas:
+            resultados = asignar_vehiculos_automatico_lote()
+        self.assertEqual(len(resultados), solicitudes)
+        self.assertTrue(all(r['vehiculo_asignado'] for r in resultados))
+        return len(consultas)
+
+    def test_escrituras_no_crecen_con_las_solicitudes(self):
+        crear_vehiculo('AA1111')
+        consultas_n = self.consultas_lote(3)
+        Asignacion.objects.all().delete()
+        Vehiculo.objects.update(estado='disponible')
+
+        self.assertEqual(self.consultas_lote(6), consultas_n)
+
+    def test_vehiculo_a_mantenimiento_durante_el_lote(self):
+        vehiculo = crear_vehiculo('AA1111')
+        asignacion = crear_asignacion(self.inicio, estado='pendiente_auto')
+
+        def progreso(etapa, procesadas, total):
+            if etapa == 'guardando':
+                # Edición desde el admin mientras el lote resolvía
+                otro = Vehiculo.objects.get(pk=vehiculo.pk)
+                otro.estado = 'mantenimiento'
+                otro.save()
+
+        resultados = asignar_vehiculos_automatico_lote(progreso=progreso)
+
+        self.assertEqual(resultados, [
+            {'asignacion_id': asignacion.pk, 'vehiculo_asignado': None, 'conductor_asignado': None}
+        ])
+        asignacion.refresh_from_db()
+        vehiculo.refresh_from_db()
+        self.assertEqual((asignacion.estado, asignacion.vehiculo_id), ('fallo_auto', None))
+        self.assertEqual(vehiculo.estado, 'mantenimiento')
+
+
+class ConductoresLoteTests(TestCase):
+    """El lote elige conductor junto con el vehículo"""
+
+    def setUp(self):
+        invalidar_snapshot()
+        self.addCleanup(invalidar_snapshot)
+        self.inicio = manana_a_las(8)
+
+    def test_solo_conductores_habilitados_y_sin_traslapes(self):
+        crear_vehiculo('AA1111')
+        crear_vehiculo('BB2222')
+        crear_conductor('L-AUTO', tipos_vehiculo_habilitados='automovil')
+        vencido = crear_conductor('L-VENCIDO')
+        Conductor.objects.filter(pk=vencido.pk).update(fecha_vencimiento_licencia=date(2000, 1, 1))
+        crear_conductor('L-FUERA', estado_disponibilidad='no_disponible')
+        habilitado = crear_conductor('L-CAMIONETA', tipos_vehiculo_habilitados='camioneta')
+        primera = crear_asignacion(self.inicio, estado='pendiente_auto')
+        segunda = crear_asignacion(self.inicio + timedelta(hours=1), estado='pendiente_auto')
+
+        resultados = asignar_vehiculos_automatico_lote()
+
+        self.assertEqual(len(resultados), 2)
+        conductores = dict(
+            Asignacion.objects.filter(pk__in=[primera.pk, segunda.pk]).values_list('pk', 'conductor_id')
+        )
+        # Los dos viajes se traslapan: sólo uno lleva al único conductor apto
+        self.assertEqual(sorted(conductores.values(), key=lambda c: c or 0), [None, habilitado.pk])
+        self.assertEqual(Asignacion.objects.filter(estado='programada').count(), 2)
+
+    def test_tipos_sin_reconocer_no_restringen(self):
+        self.assertEqual(mascara_tipos('N/A'), TODOS_LOS_TIPOS)
+        self.assertEqual(mascara_tipos(''), TODOS_LOS_TIPOS)
+        self.assertNotEqual(mascara_tipos('Camioneta, minibus'), TODOS_LOS_TIPOS)
+
+
+class MantenimientoTests(TestCase):
+    """Urgencias por km restantes, guardados en el vehículo"""
+
+    def test_umbrales_en_la_base_iguales_a_urgencia(self):
+        # Km que faltan: 9.500 -> 500 (límite del crítico), 9.100 -> 900, 8.500 -> 1.500, ...
+        esperadas = {
+            'AA1000': ('critico', 9500), 'AA1001': ('critico', 21000), 'AA1002': ('urgente', 9100),
+            'AA1003': ('urgente', 9000), 'AA1004': ('proximo', 8500), 'AA1005': ('ok', 7999),
+        }
+        for patente, (_, kilometraje) in esperadas.items():
+            crear_vehiculo(patente, kilometraje=kilometraje)
+        # Vencido: el último servicio fue a los 10.000 km
+        Mantenimiento.objects.create(vehiculo=Vehiculo.objects.get(patente='AA1001'), kilometraje=10000)
+
+        anotados = anotar_urgencia(Vehiculo.objects.all()).values_list(
+            'patente', 'km_para_mantenimiento', 'urgencia_mantenimiento'
+        )
+
+        for patente, km_restantes, nivel in anotados:
+            self.assertEqual(nivel, esperadas[patente][0], patente)
+            self.assertEqual(urgencia(km_restantes), nivel)
+        self.assertEqual(
+            conteo_urgencias(Vehiculo.objects.all()), {'criticos': 2, 'urgentes': 2, 'proximos': 1, 'ok': 1}
+        )
+
+    def test_registrar_un_servicio_reinicia_el_intervalo(self):
+        vehiculo = crear_vehiculo('AA1111', kilometraje=9600)
+        self.assertEqual(vehiculo.km_para_mantenimiento, 400)
+
+        servicio = Mantenimiento.objects.create(vehiculo=vehiculo, kilometraje=9600)
+        vehiculo.refresh_from_db()
+        self.assertEqual((vehiculo.proximo_mantenimiento_km, vehiculo.km_para_mantenimiento), (19600, 10000))
+
+        # Un servicio con más km que el odómetro lo adelanta
+        Mantenimiento.objects.create(vehiculo=vehiculo, kilometraje=9800)
+        vehiculo.refresh_from_db()
+        self.assertEqual((vehiculo.kilometraje, vehiculo.km_para_mantenimiento), (9800, 10000))
+
+        Mantenimiento.objects.exclude(pk=servicio.pk).delete()
+        vehiculo.refresh_from_db()
+        self.assertEqual((vehiculo.proximo_mantenimiento_km, vehiculo.km_para_mantenimiento), (19600, 9800))
+
+
+class PosicionVehiculoTests(TestCase):
+
+    def test_solo_la_transicion_a_completada_mueve_el_vehiculo(self):
+        vehiculo = crear_vehiculo('AA1111')
+        asignacion = crear_asignacion(timezone.now() - timedelta(hours=3), vehiculo=vehiculo, estado='activa')
+        asignacion.estado = 'completada'
+        asignacion.save()
+        vehiculo.refresh_from_db()
+        self.assertEqual((vehiculo.ultima_lat, vehiculo.ultima_lon), (-33.50, -70.60))
+
+        registrar_posicion_vehiculo(vehiculo.pk, -33.0, -71.0, timezone.now())
+        asignacion.distancia_recorrida_km = 12.5
+        asignacion.save()
+
+        vehiculo.refresh_from_db()
+        self.assertEqual((vehiculo.ultima_lat, vehiculo.ultima_lon), (-33.0, -71.0))
+
+
+class DistanciaEstimadaTests(TestCase):
+    """La distancia del viaje se guarda con la solicitud y se usa en el scoring"""
+
+    def test_se_guarda_y_se_recalcula_al_mover_coordenadas(self):
+        asignacion = crear_asignacion(manana_a_las(8))
+        esperada = calcular_distancia_km(-33.45, -70.66, -33.50, -70.60)
+        self.assertAlmostEqual(Asignacion.objects.get(pk=asignacion.pk).distancia_estimada_km, esperada, places=1)
+
+        asignacion.destino_lat, asignacion.destino_lon = -33.04, -71.55
+        asignacion.save(update_fields=['destino_lat', 'destino_lon'])
+
+        esperada = calcular_distancia_km(-33.45, -70.66, -33.04, -71.55)
+        self.assertAlmostEqual(Asignacion.objects.get(pk=asignacion.pk).distancia_estimada_km, esperada, places=1)
+
+    def test_otros_campos_no_tocan_la_distancia(self):
+        asignacion = crear_asignacion(manana_a_las(8))
+        Asignacion.objects.filter(pk=asignacion.pk).update(distancia_estimada_km=123.0)
+        asignacion.refresh_from_db()
+
+        asignacion.req_pasajeros = 3
+        asignacion.save(update_fields=['req_pasajeros'])
+
+        self.assertEqual(Asignacion.objects.get(pk=asignacion.pk).distancia_estimada_km, 123.0)
+
+    def test_filas_de_bulk_create_se_estiman_al_puntuar(self):
+        inicio = manana_a_las(8)
+        Asignacion.objects.bulk_create([Asignacion(
+            fecha_hora_requerida_inicio=inicio, fecha_hora_fin_prevista=inicio + timedelta(hours=1),
+            origen_lat=-33.45, origen_lon=-70.66, destino_lat=-33.50, destino_lon=-70.60,
+        )])
+        asignacion = Asignacion.objects.get()
+
+        self.assertIsNone(asignacion.distancia_estimada_km)
+        self.assertEqual(distancia_viaje_km(asignacion), distancia_estimada_km(-33.45, -70.66, -33.50, -70.60))
+
+
+class MatrizVialTests(TestCase):
+
+    def setUp(self):
+        hospital = ZonaRuta.objects.create(nombre='Hospital', lat=-33.45, lon=-70.66, radio_km=1)
+        cesfam = ZonaRuta.objects.create(nombre='Cesfam', lat=-33.50, lon=-70.60, radio_km=1)
+        self.ruta = DistanciaRuta.objects.create(origen=hospital, destino=cesfam, distancia_km=50, duracion_min=60)
+        invalidar_matriz()
+        self.addCleanup(invalidar_matriz)
+
+    def test_otro_proceso_publica_una_matriz_nueva(self):
+        self.assertEqual(distancia_estimada_km(-33.45, -70.66, -33.50, -70.60), 50)
+
+        # calcular_rutas en otro proceso: cambia la base y la versión compartida
+        DistanciaRuta.objects.filter(pk=self.ruta.pk).update(distancia_km=70)
+        cache.incr(CLAVE_VERSION)
+        self.assertEqual(distancia_estimada_km(-33.45, -70.66, -33.50, -70.60), 50)
+
+        with mock.patch('asignaciones.rutas.timezone.now', return_value=timezone.now() + INTERVALO_VERSION * 2):
+            self.assertEqual(distancia_estimada_km(-33.45, -70.66, -33.50, -70.60), 70)
+
+
+class GrafoVialTests(TestCase):
+    """Caminos mínimos sobre un extracto de la red en GeoJSON"""
+
+    A, C, B, D = (-33.00, -71.00), (-33.00, -70.90), (-33.10, -70.90), (-33.10, -71.00)
+
+    def setUp(self):
+        def linea(puntos, **propiedades):
+            return {
+                'type': 'Feature', 'properties': propiedades,
+                'geometry': {'type': 'LineString', 'coordinates': [[lon, lat] for lat, lon in puntos]},
+            }
+
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'red.geojson')
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump({'type': 'FeatureCollection', 'features': [
+                    linea([self.A, self.C, self.B], highway='primary'),
+                    linea([self.B, self.D], highway='residential', oneway='yes'),
+                ]}, f)
+            self.grafo = GrafoVial.desde_geojson(ruta)
+
+    def nodo(self, punto):
+        return self.grafo.nodo_mas_cercano(*punto)[0]
+
+    def test_rodeo_por_la_red_y_sentido_unico(self):
+        esperado = calcular_distancia_km(*self.A, *self.C) + calcular_distancia_km(*self.C, *self.B)
+
+        km, minutos = self.grafo.a_estrella(self.nodo(self.A), self.nodo(self.B))
+
+        self.assertAlmostEqual(km, esperado)
+        # Vía primaria a 60 km/h: un minuto por km
+        self.assertAlmostEqual(minutos, esperado)
+        self.assertGreater(km, calcular_distancia_km(*self.A, *self.B))
+        self.assertEqual(self.grafo.dijkstra(self.nodo(self.A))[self.nodo(self.B)], (km, minutos))
+        self.assertIsNotNone(self.grafo.a_estrella(self.nodo(self.B), self.nodo(self.D)))
+        self.assertIsNone(self.grafo.a_estrella(self.nodo(self.D), self.nodo(self.B)))
+
+    def test_matriz_entre_zonas_usa_la_red(self):
+        zonas = [
+            ZonaRuta.objects.create(nombre=nombre, lat=lat, lon=lon, radio_km=1)
+            for nombre, (lat, lon) in (('A', self.A), ('B', self.B), ('D', self.D))
+        ]
+        distancias = calcular_distancias_zonas(self.grafo, zonas)
+        # D no tiene salida por la red
+        self.assertEqual({(d.origen.nombre, d.destino.nombre) for d in distancias},
+                         {('A', 'B'), ('A', 'D'), ('B', 'A'), ('B', 'D')})
+
+        matriz = MatrizOD(
+            [(z.pk, z.lat, z.lon, z.radio_km) for z in zonas],
+            [(d.origen.pk, d.destino.pk, d.distancia_km, d.duracion_min) for d in distancias],
+        )
+
+        km, _ = matriz.ruta(self.A[0] + 0.001, self.A[1], *self.B)
+        self.assertAlmostEqual(km, self.grafo.a_estrella(self.nodo(self.A), self.nodo(self.B))[0])
+        self.assertIsNone(matriz.ruta(*self.D, *self.A))
+        self.assertIsNone(matriz.ruta(-33.50, -70.50, *self.B))
+
+
+class SimulacionTests(TestCase):
+
+    def test_csv_se_desplaza_al_inicio_de_la_simulacion(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'solicitudes.csv')
+            with open(ruta, 'w', newline='', encoding='utf-8') as f:
+                f.write('fecha_solicitud,fecha_hora_requerida_inicio,fecha_hora_fin_prevista,req_pasajeros\n')
+                f.write('2024-03-01T08:00:00,2024-03-02T10:00:00,2024-03-02T12:00:00,3\n')
+                f.write(',2024-03-05T09:00:00,,\n')
+            inicio = manana_a_las(0)
+            solicitudes = SimularAsignacion()._cargar_csv(ruta, inicio)
+
+        (llegada, primera), (_, segunda) = solicitudes
+        self.assertEqual(llegada, inicio)
+        self.assertEqual(primera.fecha_hora_requerida_inicio - llegada, timedelta(hours=26))
+        self.assertEqual(primera.fecha_hora_fin_prevista - primera.fecha_hora_requerida_inicio, timedelta(hours=2))
+        self.assertEqual(primera.req_pasajeros, 3)
+        # Sin fecha de solicitud llega 24 h antes del viaje
+        self.assertEqual(solicitudes[1][0], segunda.fecha_hora_requerida_inicio - timedelta(hours=24))
+        self.assertEqual((segunda.req_pasajeros, segunda.fecha_hora_fin_prevista), (1, None))
+
+    def test_km_en_vacio_desde_la_base_y_entre_viajes(self):
+        vehiculo = crear_vehiculo('AA1111', base_lat=-33.40, base_lon=-70.70)
+        crear_asignacion(manana_a_las(8), vehiculo=vehiculo, estado='programada')
+        crear_asignacion(manana_a_las(12), vehiculo=vehiculo, estado='programada',
+                         origen_lat=-33.60, origen_lon=-70.50)
+        crear_asignacion(manana_a_las(8), estado='fallo_auto')
+
+        calidad = SimularAsignacion()._calidad()
+
+        esperado = (calcular_distancia_km(-33.40, -70.70, -33.45, -70.66)
+                    + calcular_distancia_km(-33.50, -70.60, -33.60, -70.50))
+        self.assertAlmostEqual(calidad['vacio_km'], esperado)
+        self.assertEqual((calidad['total'], calidad['fallos'], calidad['colocadas']), (3, 1, 2))
+
+    def test_bd_temporal_rechaza_otro_motor_sin_forzar(self):
+        otra = mock.Mock(vendor='microsoft', settings_dict={'NAME': 'produccion'})
+        with mock.patch('asignaciones.management.commands._bd_temporal.connection', otra):
+            with self.assertRaises(CommandError):
+                with bd_temporal():
+                    pass
+
+        otra.creation.create_test_db.assert_not_called()
+
+
+class PlanificacionDiaTests(TestCase):
+
+    def test_respeta_reservas_del_dia_anterior_que_pasan_la_medianoche(self):
+        ocupado = crear_vehiculo('AA1111')
+        dia = timezone.localdate() + timedelta(days=2)
+        medianoche = inicio_dia(dia)
+        crear_asignacion(medianoche - timedelta(hours=1), horas=3, vehiculo=ocupado, estado='programada')
+        viaje = crear_asignacion(medianoche + timedelta(hours=1), horas=1)
+
+        plan = planificar_dia(dia, limite_segundos=0.5)
+        self.assertEqual([a.pk for a in plan.sin_asignar], [viaje.pk])
+
+        libre = crear_vehiculo('BB2222')
+        plan = planificar_dia(dia, limite_segundos=0.5)
+        self.assertEqual(plan.sin_asignar, [])
+        self.assertEqual([(v.pk, [a.pk for a in viajes]) for v, viajes, _ in plan.recorridos], [(libre.pk, [viaje.pk])])
+
+    def test_no_mueve_viajes_programados_por_defecto(self):
+        dia = timezone.localdate() + timedelta(days=2)
+        medianoche = inicio_dia(dia)
+        elegido, otro = crear_vehiculo('AA1111'), crear_vehiculo('BB2222')
+        manual = crear_asignacion(medianoche + timedelta(hours=9), vehiculo=elegido, estado='programada')
+        crear_asignacion(medianoche + timedelta(hours=13), vehiculo=otro, estado='programada')
+
+        plan = planificar_dia(dia, limite_segundos=0.5)
+        aplicar_plan(plan)
+
+        manual.refresh_from_db()
+        self.assertEqual((manual.estado, manual.vehiculo_id), ('programada', elegido.pk))
+        self.assertEqual(plan.vehiculos_usados, 2)
+
+    def test_programado_sin_lugar_queda_intacto(self):
+        dia = timezone.localdate() + timedelta(days=2)
+        medianoche = inicio_dia(dia)
+        chico = crear_vehiculo('AA1111', capacidad_pasajeros=2)
+        conductor = crear_conductor('L-1')
+        # Se programó a mano con más pasajeros de los que caben: ningún plan lo ubica
+        grande = crear_asignacion(
+            medianoche + timedelta(hours=9), vehiculo=chico, conductor=conductor, estado='programada', req_pasajeros=6
+        )
+        pendiente = crear_asignacion(medianoche + timedelta(hours=9, minutes=30), req_pasajeros=1)
+
+        plan = planificar_dia(dia, limite_segundos=0.5, replanificar_programadas=True)
+        aplicar_plan(plan)
+
+        self.assertEqual([a.pk for a in plan.sin_asignar], [pendiente.pk])
+        grande.refresh_from_db()
+        self.assertEqual(
+            (grande.estado, grande.vehiculo_id, grande.conductor_id), ('programada', chico.pk, conductor.pk)
+        )
+        pendiente.refresh_from_db()
+        self.assertEqual((pendiente.estado, pendiente.vehiculo_id), ('pendiente_auto', None))
+
+
+@override_settings(TRABAJO_ASIGNACION_MINUTOS_SIN_LATIDO=5)
+class ColaTrabajosTests(TestCase):
+
+    def test_reclama_trabajo_abandonado_por_un_worker_caido(self):
+        hace_un_rato = timezone.now() - timedelta(minutes=6)
+        abandonado = TrabajoAsignacion.objects.create(
+            estado='en_proceso', fecha_inicio=hace_un_rato, fecha_actualizacion=hace_un_rato
+        )
+
+        trabajo = reclamar_trabajo()
+
+        self.assertEqual(trabajo.pk, abandonado.pk)
+        self.assertEqual(trabajo.estado, 'en_proceso')
+        self.assertGreater(trabajo.fecha_inicio, timezone.now() - timedelta(minutes=1))
+
+    def test_resultados_requieren_autenticacion(self):
+        trabajo = TrabajoAsignacion.objects.create(estado='completado', resultados=[{'asignacion_id': 1}])
+        url = f'/api/trabajos-asignacion/{trabajo.pk}/'
+
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+        self.client.force_login(User.objects.create_user('despachador', password='clave'))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(ASIGNACION_LOTE_EN_COLA=False)
+    def test_sin_cola_el_lote_corre_en_la_peticion(self):
+        crear_vehiculo('AA1111')
+        asignacion = crear_asignacion(manana_a_las(10))
+
+        respuesta = self.client.post('/api/asignaciones/asignar-vehiculos-auto-lote/')
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['estado'], 'completado')
+        self.assertEqual([r['asignacion_id'] for r in respuesta.data['resultados']], [asignacion.pk])
+        self.assertFalse(TrabajoAsignacion.objects.filter(estado='pendiente').exists())
+
+    @override_settings(ASIGNACION_LOTE_EN_COLA=True)
+    def test_con_cola_el_lote_se_encola(self):
+        respuesta = self.client.post('/api/asignaciones/asignar-vehiculos-auto-lote/')
+
+        self.assertEqual(respuesta.status_code, 202)
+        self.assertEqual(TrabajoAsignacion.objects.get(pk=respuesta.data['trabajo_id']).estado, 'pendiente')
+
+    def test_no_reclama_lote_largo_con_latido(self):
+        TrabajoAsignacion.objects.create(
+            estado='en_proceso',
+            fecha_inicio=timezone.now() - timedelta(hours=2),
+            fecha_actualizacion=timezone.now() - timedelta(minutes=1),
+        )
+
+        self.assertIsNone(reclamar_trabajo())
+
+    def test_el_progreso_renueva_el_latido(self):
+        crear_vehiculo('AA1111')
+        crear_asignacion(manana_a_las(10))
+        hace_un_rato = timezone.now() - timedelta(minutes=4)
+        TrabajoAsignacion.objects.create(estado='pendiente')
+        trabajo = reclamar_trabajo()
+        TrabajoAsignacion.objects.filter(pk=trabajo.pk).update(fecha_actualizacion=hace_un_rato)
+        latidos = []
+
+        def registrar(*args, progreso, **kwargs):
+            progreso('resolviendo', 0, 1)
+            latidos.append(TrabajoAsignacion.objects.get(pk=trabajo.pk).fecha_actualizacion)
+            return []
+
+        with mock.patch('asignaciones.trabajos.asignar_vehiculos_automatico_lote', side_effect=registrar):
+            ejecutar_trabajo(trabajo)
+
+        self.assertGreater(latidos[0], hace_un_rato)
+
+
+class CacheDashboardTests(TestCase):
+
+    def test_guardar_cambia_la_generacion(self):
+        generacion = _generacion()
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_asignacion(manana_a_las(10))
+
+        self.assertNotEqual(_generacion(), generacion)
+
+    def test_espera_acotada_con_intervalos_crecientes(self):
+        reloj = [0.0]
+
+        def dormir(segundos):
+            reloj[0] += segundos
+
+        cache.set('prueba:calculando', True)
+        with mock.patch('asignaciones.cache_dashboard.time.monotonic', side_effect=lambda: reloj[0]), \
+                mock.patch('asignaciones.cache_dashboard.time.sleep', side_effect=dormir) as sleep:
+            self.assertIsNone(_esperar('prueba'))
+
+        self.assertAlmostEqual(reloj[0], ESPERA_MAXIMA)
+        self.assertLessEqual(sleep.call_count, 10)
+
+    def test_espera_devuelve_la_entrada_guardada(self):
+        cache.set('prueba:calculando', True)
+        cache.set('prueba', {'total': 1})
+
+        self.assertEqual(_esperar('prueba'), {'total': 1})
+
+
+class CacheSeriesTests(TestCase):
+
+    @override_settings(DASHBOARD_CACHE_SEGUNDOS=300, DASHBOARD_CACHE_HISTORICO_SEGUNDOS=3600)
+    def test_intervalos_cerrados_expiran(self):
+        ayer, hoy = date(2026, 1, 1), date(2026, 1, 2)
+        with mock.patch('asignaciones.cache_dashboard.cache.set_many') as set_many:
+            obtener_intervalos('day', [(ayer, True), (hoy, False)], lambda inicios: dict.fromkeys(inicios, {}))
+
+        duraciones = sorted(duracion for (_, duracion), _ in set_many.call_args_list)
+        self.assertEqual(duraciones, [300, 3600])
+
+    def test_horas_locales_enteras_en_el_cambio_de_horario(self):
+        # En Chile el 2026-04-05 a las 00:00 se vuelve a las 23:00 del día anterior
+        inicios = intervalos('hour', date(2026, 4, 4), date(2026, 4, 5))
+
+        self.assertEqual(len(inicios), 49)
+        self.assertTrue(all(timezone.localtime(i).minute == 0 for i in inicios))
+
+    @override_settings(TIME_ZONE='Asia/Kolkata')
+    def test_por_hora_rechaza_desfases_fraccionarios(self):
+        with self.assertRaises(ValueError):
+            intervalos('hour', date(2026, 1, 1), date(2026, 1, 1))
+
+
+class DashboardConductoresTests(TestCase):
+    """El bloque por conductor del dashboard no hace consultas por conductor"""
+
+    def crear_conductores(self, desde, cantidad):
+        vehiculo = crear_vehiculo(f'CC{desde:04d}')
+        ayer = timezone.now() - timedelta(days=1)
+        for i in range(desde, desde + cantidad):
+            conductor = crear_conductor(f'L-{i}')
+            crear_asignacion(ayer, vehiculo=vehiculo, conductor=conductor, estado='completada',
+                             distancia_recorrida_km=10.0)
+            RegistroTurno.objects.create(conductor=conductor, tipo='entrada', fecha_hora=ayer)
+            RegistroTurno.objects.create(conductor=conductor, tipo='salida', fecha_hora=ayer + timedelta(hours=8))
+
+    def consultas_estadisticas(self):
+        hoy = timezone.localdate()
+        with CaptureQueriesContext(connection) as consultas:
+            datos = DashboardStatsView()._get_conductores_stats({'inicio': hoy, 'fin': hoy})
+        return len(consultas), datos
+
+    def test_consultas_no_crecen_con_los_conductores(self):
+        self.crear_conductores(0, 5)
+        consultas_n, datos = self.consultas_estadisticas()
+        self.assertEqual(len(datos['analisis_horarios']), 5)
+
+        self.crear_conductores(5, 5)
+        consultas_2n, datos = self.consultas_estadisticas()
+
+        self.assertEqual(len(datos['analisis_horarios']), 10)
+        self.assertEqual(consultas_2n, consultas_n)
+        self.assertLessEqual(consultas_n, 4)
+        viajes = datos['analisis_horarios'][0]['viajes']
+        self.assertEqual((viajes['total_viajes'], viajes['viajes_completados']), (1, 1))
+        self.assertEqual(datos['analisis_horarios'][0]['horarios']['total_horas'], 8.0)
+
+    def test_dias_trabajados_cuenta_dias_con_asignaciones(self):
+        conductor = crear_conductor('L-1')
+        ayer, anteayer = timezone.now() - timedelta(days=1), timezone.now() - timedelta(days=2)
+        crear_asignacion(ayer, conductor=conductor, estado='completada')
+        crear_asignacion(anteayer, conductor=conductor, estado='completada')
+        RegistroTurno.objects.create(conductor=conductor, tipo='entrada', fecha_hora=ayer)
+        RegistroTurno.objects.create(conductor=conductor, tipo='salida', fecha_hora=ayer + timedelta(hours=8))
+
+        _, datos = self.consultas_estadisticas()
+
+        horarios = datos['analisis_horarios'][0]['horarios']
+        self.assertEqual((horarios['dias_trabajados'], horarios['horas_promedio_dia']), (2, 4.0))
+        self.assertEqual((horarios['dias_con_turno'], horarios['horas_promedio_dia_turno']), (1, 8.0))
+
+
+class ExportacionTests(TestCase):
+    """La exportación en CSV y NDJSON tiene las mismas filas y columnas"""
+
+    url = '/api/asignaciones/exportar/'
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('despachador', password='clave'))
+        vehiculo = crear_vehiculo('AA1111')
+        conductor = crear_conductor('L-1')
+        inicio = inicio_dia(date(2026, 3, 10)) + timedelta(hours=8)
+        for i in range(7):
+            crear_asignacion(inicio + timedelta(hours=i), vehiculo=vehiculo, conductor=conductor,
+                             estado='completada' if i % 2 else 'cancelada',
+                             observaciones='Con "comillas", comas\ny saltos')
+
+    def descargar(self, **parametros):
+        respuesta = self.client.get(self.url, parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        return b''.join(respuesta.streaming_content).decode('utf-8')
+
+    @mock.patch('asignaciones.exportacion.FILAS_POR_FRAGMENTO', 2)
+    def test_csv_y_ndjson_coinciden(self):
+        filas = list(csv.reader(io.StringIO(self.descargar(formato='csv', estado='completada'))))
+        registros = [json.loads(linea) for linea in self.descargar(formato='ndjson', estado='completada').splitlines()]
+
+        columnas = [columna for columna, _ in COLUMNAS]
+        self.assertEqual(filas[0], columnas)
+        self.assertEqual(len(filas) - 1, Asignacion.objects.filter(estado='completada').count())
+        self.assertEqual(len(registros), len(filas) - 1)
+        for fila, registro in zip(filas[1:], registros):
+            self.assertEqual(list(registro), columnas)
+            for columna, valor in zip(columnas, fila):
+                if columna.startswith('fecha_'):
+                    # El JSON escribe UTC como 'Z'
+                    self.assertEqual(parse_datetime(valor), parse_datetime(registro[columna]))
+                else:
+                    self.assertEqual(valor, '' if registro[columna] is None else str(registro[columna]))
+        self.assertEqual(registros[0]['observaciones'], 'Con "comillas", comas\ny saltos')
+        self.assertEqual(registros[0]['vehiculo_patente'], 'AA1111')
+
+    def test_formato_desconocido(self):
+        respuesta = self.client.get(self.url, {'formato': 'xml'})
+
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class FiltrosFechaTests(TestCase):
+    """Filtros por día local como rango semiabierto, iguales a __date"""
+
+    def test_limites_del_dia_local(self):
+        dia = date(2026, 3, 10)
+        inicio = inicio_dia(dia)
+        dentro = [
+            crear_asignacion(inicio),
+            crear_asignacion(inicio + timedelta(hours=23, minutes=59, seconds=59)),
+        ]
+        crear_asignacion(inicio - timedelta(microseconds=1))
+        crear_asignacion(inicio + timedelta(days=1))
+
+        filtradas = AsignacionFilter(
+            {'fecha_hora_requerida_inicio__date': '2026-03-10'}, queryset=Asignacion.objects.all()
+        ).qs
+
+        self.assertEqual({a.pk for a in filtradas}, {a.pk for a in dentro})
+        self.assertEqual(
+            set(filtradas.values_list('pk', flat=True)),
+            set(Asignacion.objects.filter(fecha_hora_requerida_inicio__date=dia).values_list('pk', flat=True))
+        )
+        # Sin conversión de la columna, que impediría usar su índice
+        self.assertNotIn('cast', str(filtradas.query).lower())
+
+    def test_turnos_por_dia_local(self):
+        conductor = crear_conductor('L-1')
+        inicio = inicio_dia(date(2026, 3, 10))
+        dentro = RegistroTurno.objects.create(conductor=conductor, tipo='entrada', fecha_hora=inicio)
+        RegistroTurno.objects.create(conductor=conductor, tipo='salida', fecha_hora=inicio + timedelta(days=1))
+
+        filtrados = RegistroTurnoFilter({'fecha_hora__date': '2026-03-10'}, queryset=RegistroTurno.objects.all()).qs
+
+        self.assertEqual(list(filtrados), [dentro])
+
+    def test_dias_con_cambio_de_horario_duran_lo_que_duran(self):
+        # En Chile el 2026-04-04 tiene 25 horas y el 2026-09-06, 23 (restando
+        # en UTC: entre fechas de una misma zona Python resta la hora local)
+        for dia, horas in ((date(2026, 4, 4), 25), (date(2026, 9, 6), 23)):
+            inicio, fin = rango_dias(dia, dia)
+            duracion = fin.astimezone(dt_timezone.utc) - inicio.astimezone(dt_timezone.utc)
+            self.assertEqual(duracion, timedelta(hours=horas))
+
+
+class SeccionesDashboardTests(TestCase):
+    """?sections= limita el dashboard a las secciones pedidas, cada una con su caché"""
+
+    url = '/api/dashboard/stats/'
+
+    def test_solo_las_secciones_pedidas(self):
+        crear_asignacion(inicio_dia(date(2026, 3, 10)) + timedelta(hours=10), estado='completada')
+        parametros = {
+            'sections': 'general', 'tipo_periodo': 'custom', 'fecha_inicio': '2026-03-01', 'fecha_fin': '2026-03-31',
+        }
+
+        primera = self.client.get(self.url, parametros).json()
+        segunda = self.client.get(self.url, parametros).json()
+
+        self.assertEqual(set(primera), {'general', 'metadatos'})
+        self.assertEqual(primera['general']['total_asignaciones'], 1)
+        self.assertFalse(primera['metadatos']['secciones']['general']['desde_cache'])
+        self.assertTrue(segunda['metadatos']['secciones']['general']['desde_cache'])
+        self.assertEqual(segunda['general'], primera['general'])
+
+    def test_seccion_desconocida(self):
+        respuesta = self.client.get(self.url, {'sections': 'general,inexistente'})
+
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('inexistente', respuesta.json()['error'])
+
+    def test_secciones_sin_repetir_y_todas_por_defecto(self):
+        self.assertEqual(secciones_solicitadas(' mapa,general,mapa '), ['mapa', 'general'])
+        self.assertEqual(len(secciones_solicitadas(None)), 5)
+
+
+class EstadisticasGeneralesTests(TestCase):
+    """Las estadísticas generales desde el resumen diario cuadran con las filas"""
+
+    def test_totales_iguales_a_contar_las_asignaciones(self):
+        vehiculo = crear_vehiculo('AA1111')
+        crear_vehiculo('BB2222', estado='mantenimiento')
+        conductor = crear_conductor('L-1')
+        crear_conductor('L-2', estado_disponibilidad='dia_libre')
+        ayer = timezone.now() - timedelta(days=1)
+        crear_asignacion(ayer, vehiculo=vehiculo, conductor=conductor, estado='completada',
+                         distancia_recorrida_km=12.5)
+        crear_asignacion(ayer, vehiculo=vehiculo, estado='completada', distancia_recorrida_km=7.5)
+        crear_asignacion(ayer + timedelta(hours=3), estado='pendiente_auto')
+        crear_asignacion(timezone.now() - timedelta(days=30), vehiculo=vehiculo, estado='completada')
+        hoy = timezone.localdate()
+        fechas = {'inicio': hoy - timedelta(days=7), 'fin': hoy}
+
+        with CaptureQueriesContext(connection) as consultas:
+            datos = DashboardStatsView()._get_general_stats(fechas)
+
+        self.assertLessEqual(len(consultas), 3)
+        en_rango = Asignacion.objects.filter(
+            fecha_hora_requerida_inicio__gte=inicio_dia(fechas['inicio']),
+            fecha_hora_requerida_inicio__lt=inicio_dia(fechas['fin'] + timedelta(days=1)),
+        )
+        self.assertEqual(datos['total_asignaciones'], en_rango.count())
+        self.assertEqual(datos['asignaciones_completadas'], en_rango.filter(estado='completada').count())
+        self.assertEqual(datos['distancia_total_km'], 20.0)
+        self.assertAlmostEqual(
+            datos['distancia_estimada_pendiente_km'],
+            round(en_rango.get(estado='pendiente_auto').distancia_estimada_km, 2)
+        )
+        # "Sin asignar" cuenta como uno más, igual que values().distinct()
+        self.assertEqual(datos['vehiculos_utilizados'], en_rango.values('vehiculo').distinct().count())
+        self.assertEqual(datos['conductores_utilizados'], en_rango.values('conductor').distinct().count())
+        self.assertEqual(
+            (datos['vehiculos_disponibles'], datos['vehiculos_en_mantenimiento'], datos['total_vehiculos']), (1, 1, 2)
+        )
+        self.assertEqual((datos['conductores_disponibles'], datos['conductores_dia_libre']), (1, 1))
+
+
+class MapaCalorTests(TestCase):
+    """Celdas del mapa de calor agrupadas en la base"""
+
+    def setUp(self):
+        self.dia = date(2026, 3, 10)
+        self.inicio = inicio_dia(self.dia) + timedelta(hours=8)
+
+    def test_celdas_iguales_a_agrupar_en_python(self):
+        azar = random.Random(3)
+        puntos = []
+        for _ in range(40):
+            origen = (-33.45 + azar.uniform(-0.05, 0.05), -70.66 + azar.uniform(-0.05, 0.05))
+            destino = (-33.04 + azar.uniform(-0.05, 0.05), -71.55 + azar.uniform(-0.05, 0.05))
+            puntos.append((origen, destino))
+            crear_asignacion(self.inicio, origen_lat=origen[0], origen_lon=origen[1],
+                             destino_lat=destino[0], destino_lon=destino[1])
+        # Sin destino sólo cuenta el origen; fuera del período no cuenta
+        crear_asignacion(self.inicio, destino_lat=None, destino_lon=None)
+        puntos.append(((-33.45, -70.66), None))
+        crear_asignacion(self.inicio + timedelta(days=1))
+
+        celdas = celdas_mapa_calor(self.dia, self.dia, precision=2)
+
+        esperadas = defaultdict(lambda: {'origenes': 0, 'destinos': 0})
+        for origen, destino in puntos:
+            for nombre, punto in (('origenes', origen), ('destinos', destino)):
+                if punto is not None:
+                    # floor, no truncar: las coordenadas son negativas
+                    celda = (math.floor(punto[0] * 100), math.floor(punto[1] * 100))
+                    esperadas[celda][nombre] += 1
+        self.assertEqual(
+            {(round(c['lat'], 3), round(c['lon'], 3)): (c['origenes'], c['destinos']) for c in celdas},
+            {
+                (round((fila + 0.5) / 100, 3), round((columna + 0.5) / 100, 3)): (v['origenes'], v['destinos'])
+                for (fila, columna), v in esperadas.items()
+            }
+        )
+        self.assertEqual(sum(c['origenes'] for c in celdas), 41)
+        self.assertEqual(sum(c['destinos'] for c in celdas), 40)
+
+    def test_centro_de_la_celda_con_coordenadas_negativas(self):
+        crear_asignacion(self.inicio, origen_lat=-33.451, origen_lon=-70.659, destino_lat=None, destino_lon=None)
+
+        celda, = celdas_mapa_calor(self.dia, self.dia, precision=2)
+
+        self.assertEqual((celda['lat'], celda['lon'], celda['origenes']), (-33.455, -70.655, 1))
+
+    def test_vista_valida_la_precision_y_usa_el_cache(self):
+        crear_asignacion(self.inicio)
+        parametros = {'tipo_periodo': 'custom', 'fecha_inicio': '2026-03-01', 'fecha_fin': '2026-03-31'}
+
+        url = '/api/dashboard/mapa-calor/'
+
+        self.assertEqual(self.client.get(url, {**parametros, 'precision': 5}).status_code, 400)
+        primera = self.client.get(url, {**parametros, 'precision': 1}).json()
+        segunda = self.client.get(url, {**parametros, 'precision': 1}).json()
+
+        self.assertEqual(primera['metadatos']['total_celdas'], 2)
+        self.assertFalse(primera['metadatos']['desde_cache'])
+        self.assertTrue(segunda['metadatos']['desde_cache'])
+        self.assertEqual(segunda['celdas'], primera['celdas'])
+
+
+class ResumenDiarioTests(TestCase):
+    """El resumen mantenido por señales coincide con reconstruir_resumenes()"""
+
+    @staticmethod
+    def filas():
+        return sorted((
+            (r.fecha, r.vehiculo_id or 0, r.conductor_id or 0, r.estado, r.viajes,
+             round(r.distancia_km, 6), round(r.distancia_estimada_km, 6))
+            for r in ResumenDiario.objects.all() if r.viajes
+        ))
+
+    def assertIgualAReconstruido(self):
+        incremental = self.filas()
+        reconstruir_resumenes()
+        self.assertEqual(incremental, self.filas())
+
+    def test_crear_editar_cambiar_estado_y_eliminar(self):
+        vehiculo, conductor = crear_vehiculo('AA1111'), crear_conductor('L-1')
+        a = crear_asignacion(manana_a_las(10), vehiculo=vehiculo, estado='programada')
+        once_de_la_noche = inicio_dia(timezone.localdate() + timedelta(days=1)) + timedelta(hours=23)
+        b = crear_asignacion(once_de_la_noche, horas=3, distancia_recorrida_km=12.5)
+        self.assertIgualAReconstruido()
+
+        a.conductor = conductor
+        a.distancia_recorrida_km = 30.0
+        a.save()
+        b.fecha_hora_requerida_inicio += timedelta(hours=2)   # pasa al día siguiente
+        b.fecha_hora_fin_prevista += timedelta(hours=2)
+        b.save()
+        self.assertIgualAReconstruido()
+
+        cargada = Asignacion.objects.only('id', 'estado').get(pk=a.pk)
+        cargada.estado = 'completada'
+        cargada.save(update_fields=['estado'])
+        b.estado = 'cancelada'
+        b.distancia_recorrida_km = 99.0   # no se guarda
+        b.save(update_fields=['estado'])
+        self.assertIgualAReconstruido()
+
+        Asignacion.objects.get(pk=b.pk).delete()
+        a.refresh_from_db()
+        a.vehiculo = None
+        a.save()
+        self.assertIgualAReconstruido()
+
+    def test_una_fila_por_clave_al_eliminar_un_vehiculo(self):
+        uno, otro = crear_vehiculo('AA1111'), crear_vehiculo('BB2222')
+        crear_asignacion(manana_a_las(10), vehiculo=uno, estado='programada')
+        crear_asignacion(manana_a_las(13), vehiculo=otro, estado='programada')
+        crear_asignacion(manana_a_las(16), estado='programada')
+
+        uno.delete()
+        otro.delete()
+
+        fila = ResumenDiario.objects.get()
+        self.assertEqual((fila.vehiculo_id, fila.viajes), (None, 3))
+        self.assertIgualAReconstruido()
+
+    def test_guardar_no_consulta_el_aporte_anterior(self):
+        a = crear_asignacion(manana_a_las(10))
+        a = Asignacion.objects.get(pk=a.pk)
+        a.estado = 'cancelada'
+
+        with CaptureQueriesContext(connection) as consultas:
+            a.save()
+
+        tabla = Asignacion._meta.db_table
+        self.assertFalse([q for q in consultas if q['sql'].startswith('SELECT') and f'FROM "{tabla}"' in q['sql']])
+
+
+class ReservasConcurrentesTests(TransactionTestCase):
+    """
+    Varios lotes de asignación en hilos (con conexiones propias) más ediciones
+    de estado como las del admin: ningún vehículo puede quedar reservado dos
+    veces en franjas que se traslapan.
+    """
+    HILOS = 4
+    RONDAS = 3
+    SOLICITUDES = 30
+    VEHICULOS = 10
+
+    def setUp(self):
+        invalidar_snapshot()
+        self.addCleanup(invalidar_snapshot)
+        random.seed(42)
+        Vehiculo.objects.bulk_create([
+            Vehiculo(
+                marca='Stress', modelo='Test', patente=f'ST-{i:04d}',
+                capacidad_pasajeros=random.choice([4, 4, 8, 16]),
+            )
+            for i in range(self.VEHICULOS)
+        ])
+
+    @staticmethod
+    def reintentar(funcion):
+        # En SQLite la base de pruebas en memoria compartida responde
+        # 'table is locked' de inmediato en vez de esperar
+        while True:
+            try:
+                return funcion()
+            except OperationalError:
+                time.sleep(0.005)
+
+    def crear_solicitudes(self):
+        base = manana_a_las(7)
+        self.reintentar(lambda: Asignacion.objects.bulk_create([
+            Asignacion(
+                fecha_hora_requerida_inicio=inicio,
+                fecha_hora_fin_prevista=inicio + timedelta(minutes=random.randint(30, 180)),
+                req_pasajeros=random.randint(1, 8),
+                solicitante_jerarquia=random.randint(0, 3),
+                origen_lat=-33.04 + random.uniform(-0.1, 0.1),
+                origen_lon=-71.55 + random.uniform(-0.1, 0.1),
+                destino_lat=-33.04 + random.uniform(-0.3, 0.3),
+                destino_lon=-71.45 + random.uniform(-0.3, 0.3),
+            )
+            for inicio in (
+                base + timedelta(minutes=random.randint(0, 14 * 60)) for _ in range(self.SOLICITUDES)
+            )
+        ]))
+
+    def test_guardar_incrementa_la_version_sin_releerla(self):
+        vehiculo = Vehiculo.objects.first()
+        vehiculo.estado = 'mantenimiento'
+
+        with CaptureQueriesContext(connection) as consultas:
+            vehiculo.save(update_fields=['estado'])
+
+        tabla = Vehiculo._meta.db_table
+        self.assertFalse([q for q in consultas if q['sql'].startswith('SELECT') and tabla in q['sql']])
+        self.assertEqual(vehiculo.version, Vehiculo.objects.get(pk=vehiculo.pk).version)
+
+    def test_sin_dobles_reservas(self):
+        colocadas = defaultdict(list)    # asignacion_id -> [patente informada por cada hilo]
+        candado = threading.Lock()
+        detener = threading.Event()
+        fallos = []
+
+        def trabajador():
+            try:
+                while not detener.is_set():
+                    try:
+                        resultados = asignar_vehiculos_automatico_lote()
+                    except OperationalError:
+                        # SQLite devuelve 'database is locked' al agotar el timeout
+                        continue
+                    with candado:
+                        for r in resultados:
+                            if r['vehiculo_asignado']:
+                                colocadas[r['asignacion_id']].append(r['vehiculo_asignado'])
+                    if not resultados:
+                        time.sleep(0.005)
+            except Exception as e:
+                fallos.append(e)
+            finally:
+                connection.close()
+
+        def editor_admin():
+            # Simula ediciones de estado desde el list_editable del admin
+            try:
+                while not detener.is_set():
+                    vehiculo = self.reintentar(Vehiculo.objects.order_by('?').first)
+                    vehiculo.estado = 'mantenimiento'
+                    self.reintentar(vehiculo.save)
+                    vehiculo.estado = 'disponible'
+                    self.reintentar(vehiculo.save)
+                    time.sleep(0.01)
+            except Exception as e:
+                fallos.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajador) for _ in range(self.HILOS)]
+        hilos.append(threading.Thread(target=editor_admin))
+        for hilo in hilos:
+            hilo.start()
+        try:
+            for _ in range(self.RONDAS):
+                self.crear_solicitudes()
+                limite = time.monotonic() + 60
+                while self.reintentar(Asignacion.objects.filter(estado='pendiente_auto').exists):
+                    self.assertLess(time.monotonic(), limite, 'Los lotes no terminaron a tiempo')
+                    time.sleep(0.01)
+        finally:
+            detener.set()
+            for hilo in hilos:
+                hilo.join()
+
+        self.assertEqual(fallos, [])
+        self.assertTrue(colocadas)
+        # Cada solicitud fue colocada por una sola ejecución, con el vehículo persistido
+        persistidas = dict(
+            Asignacion.objects.filter(estado='programada').values_list('id', 'vehiculo__patente')
+        )
+        for asignacion_id, patentes in colocadas.items():
+            self.assertEqual(len(patentes), 1, f'Solicitud {asignacion_id} colocada {len(patentes)} veces')
+            self.assertEqual(persistidas.get(asignacion_id), patentes[0])
+        # Ningún vehículo con franjas traslapadas
+        franjas = defaultdict(list)
+        for asignacion in Asignacion.objects.filter(estado='programada'):
+            franjas[asignacion.vehiculo_id].append(franja_asignacion(asignacion))
+        for vehiculo_id, intervalos in franjas.items():
+            intervalos.sort()
+            for (_, fin_anterior), (inicio, _) in zip(intervalos, intervalos[1:]):
+                self.assertGreaterEqual(inicio, fin_anterior, f'Vehículo {vehiculo_id} reservado dos veces')
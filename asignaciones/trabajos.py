@@ -0,0 +1,144 @@
+# asignaciones/trabajos.py
+"""
+Cola de trabajos en base de datos para el lote de asignación automática.
+
+Un trabajo tomado queda 'en_proceso' y su worker renueva fecha_actualizacion
+(el latido) mientras lo ejecuta. Si el worker muere (p. ej. al reiniciarse el
+contenedor) el latido se detiene, y pasados TRABAJO_ASIGNACION_MINUTOS_SIN_LATIDO
+el trabajo vuelve a la cola; un lote largo con su worker vivo nunca se repite.
+Repetir un lote es seguro de todos modos: sólo toma solicitudes aún
+'pendiente_auto' y reserva los vehículos con compare-and-swap.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import TrabajoAsignacion
+from .perfiles import cargar_perfiles
+from .services import asignar_vehiculos_automatico_lote
+
+
+def encolar_trabajo(usuario=None, perfil=None):
+    """
+    Crea un trabajo pendiente y lo devuelve. `perfil` es el nombre del perfil
+    de scoring de la ejecución; lanza ValueError si no existe.
+    """
+    if perfil:
+        cargar_perfiles(perfil)
+    if usuario is not None and not usuario.is_authenticated:
+        usuario = None
+    return TrabajoAsignacion.objects.create(solicitado_por=usuario, perfil=perfil or '')
+
+
+def liberar_trabajos_vencidos():
+    """
+    Devuelve a 'pendiente' los trabajos 'en_proceso' cuyo latido se detuvo.
+    Devuelve la cantidad liberada.
+    """
+    limite = timezone.now() - timedelta(minutes=settings.TRABAJO_ASIGNACION_MINUTOS_SIN_LATIDO)
+    return TrabajoAsignacion.objects.filter(estado='en_proceso', fecha_actualizacion__lt=limite).update(
+        estado='pendiente', etapa='', fecha_inicio=None, fecha_actualizacion=None
+    )
+
+
+def _latir(pk, **campos):
+    """Renueva el latido de un trabajo en proceso, junto con `campos`"""
+    TrabajoAsignacion.objects.filter(pk=pk, estado='en_proceso').update(
+        fecha_actualizacion=timezone.now(), **campos
+    )
+
+
+@contextmanager
+def _latido(trabajo):
+    """
+    Renueva el latido cada TRABAJO_ASIGNACION_LATIDO_SEGUNDOS mientras dura el
+    bloque, desde un hilo aparte: el solver puede pasar minutos sin reportar
+    progreso.
+    """
+    detener = threading.Event()
+
+    def latir():
+        try:
+            while not detener.wait(settings.TRABAJO_ASIGNACION_LATIDO_SEGUNDOS):
+                _latir(trabajo.pk)
+        finally:
+            connection.close()
+
+    hilo = threading.Thread(target=latir, name=f'latido-trabajo-{trabajo.pk}', daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        detener.set()
+        hilo.join()
+
+
+def ejecutar_sin_cola(usuario=None, perfil=None):
+    """
+    Crea el trabajo ya 'en_proceso' y lo ejecuta en el momento, para
+    despliegues sin worker. Lanza ValueError si el perfil no existe.
+    """
+    trabajo = encolar_trabajo(usuario, perfil)
+    trabajo.estado = 'en_proceso'
+    trabajo.fecha_inicio = trabajo.fecha_actualizacion = timezone.now()
+    trabajo.save(update_fields=['estado', 'fecha_inicio', 'fecha_actualizacion'])
+    return ejecutar_trabajo(trabajo)
+
+
+def reclamar_trabajo():
+    """
+    Toma el trabajo pendiente más antiguo y lo marca 'en_proceso', tras
+    devolver a la cola los que quedaron huérfanos (liberar_trabajos_vencidos).
+
+    Usa SELECT ... FOR UPDATE SKIP LOCKED cuando el motor lo soporta, para que
+    varios workers no se bloqueen entre sí; en cualquier caso el cambio de
+    estado es un UPDATE condicionado, así que dos workers nunca toman el mismo
+    trabajo. Devuelve None si no hay trabajos pendientes.
+    """
+    liberar_trabajos_vencidos()
+    with transaction.atomic():
+        pendientes = TrabajoAsignacion.objects.filter(estado='pendiente').order_by('fecha_creacion', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            pendientes = pendientes.select_for_update(skip_locked=True)
+        trabajo = pendientes.first()
+        if trabajo is None:
+            return None
+        ahora = timezone.now()
+        tomado = TrabajoAsignacion.objects.filter(pk=trabajo.pk, estado='pendiente').update(
+            estado='en_proceso', fecha_inicio=ahora, fecha_actualizacion=ahora
+        )
+        if not tomado:
+            return None
+    trabajo.estado = 'en_proceso'
+    trabajo.fecha_inicio = trabajo.fecha_actualizacion = ahora
+    return trabajo
+
+
+def ejecutar_trabajo(trabajo):
+    """Corre el lote de asignación para un trabajo reclamado y guarda su resultado"""
+    def progreso(etapa, procesadas, total):
+        _latir(trabajo.pk, etapa=etapa, procesadas=procesadas, total=total)
+
+    try:
+        with _latido(trabajo):
+            resultados = asignar_vehiculos_automatico_lote(
+                progreso=progreso, perfil=trabajo.perfil or None
+            )
+    except Exception as e:
+        trabajo.estado = 'fallido'
+        trabajo.error = str(e)
+        trabajo.fecha_fin = timezone.now()
+        trabajo.save(update_fields=['estado', 'error', 'fecha_fin'])
+        raise
+
+    trabajo.estado = 'completado'
+    trabajo.etapa = 'completado'
+    trabajo.resultados = resultados
+    trabajo.total = trabajo.procesadas = len(resultados)
+    trabajo.fecha_fin = timezone.now()
+    trabajo.save(update_fields=['estado', 'etapa', 'resultados', 'total', 'procesadas', 'fecha_fin'])
+    return trabajo
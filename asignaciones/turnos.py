@@ -0,0 +1,114 @@
+# asignaciones/turnos.py
+"""
+Sesiones de turno a partir de las marcas de entrada/salida.
+
+Las marcas de cada conductor se recorren en orden: una entrada abre un
+turno (y deja sin salida al que siguiera abierto) y la siguiente salida lo
+cierra, aunque sea al día siguiente. Una salida sin turno abierto, o más de
+DURACION_MAXIMA después de la entrada, no se empareja. Como cada entrada
+reinicia el recorrido, al cambiar una marca basta con rehacer los turnos
+desde la última entrada anterior a ella (reparar_sesiones, llamado desde
+signals.py).
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import RegistroTurno, SesionTurno
+
+DURACION_MAXIMA = timedelta(hours=24)
+
+
+def _sesion(conductor_id, entrada):
+    return SesionTurno(
+        conductor_id=conductor_id, entrada_id=entrada.pk, fecha=timezone.localtime(entrada.fecha_hora).date(),
+        inicio=entrada.fecha_hora,
+    )
+
+
+def emparejar(conductor_id, marcas):
+    """SesionTurno sin guardar para las marcas (ordenadas) de un conductor"""
+    sesiones = []
+    abierta = None
+    for marca in marcas:
+        if marca.tipo == 'entrada':
+            abierta = _sesion(conductor_id, marca)
+            sesiones.append(abierta)
+        elif abierta is not None and marca.fecha_hora - abierta.inicio <= DURACION_MAXIMA:
+            abierta.salida_id = marca.pk
+            abierta.fin = marca.fecha_hora
+            abierta.horas = (marca.fecha_hora - abierta.inicio).total_seconds() / 3600
+            abierta = None
+    return sesiones
+
+
+def _marcas(conductor_id):
+    return RegistroTurno.objects.filter(conductor_id=conductor_id).only(
+        'pk', 'tipo', 'fecha_hora'
+    ).order_by('fecha_hora', 'pk')
+
+
+CAMPOS = ('conductor_id', 'salida_id', 'fecha', 'inicio', 'fin', 'horas')
+
+
+def reparar_sesiones(conductor_id, desde=None):
+    """
+    Rehace los turnos del conductor afectados por un cambio en sus marcas a
+    partir de `desde` (todos si se omite). Los turnos conservan su id
+    mientras no cambie su entrada. Devuelve la cantidad de turnos rehechos.
+    """
+    marcas = _marcas(conductor_id)
+    sesiones = SesionTurno.objects.filter(conductor_id=conductor_id)
+    if desde is not None:
+        ancla = marcas.filter(tipo='entrada', fecha_hora__lt=desde).order_by('-fecha_hora', '-pk').first()
+        if ancla is not None:
+            marcas = marcas.filter(fecha_hora__gte=ancla.fecha_hora)
+            sesiones = sesiones.filter(inicio__gte=ancla.fecha_hora)
+    with transaction.atomic():
+        existentes = {sesion.entrada_id: sesion for sesion in sesiones}
+        nuevas = emparejar(conductor_id, marcas)
+        crear, modificar = [], []
+        for nueva in nuevas:
+            actual = existentes.pop(nueva.entrada_id, None)
+            if actual is None:
+                crear.append(nueva)
+            elif any(getattr(actual, campo) != getattr(nueva, campo) for campo in CAMPOS):
+                for campo in CAMPOS:
+                    setattr(actual, campo, getattr(nueva, campo))
+                modificar.append(actual)
+        SesionTurno.objects.filter(pk__in=[sesion.pk for sesion in existentes.values()]).delete()
+        # Una salida puede pasar de un turno a otro: se sueltan antes de reasignarlas
+        SesionTurno.objects.filter(pk__in=[sesion.pk for sesion in modificar]).update(salida=None)
+        SesionTurno.objects.bulk_update(modificar, CAMPOS, batch_size=500)
+        SesionTurno.objects.bulk_create(crear, batch_size=1000)
+    return len(nuevas)
+
+
+def reconstruir_sesiones(conductor_ids=None):
+    """Rehace todos los turnos (de los conductores indicados). Devuelve la cantidad."""
+    if conductor_ids is None:
+        conductor_ids = RegistroTurno.objects.values_list('conductor_id', flat=True).distinct().order_by()
+    with transaction.atomic():
+        # Turnos cuyo conductor ya no coincide con el de su entrada
+        SesionTurno.objects.exclude(conductor_id=F('entrada__conductor_id')).delete()
+        return sum(reparar_sesiones(conductor_id) for conductor_id in list(conductor_ids))
+
+
+def horas_por_conductor(desde, hasta=None):
+    """
+    {conductor_id: {'horas', 'dias_con_turno', 'turnos'}} de los turnos
+    iniciados entre las fechas locales desde..hasta, en una consulta.
+    """
+    sesiones = SesionTurno.objects.filter(fecha__gte=desde)
+    if hasta is not None:
+        sesiones = sesiones.filter(fecha__lte=hasta)
+    return {
+        fila['conductor_id']: fila
+        for fila in sesiones.values('conductor_id').annotate(
+            horas=Sum('horas'),
+            dias_con_turno=Count('fecha', distinct=True),
+            turnos=Count('id'),
+        ).order_by()
+    }
@@ -6,9 +6,14 @@ from .views import (
     ConductorViewSet,
     AsignacionViewSet,
     RegistroTurnoViewSet,
+    TrabajoAsignacionViewSet,
+    MantenimientoViewSet,
+    SesionTurnoViewSet,
     CustomAuthToken,
     UserGroupView,
     DashboardStatsView,        # NUEVA
+    DashboardSeriesView,
+    DashboardMapaCalorView,
     DashboardRefreshCacheView  # NUEVA
 )
 
@@ -30,11 +35,16 @@ router.register(r'vehiculos', VehiculoViewSet)
 router.register(r'conductores', ConductorViewSet)
 router.register(r'asignaciones', AsignacionViewSet)
 router.register(r'registros-turno', RegistroTurnoViewSet, basename='registroturno')
+router.register(r'sesiones-turno', SesionTurnoViewSet)
+router.register(r'trabajos-asignacion', TrabajoAsignacionViewSet)
+router.register(r'mantenimientos', MantenimientoViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('get-token/', CustomAuthToken.as_view(), name='get-token'),
     path('user-groups/', UserGroupView.as_view(), name='user-groups'),
     path('dashboard/stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('dashboard/series/', DashboardSeriesView.as_view(), name='dashboard-series'),
+    path('dashboard/mapa-calor/', DashboardMapaCalorView.as_view(), name='dashboard-mapa-calor'),
     path('dashboard/refresh-cache/', DashboardRefreshCacheView.as_view(), name='dashboard-refresh-cache'),
 ]
\ No newline at end of file
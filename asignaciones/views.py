@@ -9,19 +9,34 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import IsAdminUser, AllowAny, IsAuthenticated
 from django.views.decorators.csrf import csrf_exempt
 import requests
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 
-from .models import Vehiculo, Conductor, Asignacion, RegistroTurno
+from .models import Vehiculo, Conductor, Asignacion, RegistroTurno, TrabajoAsignacion, ResumenDiario, Mantenimiento, SesionTurno
 from .serializers import (
     VehiculoSerializer,
     ConductorSerializer,
     AsignacionSerializer,
-    RegistroTurnoSerializer
+    RegistroTurnoSerializer,
+    TrabajoAsignacionSerializer,
+    MantenimientoSerializer,
+    SesionTurnoSerializer
 )
 
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
-from .services import asignar_vehiculos_automatico_lote
+from .trabajos import encolar_trabajo, ejecutar_sin_cola
+from .cache_dashboard import obtener_dashboard
+from .estadisticas import conteos_flota, resumen_asignaciones
+from .fechas import filtro_dias
+from .mantenimiento import UMBRALES_KM, anotar_urgencia, conteo_urgencias, porcentaje_recorrido, urgencia
+from .filters import AsignacionFilter, RegistroTurnoFilter
+from .exportacion import lineas_exportacion, FORMATOS
+from .series import serie_viajes
+from .mapa_calor import PRECISIONES, PRECISION_POR_DEFECTO, celdas_mapa_calor
+from .turnos import horas_por_conductor
+from .services import asignar_asignacion_incremental, ConflictoReserva
+from .planificacion import planificar_dia, aplicar_plan
+from django.conf import settings
 
 from rest_framework.views import APIView
 from rest_framework.filters import SearchFilter, OrderingFilter
@@ -67,7 +82,10 @@ class VehiculoViewSet(viewsets.ModelViewSet):
     # Asegúrate que estos campos coincidan con tu modelo Vehiculo actual
     filterset_fields = ['estado', 'marca', 'tipo_vehiculo', 'capacidad_pasajeros']
     search_fields = ['patente', 'modelo', 'marca', 'anio', 'numero_chasis', 'numero_motor'] # Añadidos campos buscables
-    ordering_fields = ['marca', 'modelo', 'capacidad_pasajeros', 'estado', 'tipo_vehiculo', 'anio'] # Añadido anio
+    ordering_fields = [
+        'marca', 'modelo', 'capacidad_pasajeros', 'estado', 'tipo_vehiculo', 'anio', # Añadido anio
+        'kilometraje', 'km_para_mantenimiento',
+    ]
 
 
 class ConductorViewSet(viewsets.ModelViewSet):
@@ -121,50 +139,141 @@ class RegistroTurnoViewSet(viewsets.ModelViewSet):
     serializer_class = RegistroTurnoSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
+    filterset_class = RegistroTurnoFilter
+
+
+class SesionTurnoViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint para consultar los turnos (entrada con su salida) de los
+    conductores. Se actualizan solos al registrar las marcas de turno.
+    """
+    queryset = SesionTurno.objects.all().order_by('-inicio')
+    serializer_class = SesionTurnoSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
     filterset_fields = {
         'conductor': ['exact'],
-        'fecha_hora': ['gte', 'lte', 'date'],
+        'fecha': ['exact', 'gte', 'lte'],
     }
 
 
+class MantenimientoViewSet(viewsets.ModelViewSet):
+    """
+    API endpoint para registrar los servicios de los vehículos. Cada cambio
+    recalcula el próximo mantenimiento del vehículo.
+    """
+    queryset = Mantenimiento.objects.all().select_related('vehiculo').order_by('-fecha', '-kilometraje')
+    serializer_class = MantenimientoSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['vehiculo', 'tipo']
+
+
+class TrabajoAsignacionViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint para consultar el progreso y resultado de los trabajos de
+    asignación automática encolados.
+    """
+    queryset = TrabajoAsignacion.objects.all().order_by('-fecha_creacion')
+    serializer_class = TrabajoAsignacionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['estado']
+
+
 class AsignacionViewSet(viewsets.ModelViewSet):
     queryset = Asignacion.objects.all().select_related('vehiculo', 'conductor').order_by('-fecha_hora_requerida_inicio')
     serializer_class = AsignacionSerializer
     permission_classes = [permissions.IsAuthenticated] # Cambiado para requerir autenticación para todas las acciones
 
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = {
-        'estado': ['exact'],
-        'vehiculo__patente': ['exact', 'icontains'], # Ajustado para buscar por patente
-        'conductor__apellido': ['exact', 'icontains'],
-        'fecha_hora_requerida_inicio': ['exact', 'gte', 'lte', 'date'],
-        'solicitante_nombre': ['icontains'], # Para buscar por nombre del solicitante
-        'solicitante_jerarquia': ['exact'], # Para filtrar por jerarquía
-    }
+    filterset_class = AsignacionFilter
     search_fields = ['destino_descripcion', 'vehiculo__patente', 'observaciones', 'solicitante_nombre']
     ordering_fields = ['fecha_hora_requerida_inicio', 'fecha_hora_fin_prevista', 'estado', 'solicitante_jerarquia'] # 'tipo_servicio' ELIMINADO
 
+    def perform_create(self, serializer):
+        asignacion = serializer.save()
+        # Las solicitudes automáticas se intentan asignar en el momento
+        if settings.ASIGNACION_INCREMENTAL and asignacion.estado == 'pendiente_auto' and asignacion.vehiculo_id is None:
+            asignar_asignacion_incremental(asignacion)
+
     @action(detail=False, methods=['post'], url_path='asignar-vehiculos-auto-lote', permission_classes=[AllowAny])
     def asignar_vehiculos_auto_lote(self, request):
-        resultados = asignar_vehiculos_automatico_lote()
-        return Response({'resultados': resultados})
-    @action(detail=False, methods=['get'], url_path='estado-disponibilidad-conductores')
-    def estado_disponibilidad_conductores(self, request):
         """
-        Devuelve el estado de disponibilidad de todos los conductores.
+        Encola el lote de asignación automática y responde de inmediato con el
+        id del trabajo; el progreso se consulta en /trabajos-asignacion/<id>/.
+        Sin worker (ASIGNACION_LOTE_EN_COLA = False) lo ejecuta en el momento y
+        responde con los resultados.
+        Acepta opcionalmente 'perfil' con el nombre del perfil de scoring.
         """
-        conductores = Conductor.objects.all().order_by('apellido', 'nombre')
-        serializer = ConductorSerializer(conductores, many=True)
-        return Response(serializer.data)
+        perfil = request.data.get('perfil')
+        try:
+            if settings.ASIGNACION_LOTE_EN_COLA:
+                trabajo = encolar_trabajo(request.user, perfil=perfil)
+            else:
+                trabajo = ejecutar_sin_cola(request.user, perfil=perfil)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if trabajo.estado == 'pendiente':
+            return Response(
+                {'trabajo_id': trabajo.id, 'estado': trabajo.estado},
+                status=status.HTTP_202_ACCEPTED
+            )
+        return Response({'trabajo_id': trabajo.id, 'estado': trabajo.estado, 'resultados': trabajo.resultados})
 
-    
-    search_fields = ['destino_descripcion', 'vehiculo__patente', 'observaciones', 'solicitante_nombre']
-    ordering_fields = ['fecha_hora_requerida_inicio', 'fecha_hora_fin_prevista', 'estado', 'solicitante_jerarquia'] # 'tipo_servicio' ELIMINADO
+    @action(detail=False, methods=['get', 'post'], url_path='plan-dia')
+    def plan_dia(self, request):
+        """
+        Planifica por recorridos los viajes de una fecha (?fecha=YYYY-MM-DD o
+        'fecha' en el cuerpo; por defecto hoy). Los viajes ya programados
+        quedan en su vehículo salvo con 'replanificar_programadas=true'. GET
+        sólo devuelve el plan; POST además lo guarda. Responde 409 si los
+        viajes o vehículos cambiaron mientras se guardaba.
+        """
+        datos = request.data if request.method == 'POST' else request.query_params
+        try:
+            fecha = datetime.strptime(datos['fecha'], '%Y-%m-%d').date() if datos.get('fecha') else timezone.localdate()
+            limite = float(datos.get('limite_segundos', 3))
+        except ValueError:
+            return Response(
+                {'error': "Parámetros inválidos: 'fecha' debe ser YYYY-MM-DD y 'limite_segundos' un número."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        replanificar = str(datos.get('replanificar_programadas', '')).lower() in ('1', 'true')
+        plan = planificar_dia(
+            fecha, limite_segundos=min(max(limite, 0.1), 30), replanificar_programadas=replanificar
+        )
+        respuesta = plan.como_dict()
+        if request.method == 'POST':
+            try:
+                respuesta['viajes_actualizados'] = aplicar_plan(plan)
+            except ConflictoReserva:
+                return Response(
+                    {'error': 'Los viajes o vehículos cambiaron mientras se guardaba el plan; vuelva a planificar.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+        return Response(respuesta)
+
+    @action(detail=False, methods=['get'], url_path='exportar')
+    def exportar(self, request):
+        """
+        Descarga el historial completo (sin paginar) en ?formato=csv (por
+        defecto) o ndjson, con los mismos filtros, búsqueda y orden del listado.
+        Se envía a medida que se lee de la base.
+        """
+        formato = request.query_params.get('formato', 'csv')
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            lineas = lineas_exportacion(queryset, formato)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        tipo_contenido, extension = FORMATOS[formato]
+        respuesta = StreamingHttpResponse(lineas, content_type=tipo_contenido)
+        respuesta['Content-Disposition'] = (
+            f'attachment; filename="asignaciones_{timezone.localdate():%Y%m%d}.{extension}"'
+        )
+        return respuesta
 
-    @action(detail=False, methods=['post'], url_path='asignar-vehiculos-auto-lote', permission_classes=[AllowAny])
-    def asignar_vehiculos_auto_lote(self, request):
-        resultados = asignar_vehiculos_automatico_lote()
-        return Response({'resultados': resultados})
     @action(detail=False, methods=['get'], url_path='estado-disponibilidad-conductores')
     def estado_disponibilidad_conductores(self, request):
         """
@@ -174,14 +283,43 @@ class AsignacionViewSet(viewsets.ModelViewSet):
         serializer = ConductorSerializer(conductores, many=True)
         return Response(serializer.data)
 
+
 # Código a agregar al final de asignaciones/views.py
 
 from django.db.models import Count, Sum, Avg, Q, F
+from django.db.models.functions import Coalesce
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from django.db import close_old_connections
+
+SECCIONES_DASHBOARD = ('general', 'vehiculos', 'conductores', 'mapa', 'tendencias')
+
+# Pool compartido por todas las peticiones: acota las conexiones simultáneas
+_ejecutor_dashboard = ThreadPoolExecutor(
+    max_workers=settings.DASHBOARD_HILOS, thread_name_prefix='dashboard'
+)
+
+
+def secciones_solicitadas(parametro):
+    """Secciones de ?sections=a,b (todas si falta); ValueError si alguna no existe"""
+    if not parametro:
+        return list(SECCIONES_DASHBOARD)
+    secciones = list(dict.fromkeys(s.strip() for s in parametro.split(',') if s.strip()))
+    desconocidas = [s for s in secciones if s not in SECCIONES_DASHBOARD]
+    if desconocidas or not secciones:
+        raise ValueError(
+            f"Secciones desconocidas: {', '.join(desconocidas)}. "
+            f"Opciones: {', '.join(SECCIONES_DASHBOARD)}."
+        )
+    return secciones
+
 
 class DashboardStatsView(APIView):
     """
-    Vista principal para obtener todas las estadísticas del dashboard
+    Vista principal para obtener todas las estadísticas del dashboard.
+    ?sections=general,mapa limita la respuesta a esas secciones.
     """
     
     def get(self, request):
@@ -191,18 +329,25 @@ class DashboardStatsView(APIView):
             fecha_inicio = request.GET.get('fecha_inicio')
             fecha_fin = request.GET.get('fecha_fin')
             
+            try:
+                secciones = secciones_solicitadas(request.GET.get('sections'))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
             # Calcular fechas basadas en el período
             fechas = self._calcular_fechas(tipo_periodo, fecha_inicio, fecha_fin)
             
-            # Obtener datos para el dashboard
+            # Obtener las secciones pedidas (desde el caché si están vigentes)
+            resultados = self.obtener_secciones(tipo_periodo, fechas, secciones)
             data = {
-                'general': self._get_general_stats(fechas),
-                'vehiculos': self._get_vehiculos_stats(fechas),
-                'conductores': self._get_conductores_stats(fechas),
-                'mapa': self._get_mapa_stats(fechas),
-                'tendencias': self._get_tendencias(fechas),
+                **{seccion: resultado['datos'] for seccion, resultado in resultados.items()},
                 'metadatos': {
-                    'fecha_generacion': timezone.now().isoformat(),
+                    'fecha_generacion': min(r['fecha_generacion'] for r in resultados.values()),
+                    'desde_cache': all(r['desde_cache'] for r in resultados.values()),
+                    'secciones': {
+                        seccion: {'tiempo_ms': r['tiempo_ms'], 'desde_cache': r['desde_cache']}
+                        for seccion, r in resultados.items()
+                    },
                     'filtros_aplicados': {
                         'tipo_periodo': tipo_periodo,
                         'fecha_inicio': fecha_inicio,
@@ -223,6 +368,50 @@ class DashboardStatsView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def obtener_secciones(self, tipo_periodo, fechas, secciones, forzar=False):
+        """
+        {sección: {'datos', 'fecha_generacion', 'desde_cache', 'tiempo_ms'}}.
+        Con más de una sección se calculan en paralelo en el pool de hilos,
+        cada una con su propia conexión a la base.
+        """
+        calculos = {
+            'general': self._get_general_stats,
+            'vehiculos': self._get_vehiculos_stats,
+            'conductores': self._get_conductores_stats,
+            'mapa': self._get_mapa_stats,
+            'tendencias': self._get_tendencias,
+        }
+        
+        def obtener(seccion):
+            inicio = time.perf_counter()
+            entrada, desde_cache = obtener_dashboard(
+                tipo_periodo, fechas['inicio'], fechas['fin'], seccion,
+                lambda: {
+                    'datos': calculos[seccion](fechas),
+                    'fecha_generacion': timezone.now().isoformat(),
+                },
+                forzar=forzar
+            )
+            return {
+                **entrada,
+                'desde_cache': desde_cache,
+                'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 1),
+            }
+        
+        if len(secciones) == 1:
+            return {secciones[0]: obtener(secciones[0])}
+        
+        def en_hilo(seccion):
+            try:
+                return obtener(seccion)
+            finally:
+                # La conexión de este hilo se cierra según CONN_MAX_AGE
+                close_old_connections()
+        
+        futuros = {seccion: _ejecutor_dashboard.submit(en_hilo, seccion) for seccion in secciones}
+        return {seccion: futuro.result() for seccion, futuro in futuros.items()}
+    
+    
     def _calcular_fechas(self, tipo_periodo, fecha_inicio, fecha_fin):
         """Calcula las fechas de inicio y fin basadas en el tipo de período"""
         hoy = timezone.now().date()
@@ -255,42 +444,24 @@ class DashboardStatsView(APIView):
     
     def _get_general_stats(self, fechas):
         """Obtiene estadísticas generales del sistema"""
-        # Filtrar asignaciones del período
-        asignaciones = Asignacion.objects.filter(
-            fecha_hora_requerida_inicio__date__range=[fechas['inicio'], fechas['fin']]
-        )
-        
-        # Conteos totales
-        vehiculos_total = Vehiculo.objects.count()
-        conductores_total = Conductor.objects.count()
+        # Una consulta agregada por tabla: resumen diario, vehículos y conductores
+        asignaciones = resumen_asignaciones(fechas['inicio'], fechas['fin'])
+        flota = conteos_flota()
+        vehiculos = flota['vehiculos']
+        conductores = flota['conductores']
         
         # Estadísticas de asignaciones
-        total_asignaciones = asignaciones.count()
-        asignaciones_completadas = asignaciones.filter(estado='completada').count()
-        asignaciones_activas = asignaciones.filter(estado='activa').count()
-        asignaciones_programadas = asignaciones.filter(estado='programada').count()
+        total_asignaciones = asignaciones['total']
+        asignaciones_completadas = asignaciones['completada']
+        asignaciones_activas = asignaciones['activa']
+        asignaciones_programadas = asignaciones['programada']
         
         # Calcular tasa de completitud
         tasa_completitud = self._calcular_porcentaje(asignaciones_completadas, total_asignaciones)
         
-        # Distancia total recorrida
-        distancia_total_km = asignaciones.aggregate(
-            total=Sum('distancia_recorrida_km')
-        )['total'] or 0
-        
-        # Vehículos utilizados y disponibles
-        vehiculos_utilizados = asignaciones.values('vehiculo').distinct().count()
-        vehiculos_disponibles = Vehiculo.objects.filter(estado='disponible').count()
-        vehiculos_en_mantenimiento = Vehiculo.objects.filter(estado='mantenimiento').count()
-        vehiculos_en_uso = Vehiculo.objects.filter(estado='en_uso').count()
-        vehiculos_reservados = Vehiculo.objects.filter(estado='reservado').count()
-        
-        # Conductores utilizados y disponibles
-        conductores_utilizados = asignaciones.values('conductor').distinct().count()
-        conductores_disponibles = Conductor.objects.filter(estado_disponibilidad='disponible').count()
-        conductores_en_ruta = Conductor.objects.filter(estado_disponibilidad='en_ruta').count()
-        conductores_dia_libre = Conductor.objects.filter(estado_disponibilidad='dia_libre').count()
-        conductores_no_disponibles = Conductor.objects.filter(estado_disponibilidad='no_disponible').count()
+        # Distancia total recorrida y estimada de los viajes aún no realizados
+        distancia_total_km = asignaciones['distancia_km']
+        distancia_estimada_pendiente_km = asignaciones['distancia_estimada_pendiente_km']
         
         return {
             'total_asignaciones': total_asignaciones,
@@ -299,18 +470,19 @@ class DashboardStatsView(APIView):
             'asignaciones_programadas': asignaciones_programadas,
             'tasa_completitud': tasa_completitud,
             'distancia_total_km': round(distancia_total_km, 2),
-            'vehiculos_utilizados': vehiculos_utilizados,
-            'vehiculos_disponibles': vehiculos_disponibles,
-            'vehiculos_en_mantenimiento': vehiculos_en_mantenimiento,
-            'vehiculos_en_uso': vehiculos_en_uso,
-            'vehiculos_reservados': vehiculos_reservados,
-            'conductores_utilizados': conductores_utilizados,
-            'conductores_disponibles': conductores_disponibles,
-            'conductores_en_ruta': conductores_en_ruta,
-            'conductores_dia_libre': conductores_dia_libre,
-            'conductores_no_disponibles': conductores_no_disponibles,
-            'total_vehiculos': vehiculos_total,
-            'total_conductores': conductores_total
+            'distancia_estimada_pendiente_km': round(distancia_estimada_pendiente_km, 2),
+            'vehiculos_utilizados': asignaciones['vehiculos_utilizados'],
+            'vehiculos_disponibles': vehiculos['disponible'],
+            'vehiculos_en_mantenimiento': vehiculos['mantenimiento'],
+            'vehiculos_en_uso': vehiculos['en_uso'],
+            'vehiculos_reservados': vehiculos['reservado'],
+            'conductores_utilizados': asignaciones['conductores_utilizados'],
+            'conductores_disponibles': conductores['disponible'],
+            'conductores_en_ruta': conductores['en_ruta'],
+            'conductores_dia_libre': conductores['dia_libre'],
+            'conductores_no_disponibles': conductores['no_disponible'],
+            'total_vehiculos': vehiculos['total'],
+            'total_conductores': conductores['total']
         }
     
     def _get_vehiculos_stats(self, fechas):
@@ -323,64 +495,41 @@ class DashboardStatsView(APIView):
         # Distribución por tipo de vehículo
         distribucion_tipo = list(vehiculos.values('tipo_vehiculo').annotate(count=Count('id')))
         
-        # Análisis de mantenimiento basado en kilometraje
-        vehiculos_mantenimiento = []
-        estadisticas_mantenimiento = {
-            'criticos': 0,
-            'urgentes': 0,
-            'proximos': 0,
-            'ok': 0,
-            'menor_urgente': 0
-        }
-        
-        for vehiculo in vehiculos:
-            km_actual = vehiculo.kilometraje or 0
-            km_mantenimiento = 10000  # Cada 10,000 km
-            km_desde_ultimo = km_actual % km_mantenimiento
-            km_restantes = km_mantenimiento - km_desde_ultimo
-            porcentaje = (km_desde_ultimo / km_mantenimiento) * 100
-            
-            # Determinar urgencia
-            if porcentaje >= 95:
-                urgencia = 'critico'
-                estadisticas_mantenimiento['criticos'] += 1
-            elif porcentaje >= 90:
-                urgencia = 'urgente'
-                estadisticas_mantenimiento['urgentes'] += 1
-            elif porcentaje >= 80:
-                urgencia = 'proximo'
-                estadisticas_mantenimiento['proximos'] += 1
-            else:
-                urgencia = 'ok'
-                estadisticas_mantenimiento['ok'] += 1
-            
-            if urgencia != 'ok':
-                vehiculos_mantenimiento.append({
-                    'id': vehiculo.id,
-                    'patente': vehiculo.patente,
-                    'marca': vehiculo.marca,
-                    'modelo': vehiculo.modelo,
-                    'kilometraje': km_actual,
-                    'km_restantes': km_restantes,
-                    'porcentaje': round(porcentaje, 1),
-                    'urgencia': urgencia,
-                    'proximo_mantenimiento_km': km_actual + km_restantes
-                })
-        
+        # Mantenimiento según los km que faltan, guardados e indexados en el vehículo
+        estadisticas_mantenimiento = conteo_urgencias(vehiculos)
         estadisticas_mantenimiento['menor_urgente'] = estadisticas_mantenimiento['ok']
         
+        vehiculos_mantenimiento = [
+            {
+                'id': vehiculo['id'],
+                'patente': vehiculo['patente'],
+                'marca': vehiculo['marca'],
+                'modelo': vehiculo['modelo'],
+                'kilometraje': vehiculo['kilometraje'],
+                'km_restantes': vehiculo['km_para_mantenimiento'],
+                'porcentaje': round(vehiculo['porcentaje_mantenimiento'], 1),
+                'urgencia': vehiculo['urgencia_mantenimiento'],
+                'proximo_mantenimiento_km': vehiculo['proximo_mantenimiento_km']
+            }
+            for vehiculo in anotar_urgencia(
+                vehiculos.filter(km_para_mantenimiento__lte=UMBRALES_KM[-1][1])
+            ).order_by('km_para_mantenimiento').values(
+                'id', 'patente', 'marca', 'modelo', 'kilometraje', 'km_para_mantenimiento',
+                'proximo_mantenimiento_km', 'porcentaje_mantenimiento', 'urgencia_mantenimiento'
+            )
+        ]
+        
         # Uso por vehículo en el período
-        asignaciones = Asignacion.objects.filter(
-            fecha_hora_requerida_inicio__date__range=[fechas['inicio'], fechas['fin']]
-        )
+        asignaciones = self._resumenes(fechas['inicio'], fechas['fin'])
         
         uso_por_vehiculo = list(
             asignaciones.values('vehiculo__id', 'vehiculo__patente')
             .annotate(
-                total_viajes=Count('id'),
-                distancia_total=Sum('distancia_recorrida_km')
+                total_viajes=Sum('viajes'),
+                distancia_total=Sum('distancia_km')
             )
             .filter(vehiculo__isnull=False)
+            .order_by()
         )
         
         # Lista detallada de vehículos
@@ -406,9 +555,7 @@ class DashboardStatsView(APIView):
         
         # Análisis de horarios en los últimos 30 días
         fecha_analisis = timezone.now().date() - timedelta(days=30)
-        asignaciones_recientes = Asignacion.objects.filter(
-            fecha_hora_requerida_inicio__date__gte=fecha_analisis
-        )
+        asignaciones_recientes = ResumenDiario.objects.filter(fecha__gte=fecha_analisis)
         
         # Análisis detallado por conductor
         analisis_horarios = []
@@ -425,18 +572,38 @@ class DashboardStatsView(APIView):
         total_horas_flota = 0
         total_eficiencia_flota = 0
         
+        # Totales de todos los conductores en una sola consulta agrupada
+        totales_por_conductor = {
+            fila['conductor']: fila
+            for fila in asignaciones_recientes.filter(conductor__isnull=False)
+            .values('conductor')
+            .annotate(
+                dias_trabajados=Count('fecha', distinct=True),
+                total_viajes=Sum('viajes'),
+                viajes_completados=Coalesce(Sum('viajes', filter=Q(estado='completada')), 0),
+                distancia_total=Sum('distancia_km'),
+            )
+            .order_by()
+        }
+        sin_viajes = {'dias_trabajados': 0, 'total_viajes': 0, 'viajes_completados': 0, 'distancia_total': 0}
+        
+        # Horas reales de los turnos (entrada/salida) iniciados en el mismo lapso
+        turnos_por_conductor = horas_por_conductor(fecha_analisis)
+        sin_turnos = {'horas': 0, 'dias_con_turno': 0}
+        
         for conductor in conductores:
-            asignaciones_conductor = asignaciones_recientes.filter(conductor=conductor)
+            totales = totales_por_conductor.get(conductor.id, sin_viajes)
+            turnos = turnos_por_conductor.get(conductor.id, sin_turnos)
             
-            # Calcular días trabajados
-            dias_trabajados = asignaciones_conductor.values(
-                'fecha_hora_requerida_inicio__date'
-            ).distinct().count()
+            # Días con asignaciones, y aparte días con al menos un turno iniciado
+            dias_trabajados = totales['dias_trabajados']
+            dias_con_turno = turnos['dias_con_turno']
             
-            # Estimar horas trabajadas (4 horas promedio por asignación)
-            total_asignaciones = asignaciones_conductor.count()
-            horas_totales = total_asignaciones * 4
-            horas_promedio_dia = horas_totales / max(dias_trabajados, 1) if dias_trabajados > 0 else 0
+            # Horas trabajadas según los turnos cerrados, por día con asignaciones
+            total_asignaciones = totales['total_viajes']
+            horas_totales = turnos['horas'] or 0
+            horas_promedio_dia = horas_totales / dias_trabajados if dias_trabajados > 0 else 0
+            horas_promedio_turno = horas_totales / dias_con_turno if dias_con_turno > 0 else 0
             
             # Determinar estado de trabajo
             if horas_promedio_dia >= 7:
@@ -456,14 +623,12 @@ class DashboardStatsView(APIView):
                 estadisticas_horarios['activos'] += 1
             
             # Calcular eficiencia de viajes
-            viajes_totales = asignaciones_conductor.count()
-            viajes_completados = asignaciones_conductor.filter(estado='completada').count()
+            viajes_totales = total_asignaciones
+            viajes_completados = totales['viajes_completados']
             tasa_completitud = self._calcular_porcentaje(viajes_completados, viajes_totales)
             
             # Calcular distancia total
-            distancia_total = asignaciones_conductor.aggregate(
-                total=Sum('distancia_recorrida_km')
-            )['total'] or 0
+            distancia_total = totales['distancia_total'] or 0
             
             # Porcentaje de actividad (basado en horas trabajadas vs 8 horas)
             porcentaje_actividad = min(100, (horas_promedio_dia / 8) * 100) if horas_promedio_dia > 0 else 0
@@ -479,7 +644,9 @@ class DashboardStatsView(APIView):
                 'horarios': {
                     'dias_trabajados': dias_trabajados,
                     'horas_promedio_dia': round(horas_promedio_dia, 1),
-                    'total_horas': horas_totales,
+                    'dias_con_turno': dias_con_turno,
+                    'horas_promedio_dia_turno': round(horas_promedio_turno, 1),
+                    'total_horas': round(horas_totales, 1),
                     'estado_trabajo': estado_trabajo,
                     'porcentaje_actividad': round(porcentaje_actividad, 1)
                 },
@@ -510,7 +677,7 @@ class DashboardStatsView(APIView):
     def _get_mapa_stats(self, fechas):
         """Obtiene estadísticas para el componente de mapa"""
         asignaciones = Asignacion.objects.filter(
-            fecha_hora_requerida_inicio__date__range=[fechas['inicio'], fechas['fin']]
+            **filtro_dias('fecha_hora_requerida_inicio', fechas['inicio'], fechas['fin'])
         )
         
         # Contar asignaciones con coordenadas
@@ -519,10 +686,10 @@ class DashboardStatsView(APIView):
             Q(destino_lat__isnull=True) | Q(destino_lon__isnull=True)
         ).count()
         
-        # Calcular distancia total
-        distancia_total = asignaciones.aggregate(
-            total=Sum('distancia_recorrida_km')
-        )['total'] or 0
+        # Total de viajes y distancia desde el resumen diario
+        resumenes = self._resumenes(fechas['inicio'], fechas['fin'])
+        total_rutas = self._sumar_viajes(resumenes)
+        distancia_total = resumenes.aggregate(total=Sum('distancia_km'))['total'] or 0
         
         # Contar zonas activas (destinos únicos)
         zonas_activas = asignaciones.values('destino_descripcion').distinct().count()
@@ -531,7 +698,7 @@ class DashboardStatsView(APIView):
         vehiculos_en_ruta = Conductor.objects.filter(estado_disponibilidad='en_ruta').count()
         
         return {
-            'total_rutas': asignaciones.count(),
+            'total_rutas': total_rutas,
             'distancia_total': round(distancia_total, 2),
             'zonas_activas': zonas_activas,
             'vehiculos_en_ruta': vehiculos_en_ruta,
@@ -557,31 +724,25 @@ class DashboardStatsView(APIView):
         fecha_inicio_anterior = fechas['inicio'] - duracion - timedelta(days=1)
         fecha_fin_anterior = fechas['inicio'] - timedelta(days=1)
         
-        # Asignaciones período actual
-        asignaciones_actuales = Asignacion.objects.filter(
-            fecha_hora_requerida_inicio__date__range=[fechas['inicio'], fechas['fin']]
-        )
-        
-        # Asignaciones período anterior
-        asignaciones_anteriores = Asignacion.objects.filter(
-            fecha_hora_requerida_inicio__date__range=[fecha_inicio_anterior, fecha_fin_anterior]
-        )
+        # Resumen diario del período actual y del anterior
+        asignaciones_actuales = self._resumenes(fechas['inicio'], fechas['fin'])
+        asignaciones_anteriores = self._resumenes(fecha_inicio_anterior, fecha_fin_anterior)
         
         # Contar asignaciones
-        count_actual = asignaciones_actuales.count()
-        count_anterior = asignaciones_anteriores.count()
+        count_actual = self._sumar_viajes(asignaciones_actuales)
+        count_anterior = self._sumar_viajes(asignaciones_anteriores)
         
         # Calcular distancia
         distancia_actual = asignaciones_actuales.aggregate(
-            total=Sum('distancia_recorrida_km')
+            total=Sum('distancia_km')
         )['total'] or 0
         distancia_anterior = asignaciones_anteriores.aggregate(
-            total=Sum('distancia_recorrida_km')
+            total=Sum('distancia_km')
         )['total'] or 0
         
         # Calcular eficiencia (tasa de completitud)
-        completadas_actual = asignaciones_actuales.filter(estado='completada').count()
-        completadas_anterior = asignaciones_anteriores.filter(estado='completada').count()
+        completadas_actual = self._sumar_viajes(asignaciones_actuales.filter(estado='completada'))
+        completadas_anterior = self._sumar_viajes(asignaciones_anteriores.filter(estado='completada'))
         
         eficiencia_actual = self._calcular_porcentaje(completadas_actual, count_actual)
         eficiencia_anterior = self._calcular_porcentaje(completadas_anterior, count_anterior)
@@ -597,22 +758,8 @@ class DashboardStatsView(APIView):
         vehiculos_detallados = []
         
         for vehiculo in vehiculos:
-            # Calcular estado de mantenimiento
-            km_actual = vehiculo.kilometraje or 0
-            km_mantenimiento = 10000
-            km_desde_ultimo = km_actual % km_mantenimiento
-            km_restantes = km_mantenimiento - km_desde_ultimo
-            porcentaje = (km_desde_ultimo / km_mantenimiento) * 100
-            
-            # Determinar estado
-            if porcentaje >= 95:
-                estado_mantenimiento = 'critico'
-            elif porcentaje >= 90:
-                estado_mantenimiento = 'urgente'
-            elif porcentaje >= 80:
-                estado_mantenimiento = 'proximo'
-            else:
-                estado_mantenimiento = 'ok'
+            # Próximo mantenimiento ya calculado al guardar el vehículo
+            km_restantes = vehiculo.km_para_mantenimiento
             
             vehiculos_detallados.append({
                 'id': vehiculo.id,
@@ -623,17 +770,25 @@ class DashboardStatsView(APIView):
                 'tipo_vehiculo': vehiculo.tipo_vehiculo,
                 'capacidad_pasajeros': vehiculo.capacidad_pasajeros,
                 'estado': vehiculo.estado,
-                'kilometraje': km_actual,
+                'kilometraje': vehiculo.kilometraje,
                 'mantenimiento': {
-                    'estado': estado_mantenimiento,
-                    'proximo_mantenimiento_km': km_actual + km_restantes,
+                    'estado': urgencia(km_restantes),
+                    'proximo_mantenimiento_km': vehiculo.proximo_mantenimiento_km,
                     'km_restantes': km_restantes,
-                    'porcentaje': round(porcentaje, 1)
+                    'porcentaje': porcentaje_recorrido(km_restantes)
                 }
             })
         
         return vehiculos_detallados
     
+    def _resumenes(self, inicio, fin):
+        """Filas del resumen diario entre dos fechas (inclusive)"""
+        return ResumenDiario.objects.filter(fecha__range=[inicio, fin])
+    
+    def _sumar_viajes(self, resumenes):
+        """Cantidad de asignaciones que suman las filas del resumen"""
+        return resumenes.aggregate(total=Sum('viajes'))['total'] or 0
+    
     def _calcular_porcentaje(self, parte, total):
         """Calcula porcentaje evitando división por cero"""
         if total == 0:
@@ -647,16 +802,135 @@ class DashboardStatsView(APIView):
         return round(((actual - anterior) / anterior) * 100, 1)
 
 
+class DashboardSeriesView(APIView):
+    """
+    Serie de viajes, completados y km por intervalo para los gráficos.
+    ?granularidad=hour|day|week|month (por defecto day) y el período con los
+    mismos parámetros que DashboardStatsView. Los intervalos se agrupan en la
+    base y se guardan en caché uno por uno.
+    """
+    
+    def get(self, request):
+        try:
+            tipo_periodo = request.GET.get('tipo_periodo', 'monthly')
+            granularidad = request.GET.get('granularidad', 'day')
+            fechas = DashboardStatsView()._calcular_fechas(
+                tipo_periodo, request.GET.get('fecha_inicio'), request.GET.get('fecha_fin')
+            )
+            inicio = time.perf_counter()
+            try:
+                serie, en_cache = serie_viajes(granularidad, fechas['inicio'], fechas['fin'])
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'granularidad': granularidad,
+                'periodo': {
+                    'tipo_periodo': tipo_periodo,
+                    'inicio': fechas['inicio'].isoformat(),
+                    'fin': fechas['fin'].isoformat()
+                },
+                'serie': serie,
+                'metadatos': {
+                    'fecha_generacion': timezone.now().isoformat(),
+                    'intervalos': len(serie),
+                    'intervalos_desde_cache': en_cache,
+                    'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 1)
+                }
+            }, status=status.HTTP_200_OK)
+            
+        except Exception as e:
+            return Response(
+                {'error': f'Error al generar la serie del dashboard: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class DashboardMapaCalorView(APIView):
+    """
+    Mapa de calor de orígenes y destinos: sólo las celdas con viajes.
+    ?precision=1..4 (lado de la celda 10^-precision grados, por defecto 2) y
+    el período con los mismos parámetros que DashboardStatsView. Se guarda
+    en el caché del dashboard por (período, precisión).
+    """
+    
+    def get(self, request):
+        try:
+            tipo_periodo = request.GET.get('tipo_periodo', 'monthly')
+            try:
+                precision = int(request.GET.get('precision', PRECISION_POR_DEFECTO))
+                if precision not in PRECISIONES:
+                    raise ValueError
+            except ValueError:
+                return Response(
+                    {'error': f"Precisión inválida. Opciones: {', '.join(map(str, PRECISIONES))}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            fechas = DashboardStatsView()._calcular_fechas(
+                tipo_periodo, request.GET.get('fecha_inicio'), request.GET.get('fecha_fin')
+            )
+            inicio = time.perf_counter()
+            entrada, desde_cache = obtener_dashboard(
+                tipo_periodo, fechas['inicio'], fechas['fin'], f'mapa_calor_{precision}',
+                lambda: {
+                    'celdas': celdas_mapa_calor(fechas['inicio'], fechas['fin'], precision),
+                    'fecha_generacion': timezone.now().isoformat(),
+                }
+            )
+            celdas = entrada['celdas']
+            return Response({
+                'precision': precision,
+                'tamano_celda_grados': PRECISIONES[precision],
+                'periodo': {
+                    'tipo_periodo': tipo_periodo,
+                    'inicio': fechas['inicio'].isoformat(),
+                    'fin': fechas['fin'].isoformat()
+                },
+                'celdas': celdas,
+                'metadatos': {
+                    'fecha_generacion': entrada['fecha_generacion'],
+                    'desde_cache': desde_cache,
+                    'total_celdas': len(celdas),
+                    'maximo_origenes': max((c['origenes'] for c in celdas), default=0),
+                    'maximo_destinos': max((c['destinos'] for c in celdas), default=0),
+                    'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 1)
+                }
+            }, status=status.HTTP_200_OK)
+            
+        except Exception as e:
+            return Response(
+                {'error': f'Error al generar el mapa de calor: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
 class DashboardRefreshCacheView(APIView):
     """
-    Vista para refrescar los datos del dashboard
+    Vista para refrescar los datos del dashboard: recalcula y guarda en caché
+    las secciones del período indicado (mismos parámetros que DashboardStatsView)
     """
     
     def post(self, request):
         try:
+            parametros = request.data if request.data else request.query_params
+            tipo_periodo = parametros.get('tipo_periodo', 'monthly')
+            try:
+                secciones = secciones_solicitadas(parametros.get('sections'))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            dashboard = DashboardStatsView()
+            fechas = dashboard._calcular_fechas(
+                tipo_periodo, parametros.get('fecha_inicio'), parametros.get('fecha_fin')
+            )
+            resultados = dashboard.obtener_secciones(tipo_periodo, fechas, secciones, forzar=True)
             return Response({
                 'message': 'Dashboard cache refreshed successfully',
                 'timestamp': timezone.now().isoformat(),
+                'secciones': {seccion: r['tiempo_ms'] for seccion, r in resultados.items()},
+                'periodo': {
+                    'tipo_periodo': tipo_periodo,
+                    'inicio': fechas['inicio'].isoformat(),
+                    'fin': fechas['fin'].isoformat()
+                },
                 'status': 'success'
             }, status=status.HTTP_200_OK)
             
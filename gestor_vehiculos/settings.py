@@ -140,11 +140,46 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10 # O el tamaño de página que prefieras
 }
 
+# Asignación automática incremental al crear solicitudes 'pendiente_auto'
+ASIGNACION_INCREMENTAL = config('ASIGNACION_INCREMENTAL', default=True, cast=bool)
+
+# Vehículos más cercanos al origen que compiten por cada solicitud (0 = toda la flota)
+ASIGNACION_CANDIDATOS_CERCANOS = config('ASIGNACION_CANDIDATOS_CERCANOS', default=8, cast=int)
+
+# El lote de asignación se encola para el worker (procesar_trabajos_asignacion,
+# servicio aparte con la misma base). Sin worker debe ser False: el lote se
+# ejecuta dentro de la petición.
+ASIGNACION_LOTE_EN_COLA = config('ASIGNACION_LOTE_EN_COLA', default=True, cast=bool)
+
+# El worker renueva el latido (fecha_actualizacion) de su trabajo cada
+# TRABAJO_ASIGNACION_LATIDO_SEGUNDOS; un trabajo 'en_proceso' sin latido por
+# TRABAJO_ASIGNACION_MINUTOS_SIN_LATIDO se da por abandonado (worker caído) y
+# vuelve a la cola
+TRABAJO_ASIGNACION_LATIDO_SEGUNDOS = config('TRABAJO_ASIGNACION_LATIDO_SEGUNDOS', default=30, cast=int)
+TRABAJO_ASIGNACION_MINUTOS_SIN_LATIDO = config('TRABAJO_ASIGNACION_MINUTOS_SIN_LATIDO', default=5, cast=int)
+
+# Segundos que se guarda en caché cada combinación de período del dashboard
+DASHBOARD_CACHE_SEGUNDOS = config('DASHBOARD_CACHE_SEGUNDOS', default=300, cast=int)
+
+# Segundos que se guardan los intervalos ya cerrados de las series del dashboard
+DASHBOARD_CACHE_HISTORICO_SEGUNDOS = config('DASHBOARD_CACHE_HISTORICO_SEGUNDOS', default=86400, cast=int)
+
+# Hilos (y conexiones a la base) para calcular en paralelo las secciones del dashboard
+DASHBOARD_HILOS = config('DASHBOARD_HILOS', default=4, cast=int)
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 # Configuración de base de datos
-if config('USE_LOCAL_DB', default=True, cast=bool):
+# Orden: USE_DATABASE_URL (DATABASE_URL), USE_LOCAL_DB (SQLite), Azure SQL.
+# DATABASE_URL sola no basta: Railway la define al agregar un Postgres.
+if config('USE_DATABASE_URL', default=False, cast=bool):
+    # Base de datos definida por URL (p. ej. un Postgres compartido con el worker)
+    import dj_database_url
+    DATABASES = {
+        'default': dj_database_url.parse(config('DATABASE_URL'))
+    }
+elif config('USE_LOCAL_DB', default=True, cast=bool):
     # Base de datos local SQLite para desarrollo
     DATABASES = {
         'default': {
@@ -169,6 +204,20 @@ else:
         }
     } 
 
+# Caché compartido por todos los procesos (gunicorn, worker) a través de la
+# base: las marcas de cálculo y las generaciones del dashboard deben verse
+# entre procesos. La tabla se crea con `python manage.py createcachetable`.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_django',
+        'OPTIONS': {
+            # Las series por hora guardan una entrada por intervalo
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRADAS', default=20000, cast=int),
+        },
+    }
+}
+
 
 
 # Password validation